@@ -0,0 +1,60 @@
+"""
+Per-request cost of a fresh database connection versus a persistent one.
+
+Simulates the connection handling Django does around each request: with
+``CONN_MAX_AGE = 0`` the connection is opened and closed every time; with a
+persistent connection plus ``CONN_HEALTH_CHECKS`` it is reused after a
+liveness check. Point ``DJANGO_SETTINGS_MODULE`` at settings_prod (with a
+local Postgres container) to measure the TCP + auth handshake; the default
+settings measure SQLite, where connecting is only a file open.
+
+    python -m benchmarks.db_connections --requests 2000
+"""
+import argparse
+import time
+
+from benchmarks.common import setup_django, summarize
+
+
+def simulate_request(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def run(mode, requests):
+    from django.db import connection
+
+    connection.close()
+    connection.settings_dict['CONN_MAX_AGE'] = 600 if mode == 'persistent' else 0
+    connection.settings_dict['CONN_HEALTH_CHECKS'] = mode == 'persistent'
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        # request_started / request_finished both run this check.
+        connection.health_check_done = False
+        connection.close_if_unusable_or_obsolete()
+        simulate_request(connection)
+        connection.close_if_unusable_or_obsolete()
+        samples.append(time.perf_counter() - started)
+    connection.close()
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.db import connection
+    print(f'backend: {connection.vendor}, requests: {args.requests}')
+    results = {mode: run(mode, args.requests) for mode in ('fresh', 'persistent')}
+    for mode, stats in results.items():
+        print(f"{mode:>10}: mean {stats['mean_ms']:.3f} ms  p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+    saving = results['fresh']['mean_ms'] - results['persistent']['mean_ms']
+    print(f'saving per request: {saving:.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Bytes per second one gunicorn worker delivers for media and static files.
+
+Starts a single-worker ``gunicorn -c gunicorn.conf.py`` per scenario and
+downloads the same files over keep-alive connections:
+
+    media       /media/<blob> streamed by the worker (wsgi.file_wrapper)
+    range       1 MiB byte ranges of the same blob (206, read in Python)
+    accel       the same URL with MEDIA_SENDFILE=nginx: the worker only
+                writes headers; nginx would send the bytes
+    static      a hashed static file through WhiteNoise (brotli variant)
+
+``accel`` shows how many requests a worker can hand off per second; its
+byte rate is what nginx then has to supply. The client runs on the same
+machine, so compare scenarios with each other.
+
+    python -m benchmarks.delivery --size-mb 8 --concurrency 4 --duration 10
+"""
+import argparse
+import http.client
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import BASE_DIR, summarize
+from benchmarks.serving import wait_for
+
+SCENARIOS = ('media', 'range', 'accel', 'static')
+RANGE_SIZE = 1024 * 1024
+
+
+def prepare_media(root, size):
+    """Store ``size`` random bytes under ``root`` the way an upload would be; returns its name"""
+    import hashlib
+
+    data = os.urandom(size)
+    digest = hashlib.sha256(data).hexdigest()
+    name = f'cas/{digest[:2]}/{digest[2:4]}/{digest}.bin'
+    os.makedirs(os.path.join(root, os.path.dirname(name)))
+    with open(os.path.join(root, name), 'wb') as f:
+        f.write(data)
+    return name
+
+
+def prepare_static(root):
+    """collectstatic with WhiteNoise's storage into ``root``; returns the hashed URL of a stylesheet"""
+    code = (
+        'import django; django.setup();'
+        'from django.core.management import call_command; call_command("collectstatic", interactive=False, verbosity=0);'
+        'from django.templatetags.static import static; print(static("admin/css/base.css"))'
+    )
+    env = static_env(root)
+    return subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, env=env, check=True,
+                          capture_output=True, text=True).stdout.strip().splitlines()[-1]
+
+
+def static_env(root):
+    return dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', BENCH_STATIC_ROOT=root, BENCH_WHITENOISE='1')
+
+
+def client(port, path, headers, stop, latencies, received, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            body, ok = b'', False
+        latencies.append(time.perf_counter() - started)
+        received.append(len(body))
+        if not ok:
+            errors.append(1)
+    conn.close()
+
+
+def measure(scenario, args, media_root, media_name, static_root, static_url):
+    env = dict(
+        static_env(static_root) if scenario == 'static' else os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+        BENCH_MEDIA_ROOT=media_root,
+        GUNICORN_BIND=f'127.0.0.1:{args.port}',
+        GUNICORN_WORKERS='1',
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_WORKER_CLASS='gthread',
+        GUNICORN_MAX_REQUESTS='0',
+    )
+    if scenario == 'accel':
+        env['BENCH_MEDIA_SENDFILE'] = 'nginx'
+    path, headers = f'/media/{media_name}', {}
+    if scenario == 'range':
+        headers['Range'] = f'bytes=0-{RANGE_SIZE - 1}'
+    elif scenario == 'static':
+        path, headers = static_url, {'Accept-Encoding': 'br, gzip'}
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(args.port)
+        stop = threading.Event()
+        latencies, received, errors = [], [], []
+        threads = [
+            threading.Thread(target=client, args=(args.port, path, headers, stop, latencies, received, errors))
+            for _ in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        latencies.clear()
+        received.clear()
+        errors.clear()
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - started
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    result = summarize(latencies)
+    result.update({'req_s': len(latencies) / elapsed, 'mb_s': sum(received) / elapsed / 1e6, 'errors': len(errors)})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario', help=f"default: all of {', '.join(SCENARIOS)}")
+    parser.add_argument('--size-mb', type=float, default=8, help='size of the media file')
+    parser.add_argument('--concurrency', type=int, default=4, help='simultaneous keep-alive clients')
+    parser.add_argument('--threads', type=int, default=4, help='GUNICORN_THREADS of the single worker')
+    parser.add_argument('--duration', type=float, default=10, help='seconds measured per scenario')
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    scenarios = args.scenarios or SCENARIOS
+
+    media_root = tempfile.mkdtemp(prefix='bench-media-')
+    static_root = tempfile.mkdtemp(prefix='bench-static-')
+    try:
+        media_name = prepare_media(media_root, int(args.size_mb * 1024 * 1024))
+        static_url = prepare_static(static_root) if 'static' in scenarios else None
+        print(f'cpus: {os.cpu_count()}, 1 worker x {args.threads} threads, concurrency: {args.concurrency}, '
+              f'media file: {args.size_mb:g} MiB')
+        for scenario in scenarios:
+            stats = measure(scenario, args, media_root, media_name, static_root, static_url)
+            print(
+                f"{scenario:>7}: {stats['req_s']:8.1f} req/s  {stats['mb_s']:8.1f} MB/s  "
+                f"p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms"
+                + (f"  {stats['errors']} errors" if stats['errors'] else '')
+            )
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+        shutil.rmtree(static_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
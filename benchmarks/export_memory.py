@@ -0,0 +1,51 @@
+"""
+Peak Python memory of a user data export versus the size of the account.
+
+Runs ``socialapp.exports.write_archive`` for the accounts with the most and
+fewest rows in the benchmark database (see ``benchmarks.generate``) and
+reports traced peak allocation; with keyset batching it should track
+``DATA_EXPORT_BATCH_SIZE``, not the row count.
+
+    python -m benchmarks.export_memory --users 3
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=3, help='largest and smallest N accounts')
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.contrib.auth.models import User
+    from django.db.models import Count
+    from socialapp.exports import count_rows, write_archive
+    from socialapp.models import DataExport
+
+    ranked = list(User.objects.annotate(n=Count('posts')).order_by('-n').values_list('pk', flat=True))
+    chosen = ranked[:args.users] + ranked[-args.users:]
+    for user in User.objects.filter(pk__in=chosen):
+        export = DataExport.objects.create(user=user)
+        rows = count_rows(user)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.zip')
+            tracemalloc.start()
+            started = time.perf_counter()
+            write_archive(export, path, args.batch_size)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            size = os.path.getsize(path)
+        export.delete()
+        print(f'{user.username:>12}: {rows:>9,} rows  {elapsed:7.2f}s  archive {size / 1024:9.1f} KiB  peak {peak / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
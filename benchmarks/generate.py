@@ -0,0 +1,190 @@
+"""
+Bulk data generator for the benchmark database.
+
+Creates users with profiles, a power-law connection graph (a few users have
+thousands of connections, most have a handful), posts, likes skewed towards
+popular posts, and threaded comments. Rows go in with ``bulk_create`` in
+chunks, so signals, the change log and notifications are bypassed; every user
+shares one pre-hashed password (``BENCH_PASSWORD``).
+
+    python -m benchmarks.generate --scale small
+    python -m benchmarks.generate --scale large --seed 7   # 1M posts, 10M likes
+"""
+import argparse
+import itertools
+import random
+import time
+import uuid
+
+from benchmarks.common import setup_django
+
+BENCH_PASSWORD = 'benchmark-password'
+CHUNK_SIZE = 5000
+
+# users, connections per user (mean), posts, likes, comments
+SCALES = {
+    'tiny': (200, 5, 1000, 5000, 2000),
+    'small': (2000, 10, 20000, 200000, 40000),
+    'medium': (20000, 15, 200000, 2000000, 400000),
+    'large': (100000, 20, 1000000, 10000000, 2000000),
+}
+
+
+def zipf_cum_weights(n, exponent=1.1):
+    """Cumulative Zipf weights so ``random.choices`` picks rank k with p ~ 1/k**exponent"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def report(label, count, started):
+    elapsed = time.perf_counter() - started
+    print(f'{label:>12}: {count:>10,} rows in {elapsed:7.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)')
+
+
+def create_users(n):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from socialapp.models import UserProfile
+
+    started = time.perf_counter()
+    password = make_password(BENCH_PASSWORD)
+    user_ids = []
+    for chunk in chunked(range(n)):
+        users = User.objects.bulk_create(
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password=password) for i in chunk
+        )
+        UserProfile.objects.bulk_create(
+            UserProfile(user=user, slug=user.username, bio=f'Benchmark user {user.username}') for user in users
+        )
+        user_ids.extend(user.pk for user in users)
+    report('users', n, started)
+    return user_ids
+
+
+def create_connections(rng, user_ids, mean_degree):
+    """Preferential attachment: both the sender's out-degree and the receiver's popularity follow Zipf"""
+    from socialapp.models import Connection
+
+    started = time.perf_counter()
+    popularity = zipf_cum_weights(len(user_ids))
+    seen = set()
+
+    def edges():
+        for index, sender in enumerate(user_ids):
+            degree = min(len(user_ids) - 1, int(rng.paretovariate(1.5) * mean_degree / 3))
+            for receiver in rng.choices(user_ids, cum_weights=popularity, k=degree):
+                pair = (min(sender, receiver), max(sender, receiver))
+                if sender == receiver or pair in seen:
+                    continue
+                seen.add(pair)
+                status = 'accepted' if rng.random() < 0.8 else 'pending'
+                yield Connection(sender_id=sender, receiver_id=receiver, status=status)
+
+    count = 0
+    for chunk in chunked(edges()):
+        Connection.objects.bulk_create(chunk)
+        count += len(chunk)
+    report('connections', count, started)
+
+
+def create_posts(rng, user_ids, n):
+    from socialapp.models import Post
+
+    started = time.perf_counter()
+    # Prolific authors are a different slice of users than popular ones.
+    authors = rng.sample(user_ids, len(user_ids))
+    weights = zipf_cum_weights(len(authors), exponent=0.8)
+    post_ids = []
+    for chunk in chunked(range(n)):
+        posts = [
+            Post(id=uuid.uuid4(), author_id=author, content=f'Benchmark post {i} ' + 'lorem ipsum ' * rng.randint(1, 20))
+            for i, author in zip(chunk, rng.choices(authors, cum_weights=weights, k=len(chunk)))
+        ]
+        Post.objects.bulk_create(posts)
+        post_ids.extend(post.id for post in posts)
+    report('posts', n, started)
+    return post_ids
+
+
+def create_likes(rng, user_ids, post_ids, n):
+    from socialapp.models import Like
+
+    started = time.perf_counter()
+    # Shuffle so virality is independent of creation order.
+    ranked = rng.sample(post_ids, len(post_ids))
+    weights = zipf_cum_weights(len(ranked))
+    for chunk in chunked(range(n)):
+        likes = [
+            Like(user_id=rng.choice(user_ids), post_id=post)
+            for post in rng.choices(ranked, cum_weights=weights, k=len(chunk))
+        ]
+        # Duplicate (user, post) pairs are dropped by the unique constraint.
+        Like.objects.bulk_create(likes, ignore_conflicts=True)
+    report('likes', Like.objects.count(), started)
+    return ranked
+
+
+def create_comments(rng, user_ids, ranked_posts, n, max_depth=3):
+    """Top-level comments on popular posts, then replies to random comments one level at a time"""
+    from socialapp.models import Comment
+
+    started = time.perf_counter()
+    weights = zipf_cum_weights(len(ranked_posts))
+    top_level = n // 2
+    remaining = n - top_level
+    previous = []
+    for chunk in chunked(range(top_level)):
+        comments = Comment.objects.bulk_create(
+            Comment(post_id=post, author_id=rng.choice(user_ids), content=f'Comment {i}')
+            for i, post in zip(chunk, rng.choices(ranked_posts, cum_weights=weights, k=len(chunk)))
+        )
+        previous.extend((comment.pk, comment.post_id) for comment in comments)
+    for depth in range(1, max_depth + 1):
+        level_size = remaining // 2 if depth < max_depth else remaining
+        remaining -= level_size
+        current = []
+        for chunk in chunked(range(level_size)):
+            replies = Comment.objects.bulk_create(
+                Comment(post_id=post_id, parent_id=parent_id, author_id=rng.choice(user_ids), content=f'Reply {i}')
+                for i, (parent_id, post_id) in zip(chunk, rng.choices(previous, k=len(chunk)))
+            )
+            current.extend((comment.pk, comment.post_id) for comment in replies)
+        previous = current or previous
+    report('comments', n, started)
+
+
+def generate(scale, seed=1):
+    from django.db import transaction
+
+    users, mean_degree, posts, likes, comments = SCALES[scale]
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    with transaction.atomic():
+        user_ids = create_users(users)
+        create_connections(rng, user_ids, mean_degree)
+        post_ids = create_posts(rng, user_ids, posts)
+        ranked_posts = create_likes(rng, user_ids, post_ids, likes)
+        create_comments(rng, user_ids, ranked_posts, comments)
+    print(f'generated scale={scale} seed={seed} in {time.perf_counter() - started:.1f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.management import call_command
+    call_command('migrate', interactive=False, verbosity=0)
+    call_command('flush', interactive=False, verbosity=0)
+    generate(args.scale, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Response size and time of nested versus normalized (``?shape=normalized``) lists.
+
+Requests the same pages from the benchmark database (see
+``benchmarks.generate``) in both shapes and reports body bytes, gzipped
+bytes and p50 latency, which covers serialization and JSON rendering:
+
+    posts        /api/posts/ (authors plus every comment's author)
+    comments     the comments of the most commented post
+    connections  the incoming requests of the user with the most pending
+
+    python -m benchmarks.payload --iterations 50
+"""
+import argparse
+import gzip
+import time
+
+from benchmarks.common import setup_django, summarize
+
+SHAPES = ('nested', 'normalized')
+
+
+def targets():
+    from django.contrib.auth.models import User
+    from django.db.models import Count, Q
+    from socialapp.models import Post
+
+    post = Post.objects.annotate(n=Count('comments')).order_by('-n').values_list('pk', flat=True).first()
+    receiver = (
+        User.objects.annotate(n=Count('received_connections', filter=Q(received_connections__status='pending')))
+        .order_by('-n').first()
+    )
+    return receiver, {
+        'posts': '/api/posts/',
+        'comments': f'/api/posts/{post}/comments/',
+        'connections': '/api/connections/incoming/',
+    }
+
+
+def measure(client, path, shape, iterations):
+    params = {'shape': 'normalized'} if shape == 'normalized' else {}
+    latencies, body = [], b''
+    for _ in range(iterations + 1):
+        started = time.perf_counter()
+        response = client.get(path, params)
+        latencies.append(time.perf_counter() - started)
+        body = response.content
+    # The first request warms caches and connections.
+    result = summarize(latencies[1:])
+    result.update({'bytes': len(body), 'gzip_bytes': len(gzip.compress(body)), 'status': response.status_code})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=50, help='requests per page and shape')
+    args = parser.parse_args()
+    setup_django()
+
+    from django.test import Client
+    from knox.models import AuthToken
+
+    user, paths = targets()
+    if user is None:
+        raise SystemExit('benchmark database is empty; run python -m benchmarks.generate first')
+    instance, token = AuthToken.objects.create(user)
+    # ETags are per user and path; no If-None-Match is sent, so every request renders the body.
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+    try:
+        for name, path in paths.items():
+            results = {shape: measure(client, path, shape, args.iterations) for shape in SHAPES}
+            for shape, stats in results.items():
+                print(
+                    f"{name:>11} {shape:>10}: {stats['bytes']:9,} B  gzip {stats['gzip_bytes']:8,} B  "
+                    f"p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms"
+                    + (f"  HTTP {stats['status']}" if stats['status'] != 200 else '')
+                )
+            nested, normalized = results['nested'], results['normalized']
+            if nested['bytes']:
+                print(f"{'':>11} {'saved':>10}: {1 - normalized['bytes'] / nested['bytes']:9.1%}")
+    finally:
+        instance.delete()
+
+
+if __name__ == '__main__':
+    main()
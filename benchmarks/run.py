@@ -0,0 +1,223 @@
+"""
+Scenario benchmarks for the socialapp API.
+
+Drives the real URL conf, middleware and views in-process with Django's test
+client (no network, one client at a time) against the benchmark database
+built by ``benchmarks.generate``. For every scenario it reports requests per
+second, p50/p99 latency and database queries per request, and can save or
+compare against a JSON baseline in ``benchmarks/baselines``.
+
+    python -m benchmarks.generate --scale small
+    python -m benchmarks.run --save-baseline small-sqlite
+    python -m benchmarks.run --compare small-sqlite        # exits 1 on regression
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import setup_django, summarize
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class Context:
+    """Authenticated clients for a sample of users plus the posts scenarios aim at"""
+
+    def __init__(self, rng, clients=20):
+        from django.contrib.auth.models import User
+        from django.db.models import Count
+        from django.test import Client
+        from knox.models import AuthToken
+        from socialapp.models import Post
+
+        self.rng = rng
+        all_ids = sorted(User.objects.values_list('pk', flat=True))
+        if not all_ids:
+            raise SystemExit('benchmark database is empty; run python -m benchmarks.generate first')
+        user_ids = rng.sample(all_ids, min(clients, len(all_ids)))
+        self.tokens = []
+        self.clients = []
+        for user in User.objects.filter(pk__in=user_ids):
+            instance, token = AuthToken.objects.create(user)
+            self.tokens.append(instance)
+            self.clients.append((user, Client(HTTP_AUTHORIZATION=f'Token {token}')))
+        self.hot_posts = list(
+            Post.objects.annotate(n=Count('likes')).order_by('-n').values_list('pk', flat=True)[:10]
+        )
+        self.created_comments = []
+
+    def client(self):
+        return self.rng.choice(self.clients)
+
+    def close(self):
+        from socialapp.models import Comment
+
+        Comment.objects.filter(pk__in=self.created_comments).delete()
+        for token in self.tokens:
+            token.delete()
+
+
+@scenario
+def feed_scroll(ctx, pages=5):
+    """One user scrolling the first pages of the post feed"""
+    _, client = ctx.client()
+    for page in range(1, pages + 1):
+        yield client.get, f'/api/posts/?page={page}', {}
+
+
+@scenario
+def like_storm(ctx):
+    """Everyone likes, then unlikes, the most liked post"""
+    post = ctx.hot_posts[0]
+    for _, client in ctx.clients:
+        yield client.post, f'/api/posts/{post}/like/', {}
+    for _, client in ctx.clients:
+        yield client.post, f'/api/posts/{post}/unlike/', {}
+
+
+@scenario
+def comment_threads(ctx):
+    """Read a busy post's comments, then reply to one of them"""
+    from socialapp.models import Comment
+
+    _, client = ctx.client()
+    post = ctx.rng.choice(ctx.hot_posts)
+    yield client.get, f'/api/posts/{post}/comments/', {}
+    parents = list(Comment.objects.filter(post_id=post).order_by('pk').values_list('pk', flat=True)[:50])
+    if parents:
+        parent = ctx.rng.choice(parents)
+        yield client.post, f'/api/comments/{parent}/reply/', {'content': 'Benchmark reply'}
+
+
+@scenario
+def recommendations(ctx):
+    """Connection recommendations for a random user"""
+    _, client = ctx.client()
+    yield client.get, '/api/recommendations/', {}
+
+
+def measure(ctx, name, iterations, warmup):
+    from django.db import connections
+    from socialapp.metrics import RequestStats
+
+    latencies, queries, errors = [], [], 0
+    wall = 0.0
+    for iteration in range(warmup + iterations):
+        for method, path, data in SCENARIOS[name](ctx):
+            stats = RequestStats()
+            with _wrapped(connections.all(), stats):
+                started = time.perf_counter()
+                response = method(path, data=data, content_type='application/json') if data else method(path)
+                elapsed = time.perf_counter() - started
+            if response.status_code == 201 and 'reply' in path:
+                ctx.created_comments.append(response.json()['id'])
+            if iteration < warmup:
+                continue
+            errors += response.status_code >= 400
+            wall += elapsed
+            latencies.append(elapsed)
+            queries.append(stats.queries)
+    result = summarize(latencies)
+    result.update({
+        'req_s': len(latencies) / wall if wall else 0.0,
+        'queries_per_request': statistics.fmean(queries) if queries else 0.0,
+        'errors': errors,
+    })
+    return result
+
+
+class _wrapped:
+    """Install one execute wrapper on several connections"""
+
+    def __init__(self, conns, wrapper):
+        self.contexts = [conn.execute_wrapper(wrapper) for conn in conns]
+
+    def __enter__(self):
+        for context in self.contexts:
+            context.__enter__()
+
+    def __exit__(self, *exc):
+        for context in reversed(self.contexts):
+            context.__exit__(*exc)
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each scenario against the baseline and whether any regressed"""
+    lines, regressed = [], False
+    for name, current in results.items():
+        old = baseline['scenarios'].get(name)
+        if old is None:
+            lines.append(f'{name}: no baseline')
+            continue
+        problems = []
+        for key in ('p50_ms', 'p99_ms'):
+            if current[key] > old[key] * (1 + tolerance):
+                problems.append(f'{key} {old[key]:.2f} -> {current[key]:.2f}')
+        if current['req_s'] < old['req_s'] / (1 + tolerance):
+            problems.append(f"req/s {old['req_s']:.1f} -> {current['req_s']:.1f}")
+        # Query counts are deterministic, so any increase is a regression.
+        if current['queries_per_request'] > old['queries_per_request'] + 0.5:
+            problems.append(f"queries {old['queries_per_request']:.1f} -> {current['queries_per_request']:.1f}")
+        regressed = regressed or bool(problems)
+        lines.append(f"{name}: {'REGRESSED ' + ', '.join(problems) if problems else 'ok'}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario', help=f"default: all of {', '.join(SCENARIOS)}")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed latency/throughput slowdown (0.2 = 20%%)')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    setup_django()
+
+    from django.db import connection
+    from socialapp.models import Post
+
+    rng = random.Random(args.seed)
+    ctx = Context(rng)
+    print(f'backend: {connection.vendor}, posts: {Post.objects.count():,}, iterations: {args.iterations}')
+    results = {}
+    try:
+        for name in args.scenarios or SCENARIOS:
+            results[name] = stats = measure(ctx, name, args.iterations, args.warmup)
+            print(
+                f"{name:>16}: {stats['req_s']:8.1f} req/s  p50 {stats['p50_ms']:8.2f} ms  "
+                f"p99 {stats['p99_ms']:8.2f} ms  {stats['queries_per_request']:6.1f} queries/req"
+                + (f"  {stats['errors']} errors" if stats['errors'] else '')
+            )
+    finally:
+        ctx.close()
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f'{args.save_baseline}.json'
+        path.write_text(json.dumps({'backend': connection.vendor, 'posts': Post.objects.count(), 'scenarios': results}, indent=2) + '\n')
+        print(f'saved baseline {path}')
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f'{args.compare}.json').read_text())
+        lines, regressed = compare(results, baseline, args.tolerance)
+        print('\n'.join(lines))
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
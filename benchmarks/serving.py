@@ -0,0 +1,158 @@
+"""
+Throughput of each gunicorn worker model serving the real app over HTTP.
+
+Starts ``gunicorn -c gunicorn.conf.py`` once per worker model against the
+benchmark database built by ``benchmarks.generate`` and drives it with
+keep-alive HTTP clients on threads, each reading feed pages, post details
+and comment threads as a different user. The load generator runs on the same
+machine, so compare models with each other rather than with production.
+
+    python -m benchmarks.serving --concurrency 16 --duration 20
+    python -m benchmarks.serving sync gthread --workers 4 --threads 8
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import BASE_DIR, setup_django, summarize
+
+MODELS = ('sync', 'gthread', 'uvicorn')
+
+
+def prepare(users, seed):
+    """(AuthToken rows, raw tokens, request paths) for a sample of users and popular posts"""
+    from django.contrib.auth.models import User
+    from django.db.models import Count
+    from knox.models import AuthToken
+    from socialapp.models import Post
+
+    rng = random.Random(seed)
+    user_ids = sorted(User.objects.values_list('pk', flat=True))
+    if not user_ids:
+        raise SystemExit('benchmark database is empty; run python -m benchmarks.generate first')
+    created = [AuthToken.objects.create(user) for user in User.objects.filter(pk__in=rng.sample(user_ids, min(users, len(user_ids))))]
+    posts = list(Post.objects.annotate(n=Count('likes')).order_by('-n').values_list('pk', flat=True)[:20])
+    paths = [f'/api/posts/?page={page}' for page in (1, 2, 3)]
+    paths += [f'/api/posts/{post}/' for post in posts] + [f'/api/posts/{post}/comments/' for post in posts]
+    return [instance for instance, _ in created], [token for _, token in created], paths
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'server on port {port} did not come up')
+
+
+def client(port, token, paths, rng, stop, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Authorization': f'Token {token}'}
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            conn.request('GET', rng.choice(paths), headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors.append(1)
+    conn.close()
+
+
+def measure(model, args, tokens, paths):
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='benchmarks.settings',
+        GUNICORN_WORKER_CLASS=model,
+        GUNICORN_BIND=f'127.0.0.1:{args.port}',
+        # No recycling mid-run; it would show up as latency spikes.
+        GUNICORN_MAX_REQUESTS='0',
+    )
+    for name, value in (('GUNICORN_WORKERS', args.workers), ('GUNICORN_THREADS', args.threads)):
+        if value:
+            env[name] = str(value)
+        else:
+            env.pop(name, None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for(args.port)
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(
+                target=client,
+                args=(args.port, tokens[i % len(tokens)], paths, random.Random(args.seed + i), stop, latencies, errors),
+            )
+            for i in range(args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.warmup)
+        latencies.clear()
+        errors.clear()
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - started
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    result = summarize(latencies)
+    result.update({'req_s': len(latencies) / elapsed, 'errors': len(errors)})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('models', nargs='*', metavar='model', help=f"default: all of {', '.join(MODELS)}")
+    parser.add_argument('--concurrency', type=int, default=16, help='simultaneous keep-alive clients')
+    parser.add_argument('--duration', type=float, default=15, help='seconds measured per model')
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--workers', type=int, help='GUNICORN_WORKERS; default: gunicorn.conf.py formula')
+    parser.add_argument('--threads', type=int, help='GUNICORN_THREADS; default: gunicorn.conf.py formula')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    unknown = set(args.models) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+    setup_django()
+
+    instances, tokens, paths = prepare(args.users, args.seed)
+    print(f'cpus: {os.cpu_count()}, concurrency: {args.concurrency}, {args.duration:.0f}s per model')
+    try:
+        for model in args.models or MODELS:
+            stats = measure(model, args, tokens, paths)
+            print(
+                f"{model:>8}: {stats['req_s']:8.1f} req/s  p50 {stats['p50_ms']:8.2f} ms  "
+                f"p99 {stats['p99_ms']:8.2f} ms" + (f"  {stats['errors']} errors" if stats['errors'] else '')
+            )
+    finally:
+        for instance in instances:
+            instance.delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Settings for the benchmark suite: a separate database so generated data never
+# touches db.sqlite3. SQLite by default; set BENCH_DB_NAME (plus BENCH_DB_USER,
+# BENCH_DB_PASSWORD, BENCH_DB_HOST, BENCH_DB_PORT) to use a local Postgres.
+import os
+
+from social_media_backend.settings import *
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+if os.environ.get('BENCH_DB_NAME'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['BENCH_DB_NAME'],
+            'USER': os.environ.get('BENCH_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('BENCH_DB_PASSWORD', ''),
+            'HOST': os.environ.get('BENCH_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('BENCH_DB_PORT', '5432'),
+            'CONN_MAX_AGE': 600,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'benchmarks' / 'bench.sqlite3',
+        }
+    }
+
+# Generated users all share one password; a cheap hasher keeps login scenarios
+# measuring the API rather than PBKDF2.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Keep side effects inline so every request's cost is measured in-process.
+TASKS_ALWAYS_EAGER = True
+SYNC_SETTLE_SECONDS = 0
+
+# The runner reports queries per request itself; skip the per-request budget warnings.
+DEFAULT_QUERY_BUDGET = None
+
+# benchmarks.delivery: where its media and collected static files live, how
+# files leave the worker, and WhiteNoise as configured in settings_prod.
+if os.environ.get('BENCH_MEDIA_ROOT'):
+    MEDIA_ROOT = os.environ['BENCH_MEDIA_ROOT']
+MEDIA_SENDFILE = os.environ.get('BENCH_MEDIA_SENDFILE', '')
+if os.environ.get('BENCH_STATIC_ROOT'):
+    STATIC_ROOT = os.environ['BENCH_STATIC_ROOT']
+if os.environ.get('BENCH_WHITENOISE'):
+    MIDDLEWARE = list(MIDDLEWARE)
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware'
+    )
+    STORAGES = dict(STORAGES, staticfiles={'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'})
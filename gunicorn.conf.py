@@ -0,0 +1,60 @@
+"""
+Gunicorn serving profile, configured from the environment (``gunicorn -c gunicorn.conf.py``).
+
+GUNICORN_WORKER_CLASS picks the worker model:
+
+    gthread  (default) wsgi.py; GUNICORN_THREADS threads per worker overlap
+             requests waiting on the database
+    sync     wsgi.py; one request at a time per worker
+    uvicorn  asgi.py; needed for the server-sent events stream. Django runs
+             sync views on one thread per worker, so size it like sync.
+
+Unset sizes come from the CPU count, and are written back to the
+environment so settings_prod sizes the database pool from the same numbers.
+"""
+import os
+
+cpus = os.cpu_count() or 1
+worker_model = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_model not in ('gthread', 'sync', 'uvicorn'):
+    raise RuntimeError(f'GUNICORN_WORKER_CLASS must be gthread, sync or uvicorn, not {worker_model!r}')
+
+# Threads release the GIL while waiting on Postgres; fewer processes, more threads.
+default_workers, default_threads = (cpus + 1, 4) if worker_model == 'gthread' else (cpus * 2 + 1, 1)
+workers = int(os.environ.setdefault('GUNICORN_WORKERS', str(default_workers)))
+threads = int(os.environ.setdefault('GUNICORN_THREADS', str(default_threads)))
+
+worker_class = {'gthread': 'gthread', 'sync': 'sync', 'uvicorn': 'uvicorn.workers.UvicornWorker'}[worker_model]
+wsgi_app = 'social_media_backend.asgi:application' if worker_model == 'uvicorn' else 'social_media_backend.wsgi:application'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# Seconds an idle keep-alive connection from nginx stays open (gthread/uvicorn).
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers after a jittered number of requests so slow leaks are bounded
+# and workers do not all restart at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Import the application once in the master; workers share it copy-on-write.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Heartbeat files on tmpfs; a container's overlay filesystem can stall them.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # wsgi.py already closes connections after preloading; this guards against
+    # anything opened since, which the forked worker must not share.
+    from django.conf import settings
+
+    if settings.configured:
+        from django.db import connections
+
+        connections.close_all()
@@ -2,6 +2,8 @@
 ASGI config for social_media_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to ``EVENT_STREAM_PATH`` are answered by the server-sent events stream
+in ``socialapp.sse``; everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up, since it touches models and settings.
+from django.conf import settings  # noqa: E402
+from socialapp.sse import event_stream  # noqa: E402
+from social_media_backend.startup import preload  # noqa: E402
+
+preload()
+
+EVENT_STREAM_PATH = getattr(settings, 'EVENT_STREAM_PATH', '/api/events/')
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENT_STREAM_PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
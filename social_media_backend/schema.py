@@ -0,0 +1,91 @@
+"""
+OpenAPI schema built once instead of on every request.
+
+drf-yasg introspects every view and serializer to produce the schema. Unless
+``OPENAPI_LIVE_SCHEMA`` is set, the JSON/YAML documents are read from
+``OPENAPI_SCHEMA_DIR`` (written at build time by ``manage.py build_openapi_schema``)
+or generated on first use, then kept for the life of the process and served
+with a strong ETag. The Swagger UI and ReDoc pages load the cached document.
+"""
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+INFO = openapi.Info(
+    title="Social Media API",
+    default_version='v1',
+    description="API for social media platform with authentication, posts, likes, and connections",
+    terms_of_service="https://www.example.com/terms/",
+    contact=openapi.Contact(email="contact@example.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    INFO,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+# format suffix -> (file name, codec, content type)
+FORMATS = {
+    '.json': ('schema.json', OpenAPICodecJson, 'application/json'),
+    '.yaml': ('schema.yaml', OpenAPICodecYaml, 'application/yaml'),
+}
+
+_documents = {}
+_lock = threading.Lock()
+
+
+def schema_dir():
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', settings.BASE_DIR / 'openapi'))
+
+
+def render_schema(fmt):
+    """Introspect the URL conf and encode the public schema as ``fmt`` bytes"""
+    _, codec, _ = FORMATS[fmt]
+    schema = schema_view.generator_class(INFO).get_schema(request=None, public=True)
+    return codec(validators=[]).encode(schema)
+
+
+def get_document(fmt):
+    """(body, ETag) for ``fmt``: the pre-built file if present, else generated once per process"""
+    with _lock:
+        if fmt not in _documents:
+            path = schema_dir() / FORMATS[fmt][0]
+            body = path.read_bytes() if path.exists() else render_schema(fmt)
+            _documents[fmt] = (body, quote_etag(hashlib.sha256(body).hexdigest()))
+        return _documents[fmt]
+
+
+def clear_cache():
+    with _lock:
+        _documents.clear()
+
+
+@require_safe
+def schema_document(request, format):
+    body, etag = get_document(format)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=FORMATS[format][2])
+    response['ETag'] = etag
+    # The body only changes on deploy; clients revalidate and get a 304.
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def schema_ui(renderer):
+    """Swagger UI / ReDoc page without the ``?format=openapi`` live introspection path"""
+    renderer_class = {'swagger': SwaggerUIRenderer, 'redoc': ReDocRenderer}[renderer]
+    return schema_view.as_cached_view(renderer_classes=(renderer_class,))
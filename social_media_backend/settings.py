@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -47,12 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'socialapp.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'socialapp.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +90,11 @@ DATABASES = {
     }
 }
 
+# Read replicas: aliases in DATABASES that serve safe reads (socialapp.routers)
+DATABASE_ROUTERS = ['socialapp.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKINESS_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,6 +137,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per content under media/cas/ (socialapp.storage);
+# unreferenced blobs are kept MEDIA_GC_GRACE before manage.py gc_media removes them
+STORAGES = {
+    'default': {'BACKEND': 'socialapp.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+MEDIA_GC_GRACE = timedelta(hours=1)
+MEDIA_GC_BATCH_SIZE = 500
+
+# How file bodies leave Django (socialapp.sendfile): '' streams them from the
+# worker, 'nginx' hands them to X-Accel-Redirect under MEDIA_SENDFILE_URL,
+# 'apache' to X-Sendfile. Uploads not stored by content are cached MEDIA_MAX_AGE seconds.
+MEDIA_SENDFILE = ''
+MEDIA_SENDFILE_URL = '/protected-media/'
+MEDIA_MAX_AGE = 86400
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -144,6 +168,11 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # JSON rendering time is recorded per request (socialapp.metrics).
+    'DEFAULT_RENDERER_CLASSES': [
+        'socialapp.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Knox settings
@@ -155,3 +184,100 @@ REST_KNOX = {
     'TOKEN_LIMIT_PER_USER': None,
     'AUTO_REFRESH': False,
 }
+
+# Delta sync (socialapp.sync)
+SYNC_PAGE_SIZE = 500
+SYNC_SETTLE_SECONDS = 2
+SYNC_COMPACT_AFTER = timedelta(hours=1)
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+
+# Server-sent events (socialapp.events / socialapp.sse), served by asgi.py
+EVENT_BROKER_BACKEND = 'socialapp.events.InProcessBackend'
+EVENT_STREAM_PATH = '/api/events/'
+EVENT_STREAM_QUEUE_SIZE = 64
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+
+# Notification inbox (socialapp.notifications): events the task worker folds per call
+NOTIFICATION_BATCH_SIZE = 500
+
+# Background tasks (socialapp.taskqueue); eager runs tasks inline in development.
+# A running task's lease is renewed every TASKS_HEARTBEAT_INTERVAL seconds and
+# expires after TASKS_VISIBILITY_TIMEOUT; finished rows are kept TASKS_RETENTION.
+TASKS_ALWAYS_EAGER = DEBUG
+TASKS_VISIBILITY_TIMEOUT = 600
+TASKS_HEARTBEAT_INTERVAL = 60
+TASKS_MAX_RETRY_DELAY = 3600
+TASKS_RETENTION = timedelta(days=7)
+TASKS_PRUNE_INTERVAL = 3600
+
+# User data exports (socialapp.exports): rows per keyset batch, how long finished
+# exports are kept, and how often export requests schedule the prune
+DATA_EXPORT_BATCH_SIZE = 2000
+EXPORT_RETENTION = timedelta(days=7)
+EXPORT_PRUNE_INTERVAL = 3600
+
+# Deferred deletion (socialapp.purge): rows per DELETE batch, and how long
+# soft-deleted comments/posts are kept before manage.py purge_tombstones removes them
+PURGE_BATCH_SIZE = 1000
+SOFT_DELETE_RETENTION = timedelta(days=30)
+
+# Connection graph queries (socialapp.graph): how long adjacency lists stay
+# cached, and the hop and time limits of a degree-of-separation search
+GRAPH_ADJACENCY_TTL = 300
+GRAPH_MAX_DEPTH = 3
+GRAPH_TIME_BUDGET = 0.05
+
+# Likes by the caller's connections listed first by /api/posts/<id>/likes/?friends_first=true,
+# and at most how many of the caller's connections that looks for
+LIKES_FRIENDS_LIMIT = 50
+GRAPH_INTERSECTION_MAX = 5000
+
+# Public profiles (socialapp.profiles): per-worker slug -> user id LRU size and
+# entry lifetime in seconds, and users per batch of manage.py backfill_user_stats
+PROFILE_SLUG_CACHE_SIZE = 10000
+PROFILE_SLUG_CACHE_TTL = 300
+USER_STATS_BATCH_SIZE = 1000
+
+# User typeahead (socialapp.search): results per query by default and at most,
+# prefix matches ranked per query, deltas kept before the index arrays are
+# merged, and seconds before a worker rebuilds its index from the database
+SEARCH_RESULTS_LIMIT = 10
+SEARCH_RESULTS_MAX = 50
+SEARCH_MAX_CANDIDATES = 200
+SEARCH_INDEX_COMPACT_AFTER = 20000
+SEARCH_INDEX_MAX_AGE = 300
+
+# Knox token lifecycle (socialapp.tokens): tokens kept per user (oldest evicted),
+# and how often logins schedule the batched purge of expired tokens
+AUTH_TOKEN_MAX_PER_USER = 10
+AUTH_TOKEN_PURGE_INTERVAL = 3600
+AUTH_TOKEN_PURGE_BATCH_SIZE = 1000
+
+# OpenAPI schema (social_media_backend.schema): introspect on every request only
+# when live; otherwise serve the document built by manage.py build_openapi_schema
+OPENAPI_LIVE_SCHEMA = DEBUG
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+SWAGGER_SETTINGS = {'SPEC_URL': ('schema-json', {'format': '.json'})}
+REDOC_SETTINGS = {'SPEC_URL': ('schema-json', {'format': '.json'})}
+
+# Request instrumentation (socialapp.middleware.QueryInstrumentationMiddleware)
+# Budgets are keyed by URL name, e.g. {'socialapp:post-list-create': 10}.
+QUERY_BUDGETS = {}
+DEFAULT_QUERY_BUDGET = 50
+METRICS_TOKEN = ''
+
+# API-only workers (DJANGO_API_ONLY=true): no admin, API docs or static files
+# app, and the URL conf in urls_api, so a worker imports and keeps less.
+# Compare with manage.py startup_profile.
+API_ONLY = os.environ.get('DJANGO_API_ONLY', 'false').lower() == 'true'
+if API_ONLY:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS
+        if app not in ('django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles', 'drf_yasg')
+    ]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware != 'django.contrib.messages.middleware.MessageMiddleware'
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove('django.contrib.messages.context_processors.messages')
+    ROOT_URLCONF = 'social_media_backend.urls_api'
@@ -1,6 +1,7 @@
 # Production settings for social_media_backend
 from .settings import *
 import os
+import sys
 
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
@@ -10,6 +11,19 @@ DEBUG = False
 
 ALLOWED_HOSTS = ['yourdomain.com', 'www.yourdomain.com']
 
+# Background tasks run in the taskworker service, not inline
+TASKS_ALWAYS_EAGER = False
+
+# Serve the pre-built OpenAPI schema (manage.py build_openapi_schema)
+OPENAPI_LIVE_SCHEMA = False
+
+# Gunicorn process model; database connections are sized from it
+GUNICORN_WORKERS = int(os.environ.get('GUNICORN_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Default --concurrency of manage.py taskworker (the worker service)
+TASKWORKER_CONCURRENCY = int(os.environ.get('TASKWORKER_CONCURRENCY', 4))
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 DATABASES = {
@@ -20,16 +34,70 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Keep connections open across requests instead of paying the TCP + auth
+        # handshake each time; health checks drop connections the server closed.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
-# Static files (CSS, JavaScript, Images)
+# Optional psycopg 3 connection pool (one per process). Django requires
+# CONN_MAX_AGE = 0 with a pool; each thread borrows a connection at a time, so
+# a gunicorn worker never needs more than GUNICORN_THREADS of them and the task
+# worker no more than its task threads plus its polling loop. Postgres sees up
+# to GUNICORN_WORKERS * DB_POOL_MAX_SIZE connections per web container.
+if sys.argv[1:2] == ['taskworker']:
+    DB_POOL_DEFAULT_SIZE = TASKWORKER_CONCURRENCY + 1
+else:
+    DB_POOL_DEFAULT_SIZE = GUNICORN_THREADS
+if os.environ.get('DB_POOL', 'false').lower() == 'true':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', DB_POOL_DEFAULT_SIZE)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+# Read replicas: DB_REPLICA_HOSTS=replica1,replica2 adds one alias per host.
+# Read-your-writes pins must be seen by every worker, so they get their own
+# shared cache: Redis when REDIS_URL is set, otherwise a table on the primary
+# (python manage.py createcachetable).
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+REPLICA_STICKINESS_SECONDS = int(os.environ.get('REPLICA_STICKINESS_SECONDS', 5))
+if DATABASE_REPLICAS:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'replica_pins': (
+            {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}
+            if os.environ.get('REDIS_URL') else
+            {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'replica_pins'}
+        ),
+    }
+    REPLICA_STICKINESS_CACHE = 'replica_pins'
+
+# Static files (CSS, JavaScript, Images): collectstatic writes hashed names plus
+# .gz/.br variants, and WhiteNoise serves them with the best encoding the client
+# accepts, hashed names cached forever
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+MIDDLEWARE = list(MIDDLEWARE)
+MIDDLEWARE.insert(
+    MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware'
+)
+STORAGES = dict(STORAGES, staticfiles={'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'})
 
-# Media files
+# Media files; nginx serves public uploads and, through X-Accel-Redirect, the
+# files views hand to it (nginx/conf.d/default.conf)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', 'nginx')
 
 # Security settings
 SECURE_SSL_REDIRECT = True
@@ -42,6 +110,9 @@ CORS_ALLOWED_ORIGINS = [
     'https://www.yourdomain.com',
 ]
 
+# Metrics endpoint (/api/metrics/) accepts 'Authorization: Bearer <METRICS_TOKEN>'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -59,6 +130,12 @@ LOGGING = {
             'filename': BASE_DIR / 'logs/django-error.log',
             'formatter': 'verbose',
         },
+        'perf': {
+            'level': 'WARNING',
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'logs/perf.log',
+            'formatter': 'verbose',
+        },
     },
     'loggers': {
         'django': {
@@ -66,5 +143,11 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        # Requests over their query budget
+        'socialapp.perf': {
+            'handlers': ['perf'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
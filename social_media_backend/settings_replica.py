@@ -0,0 +1,11 @@
+# Local primary/replica setup: two SQLite files standing in for Postgres
+# primary and streaming replica. Run the routing tests against it with
+#   python manage.py test socialapp.tests.test_routers --settings=social_media_backend.settings_replica
+from .settings import *
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica']
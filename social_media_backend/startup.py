@@ -0,0 +1,17 @@
+"""
+Worker start-up helpers shared by wsgi.py and asgi.py.
+
+Django imports the URL conf, and with it every view and serializer module, on
+the first request. ``preload()`` does it while the application is loaded
+instead, so that first request is not slow and, under ``gunicorn --preload``,
+the modules are imported once in the master and shared copy-on-write by the
+forked workers. Nothing here may leave a database connection open: a socket
+inherited across ``fork()`` would be shared by every worker.
+"""
+from django.db import connections
+from django.urls import get_resolver
+
+
+def preload():
+    get_resolver().url_patterns
+    connections.close_all()
@@ -1,37 +1,26 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-from . import views
-
-# Create schema view for Swagger documentation
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Social Media API",
-        default_version='v1',
-        description="API for social media platform with authentication, posts, likes, and connections",
-        terms_of_service="https://www.example.com/terms/",
-        contact=openapi.Contact(email="contact@example.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from . import schema, views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('socialapp.urls')),
     path('', views.welcome, name='welcome'),
-    
-    # Swagger documentation URLs
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # Uploads; behind nginx (nginx/conf.d) the web server answers these itself
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), views.media, name='media'),
 ]
 
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Swagger documentation URLs; live introspection on every request only when debugging
+if getattr(settings, 'OPENAPI_LIVE_SCHEMA', settings.DEBUG):
+    urlpatterns += [
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema.schema_view.without_ui(cache_timeout=0), name='schema-json'),
+        path('swagger/', schema.schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+        path('redoc/', schema.schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    ]
+else:
+    urlpatterns += [
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema.schema_document, name='schema-json'),
+        path('swagger/', schema.schema_ui('swagger'), name='schema-swagger-ui'),
+        path('redoc/', schema.schema_ui('redoc'), name='schema-redoc'),
+    ]
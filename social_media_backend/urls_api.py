@@ -0,0 +1,13 @@
+"""
+URL conf for API-only workers (``DJANGO_API_ONLY``): the admin and the
+Swagger/ReDoc docs are left out, so neither they nor drf-yasg are imported.
+"""
+from django.conf import settings
+from django.urls import path, include, re_path
+from . import views
+
+urlpatterns = [
+    path('api/', include('socialapp.urls')),
+    path('', views.welcome, name='welcome'),
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), views.media, name='media'),
+]
@@ -1,7 +1,35 @@
-from django.http import HttpResponse
+import posixpath
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from socialapp.sendfile import send_file
+from socialapp.storage import is_blob
+
+# A blob's name is its sha256, so its bytes never change.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Under MEDIA_ROOT but not public: export archives (downloaded through the API
+# with a permission check) and uploads still being written.
+PRIVATE_MEDIA = ('exports/', 'cas/.tmp/')
+
 
 def welcome(request):
     return HttpResponse(
         "<h1>Welcome to Social Media API</h1>"
         "<p>API endpoints are available at <a href='/api/'>/api/</a></p>"
-    )
\ No newline at end of file
+    )
+
+
+@require_safe
+def media(request, path):
+    """Uploaded media; content-addressed blobs are cached forever, older names for MEDIA_MAX_AGE"""
+    path = posixpath.normpath(path)
+    if path.startswith(('..', '/')) or path.startswith(PRIVATE_MEDIA):
+        raise Http404(path)
+    if is_blob(path):
+        etag = quote_etag(posixpath.splitext(posixpath.basename(path))[0])
+        return send_file(request, path, etag=etag, cache_control=IMMUTABLE)
+    return send_file(request, path, cache_control=f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', 86400)}")
@@ -2,6 +2,8 @@
 WSGI config for social_media_backend project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+The URL conf is loaded up front (``startup.preload``) so it is safe and useful
+to run gunicorn with ``--preload``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
@@ -14,3 +16,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_backend.settings')
 
 application = get_wsgi_application()
+
+from social_media_backend.startup import preload  # noqa: E402
+
+preload()
@@ -1,7 +1,57 @@
 from django.contrib import admin
+from django.contrib.admin.utils import get_fields_from_path
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Coalesce
 from .models import UserProfile, Post, Like, Connection, Comment
+from .pagination import EstimatedCountPaginator
+
+
+class ScalableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows.
+
+    Counts are bounded (no full-table COUNT, estimates past a limit), foreign
+    keys use autocomplete widgets instead of dropdowns, and ``search_fields``
+    are explicit ``field__lookup`` expressions that must each be index-backed.
+    A search term is only tried against the fields it converts to (a UUID
+    against UUID keys, digits against integer keys), so a search is a few
+    index lookups whatever the table size.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for lookup in self.get_search_fields(request):
+            path = lookup.rpartition(LOOKUP_SEP)[0]
+            try:
+                value = get_fields_from_path(self.model, path)[-1].to_python(term)
+            except ValidationError:
+                continue
+            condition |= Q(**{lookup: value})
+        if not condition:
+            return queryset.none(), False
+        return queryset.filter(condition), False
+
+
+class SoftDeleteAdminMixin:
+    """Lists soft-deleted rows too (through ``all_objects``) until they are purged"""
+    # The live-row created_at indexes are partial; this order has its own
+    # index over every row (posts_admin_idx, comments_admin_idx).
+    ordering = ('-created_at', '-id')
+    
+    def get_queryset(self, request):
+        queryset = self.model.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
 
 
 class UserProfileInline(admin.StackedInline):
@@ -10,54 +60,93 @@ class UserProfileInline(admin.StackedInline):
     verbose_name_plural = 'Profile'
 
 
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     inlines = (UserProfileInline,)
+    search_fields = ('id__exact', 'username__startswith')
+    search_help_text = 'User id or the start of a username (case-sensitive)'
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'slug', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'user__email', 'slug')
+    list_select_related = ('user',)
+    search_fields = ('user__username__exact', 'slug__startswith')
+    search_help_text = 'Username, or the start of a profile slug'
+    autocomplete_fields = ('user',)
     readonly_fields = ('slug', 'created_at', 'updated_at')
 
 # Removed the first Comment registration
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'content_preview', 'likes_count', 'created_at')
-    list_filter = ('created_at', 'author')
-    search_fields = ('author__username', 'content')
-    readonly_fields = ('id', 'created_at', 'updated_at')
-    
+class PostAdmin(SoftDeleteAdminMixin, ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'author', 'content_preview', 'likes_total', 'created_at', 'deleted_at')
+    list_filter = ('created_at', ('deleted_at', admin.EmptyFieldListFilter))
+    list_select_related = ('author',)
+    search_fields = ('id__exact', 'author__username__exact')
+    search_help_text = 'Post id or author username'
+    autocomplete_fields = ('author',)
+    readonly_fields = ('id', 'created_at', 'updated_at', 'deleted_at')
+
+    def get_queryset(self, request):
+        # A correlated subquery is evaluated for the rows on the page only,
+        # unlike a JOIN + GROUP BY over every post. Sorting by it would run it
+        # for every post, so the column is not sortable.
+        likes = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+        return super().get_queryset(request).annotate(
+            likes_total=Coalesce(Subquery(likes, output_field=IntegerField()), 0)
+        )
+
+    @admin.display(description='Likes')
+    def likes_total(self, obj):
+        return obj.likes_total
+
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
 
 
 @admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
+class LikeAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'post', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'post__content')
+    list_select_related = ('user', 'post__author')
+    search_fields = ('user__username__exact', 'post__id__exact')
+    search_help_text = 'Username or post id'
+    autocomplete_fields = ('user', 'post')
     readonly_fields = ('created_at',)
 
 
 @admin.register(Connection)
-class ConnectionAdmin(admin.ModelAdmin):
+class ConnectionAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('sender', 'receiver', 'status', 'created_at')
     list_filter = ('status', 'created_at')
-    search_fields = ('sender__username', 'receiver__username')
+    list_select_related = ('sender', 'receiver')
+    search_fields = ('sender__username__exact', 'receiver__username__exact')
+    search_help_text = 'Username of either side'
+    autocomplete_fields = ('sender', 'receiver')
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ('id', 'author', 'post', 'content_preview', 'parent', 'created_at')
-    list_filter = ('created_at', 'author')
-    search_fields = ('author__username', 'content', 'post__id')
-    readonly_fields = ('id', 'created_at', 'updated_at')
-    
+class CommentAdmin(SoftDeleteAdminMixin, ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'author', 'post_ref', 'content_preview', 'parent_ref', 'created_at', 'deleted_at')
+    list_filter = ('created_at', ('deleted_at', admin.EmptyFieldListFilter))
+    list_select_related = ('author',)
+    search_fields = ('id__exact', 'post__id__exact', 'author__username__exact')
+    search_help_text = 'Comment id, post id or author username'
+    autocomplete_fields = ('author', 'post', 'parent')
+    readonly_fields = ('id', 'created_at', 'updated_at', 'deleted_at')
+
+    # Raw keys: the post and parent strings would load both rows and their authors.
+    @admin.display(description='Post')
+    def post_ref(self, obj):
+        return obj.post_id
+
+    @admin.display(description='Parent')
+    def parent_ref(self, obj):
+        return obj.parent_id
+
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content Preview'
@@ -65,4 +154,4 @@ class CommentAdmin(admin.ModelAdmin):
 
 # Re-register UserAdmin
 admin.site.unregister(User)
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+admin.site.register(User, UserAdmin)
@@ -0,0 +1,107 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Build a strong ETag from any number of hashable validator parts"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def queryset_watermark(queryset, field='updated_at'):
+    """Return (max(field), row count) for a queryset using one aggregate query"""
+    result = queryset.order_by().aggregate(last=Max(field), total=Count('pk'))
+    return result['last'], result['total']
+
+
+def latest(*timestamps):
+    """Most recent of the given datetimes, ignoring missing ones"""
+    present = [ts for ts in timestamps if ts is not None]
+    return max(present) if present else None
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for generic list and detail views.
+
+    Views implement ``get_list_validators(queryset)`` and/or
+    ``get_object_validators(instance)`` returning ``(etag_parts, last_modified)``.
+    Validators are checked against If-None-Match / If-Modified-Since before the
+    serializer runs, so an unchanged resource costs only the validator queries.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # Pagination and filter params change the body, so they are part of the tag.
+        etag_parts, last_modified = self.get_list_validators(queryset)
+        etag, last_modified = self._finalize_validators(
+            request, (request.get_full_path(),) + tuple(etag_parts), last_modified
+        )
+        not_modified = self._not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            response = Response(serializer.data)
+        return self._with_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag_parts, last_modified = self.get_object_validators(instance)
+        etag, last_modified = self._finalize_validators(request, etag_parts, last_modified)
+        not_modified = self._not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        return self._with_validators(Response(serializer.data), etag, last_modified)
+
+    def get_list_validators(self, queryset):
+        last_modified, total = queryset_watermark(queryset)
+        return (last_modified, total), last_modified
+
+    def page_queryset(self, queryset):
+        """The slice of ``queryset`` a page number paginator serves for this request, without its COUNT"""
+        paginator = self.paginator
+        try:
+            size = paginator.get_page_size(self.request)
+            number = int(self.request.query_params.get(paginator.page_query_param, 1))
+        except (AttributeError, TypeError, ValueError):
+            # No paginator, another pagination style, or ?page=last: the whole list.
+            return queryset
+        if not size or number < 1:
+            return queryset
+        return queryset[(number - 1) * size:number * size]
+
+    def get_object_validators(self, instance):
+        return (instance.pk, instance.updated_at), instance.updated_at
+
+    def _finalize_validators(self, request, etag_parts, last_modified):
+        # Responses embed per-user fields (is_liked, ...), so tags are per user.
+        etag = make_etag(self.__class__.__name__, request.user.pk, *etag_parts)
+        if last_modified is not None:
+            last_modified = timegm(last_modified.utctimetuple())
+        return etag, last_modified
+
+    def _not_modified(self, request, etag, last_modified):
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            self._with_validators(response, etag, last_modified)
+        return response
+
+    def _with_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
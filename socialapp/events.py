@@ -0,0 +1,135 @@
+"""
+In-process pub/sub for user-facing events (likes, comments, replies, connections).
+
+Publishers call ``publish(user_id, event)`` from any thread; subscribers are
+per-connection bounded queues living on an asyncio loop (see ``socialapp.sse``).
+The backend is pluggable through ``EVENT_BROKER_BACKEND`` so a cross-process
+transport can replace the default in-memory fan-out.
+"""
+import asyncio
+import itertools
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Post, Comment, Like, Connection
+
+
+class Subscriber:
+    """A bounded per-connection event queue bound to one asyncio loop"""
+
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.closed = False
+
+    def deliver(self, event):
+        """Thread-safe: hand the event to the subscriber's loop"""
+        if not self.closed:
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def close(self):
+        self.closed = True
+        self._put(None)
+
+    def _put(self, event):
+        # Slow readers lose their oldest events instead of growing the queue;
+        # the stream reports the gap so the client can resync.
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class InProcessBackend:
+    """Fans events out to subscribers registered in this process"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            self._subscribers[subscriber.user_id].add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            event = dict(event, id=next(self._ids))
+        for subscriber in subscribers:
+            subscriber.deliver(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'EVENT_BROKER_BACKEND', 'socialapp.events.InProcessBackend')
+                _broker = import_string(backend)()
+    return _broker
+
+
+def publish(user_id, event):
+    get_broker().publish(user_id, event)
+
+
+def events_for(instance, created):
+    """Return ``(recipient_id, event)`` pairs for a saved Like, Comment or Connection"""
+    if isinstance(instance, Like):
+        if not created:
+            return []
+        author_id = Post.objects.filter(pk=instance.post_id).values_list('author_id', flat=True).first()
+        event = {'type': 'like', 'post': str(instance.post_id), 'actor': instance.user_id}
+        return [(author_id, event)] if author_id not in (None, instance.user_id) else []
+
+    if isinstance(instance, Comment):
+        if not created:
+            return []
+        recipients = []
+        author_id = Post.objects.filter(pk=instance.post_id).values_list('author_id', flat=True).first()
+        if author_id not in (None, instance.author_id):
+            recipients.append((author_id, {
+                'type': 'comment', 'post': str(instance.post_id),
+                'comment': instance.pk, 'actor': instance.author_id,
+            }))
+        if instance.parent_id:
+            parent_author_id = Comment.objects.filter(pk=instance.parent_id).values_list('author_id', flat=True).first()
+            if parent_author_id not in (None, instance.author_id):
+                recipients.append((parent_author_id, {
+                    'type': 'reply', 'post': str(instance.post_id), 'comment': instance.pk,
+                    'parent': instance.parent_id, 'actor': instance.author_id,
+                }))
+        return recipients
+
+    if isinstance(instance, Connection):
+        if created:
+            return [(instance.receiver_id, {
+                'type': 'connection_request', 'connection': instance.pk, 'actor': instance.sender_id,
+            })]
+        if instance.status == 'accepted':
+            return [(instance.sender_id, {
+                'type': 'connection_accepted', 'connection': instance.pk, 'actor': instance.receiver_id,
+            })]
+    return []
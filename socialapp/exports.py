@@ -0,0 +1,185 @@
+"""
+Constant-memory export of a user's data.
+
+Each section is read in keyset batches (``pk > last`` ordered by pk) with
+``.values().iterator(chunk_size=...)``, so no query holds a cursor across the
+whole table and no batch is cached on the queryset. Rows are written as
+NDJSON straight into ``zipfile`` entries and media files are copied into the
+archive in fixed-size blocks, so peak memory depends on the batch size, not
+on how much the user has posted.
+
+Finished exports are deleted, archive and row, ``EXPORT_RETENTION`` after
+they finish by ``prune_expired``, which export requests schedule at most once
+per ``EXPORT_PRUNE_INTERVAL``.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+from .models import Comment, Connection, DataExport, Like, Post, UserProfile
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Interval slot of the last prune this process scheduled.
+_scheduled_slot = None
+
+
+def export_setting(name, default):
+    return getattr(settings, name, default)
+
+
+# name -> (queryset for the user, exported fields)
+SECTIONS = {
+    'profile': (
+        lambda user: UserProfile.objects.filter(user=user),
+        ('user__username', 'user__email', 'user__first_name', 'user__last_name', 'user__date_joined',
+         'bio', 'slug', 'profile_picture', 'created_at', 'updated_at'),
+    ),
+    'posts': (
+        lambda user: Post.objects.filter(author=user),
+        ('id', 'content', 'image', 'created_at', 'updated_at'),
+    ),
+    'comments': (
+        lambda user: Comment.objects.filter(author=user),
+        ('id', 'post_id', 'parent_id', 'content', 'created_at', 'updated_at'),
+    ),
+    'likes': (
+        lambda user: Like.objects.filter(user=user),
+        ('id', 'post_id', 'created_at'),
+    ),
+    'connections': (
+        lambda user: Connection.objects.filter(Q(sender=user) | Q(receiver=user)),
+        ('id', 'sender__username', 'receiver__username', 'status', 'created_at', 'updated_at'),
+    ),
+}
+
+
+def keyset_batches(queryset, fields, batch_size):
+    """Yield lists of ``values()`` rows ordered by pk, one bounded query per batch"""
+    queryset = queryset.order_by('pk').values('pk', *fields)
+    last = None
+    while True:
+        page = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(page[:batch_size].iterator(chunk_size=batch_size))
+        if not batch:
+            return
+        last = batch[-1]['pk']
+        yield batch
+        if len(batch) < batch_size:
+            return
+
+
+def media_files(user, batch_size):
+    """Storage names of the user's profile picture and post images"""
+    picture = UserProfile.objects.filter(user=user).exclude(profile_picture='').values_list('profile_picture', flat=True).first()
+    if picture:
+        yield picture
+    images = Post.objects.filter(author=user).exclude(image='').exclude(image__isnull=True)
+    for batch in keyset_batches(images, ('image',), batch_size):
+        for row in batch:
+            yield row['image']
+
+
+def write_archive(export, path, batch_size):
+    """Write every section and media file of ``export.user`` into the zip at ``path``"""
+    user = export.user
+    written = 0
+    with ZipFile(path, 'w', compression=ZIP_DEFLATED, allowZip64=True) as archive:
+        for section, (queryset_for, fields) in SECTIONS.items():
+            DataExport.objects.filter(pk=export.pk).update(section=section)
+            with archive.open(f'{section}.ndjson', 'w', force_zip64=True) as entry:
+                for batch in keyset_batches(queryset_for(user), fields, batch_size):
+                    for row in batch:
+                        row.pop('pk')
+                        entry.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b'\n')
+                    written += len(batch)
+                    DataExport.objects.filter(pk=export.pk).update(rows_written=written)
+        DataExport.objects.filter(pk=export.pk).update(section='media')
+        for name in media_files(user, batch_size):
+            if not default_storage.exists(name):
+                continue
+            # Media is already compressed; storing it avoids burning CPU for nothing.
+            info = ZipInfo(f'media/{name}', timezone.localtime().timetuple()[:6])
+            info.compress_type = ZIP_STORED
+            with default_storage.open(name) as source, archive.open(info, 'w', force_zip64=True) as entry:
+                shutil.copyfileobj(source, entry, COPY_BUFFER_SIZE)
+    return written
+
+
+def count_rows(user):
+    return sum(queryset_for(user).count() for queryset_for, _ in SECTIONS.values())
+
+
+def build_export(export):
+    """Run an export to completion, recording progress and the resulting archive"""
+    batch_size = export_setting('DATA_EXPORT_BATCH_SIZE', 2000)
+    DataExport.objects.filter(pk=export.pk).update(status='running', rows_total=count_rows(export.user))
+    name = f'exports/{export.user_id}/{export.pk}.zip'
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.part'
+    try:
+        written = write_archive(export, partial, batch_size)
+        os.replace(partial, path)
+    except Exception as exc:
+        if os.path.exists(partial):
+            os.remove(partial)
+        DataExport.objects.filter(pk=export.pk).update(
+            status='failed', error=repr(exc), finished_at=timezone.now()
+        )
+        raise
+    DataExport.objects.filter(pk=export.pk).update(
+        status='succeeded', archive=name, size=os.path.getsize(path), section='',
+        rows_written=written, finished_at=timezone.now(),
+    )
+
+
+def active_export(user):
+    return DataExport.objects.filter(user=user, status__in=['pending', 'running']).first()
+
+
+def delete_exports(queryset):
+    """Delete these exports' rows, then their archives; returns the number deleted"""
+    rows = list(queryset.values_list('pk', 'archive'))
+    DataExport.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+    for _, name in rows:
+        if name:
+            default_storage.delete(name)
+    return len(rows)
+
+
+def prune_expired(retention=None, batch_size=None):
+    """Delete exports that finished more than ``retention`` ago; returns the number deleted"""
+    retention = retention or export_setting('EXPORT_RETENTION', timedelta(days=7))
+    batch_size = batch_size or export_setting('DATA_EXPORT_BATCH_SIZE', 2000)
+    expired = DataExport.objects.filter(
+        status__in=('succeeded', 'failed'), finished_at__lt=timezone.now() - retention
+    ).order_by('finished_at')
+    deleted = 0
+    while True:
+        batch = delete_exports(expired[:batch_size])
+        deleted += batch
+        if batch < batch_size:
+            return deleted
+
+
+def schedule_prune():
+    """Enqueue one prune per interval; each process tries once per interval"""
+    global _scheduled_slot
+    slot = int(time.time() // export_setting('EXPORT_PRUNE_INTERVAL', 3600))
+    if slot == _scheduled_slot:
+        return
+    _scheduled_slot = slot
+    from .tasks import prune_data_exports
+
+    transaction.on_commit(lambda: prune_data_exports.delay(idempotency_key=f'prune-exports:{slot}'))
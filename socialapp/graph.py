@@ -0,0 +1,212 @@
+"""
+Connection graph queries over cached adjacency lists.
+
+Each user's accepted connections are kept in the cache as an ascending list
+of user ids (for ``GRAPH_ADJACENCY_TTL`` seconds, dropped when one of their
+connections changes) and loaded from the database in batches on a miss.
+Mutual connections are the intersection of two sorted lists. Degrees of
+separation come from a bidirectional breadth-first search that expands the
+smaller frontier each step and gives up after ``GRAPH_MAX_DEPTH`` hops or
+``GRAPH_TIME_BUDGET`` seconds, so a relationship badge costs the same bounded
+time on any graph size.
+"""
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Connection
+
+CACHE_PREFIX = 'graph:adjacency:'
+LOAD_BATCH_SIZE = 500
+LABELS = {0: 'self', 1: '1st', 2: '2nd', 3: '3rd'}
+
+
+def graph_setting(name, default):
+    return getattr(settings, name, default)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def load_adjacency(user_ids):
+    """Sorted accepted-connection ids of each user, read from the connections table"""
+    neighbours = {pk: set() for pk in user_ids}
+    accepted = Connection.objects.filter(status='accepted')
+    for start in range(0, len(user_ids), LOAD_BATCH_SIZE):
+        batch = user_ids[start:start + LOAD_BATCH_SIZE]
+        # Two single-column lookups; each is served by its own index, unlike an OR.
+        for sender, receiver in accepted.filter(sender_id__in=batch).values_list('sender_id', 'receiver_id'):
+            neighbours[sender].add(receiver)
+        for sender, receiver in accepted.filter(receiver_id__in=batch).values_list('sender_id', 'receiver_id'):
+            neighbours[receiver].add(sender)
+    return {pk: sorted(ids) for pk, ids in neighbours.items()}
+
+
+class Adjacency:
+    """Neighbour lists for one request, read through the shared cache"""
+
+    def __init__(self):
+        self.lists = {}
+
+    def get_many(self, user_ids):
+        missing = [pk for pk in user_ids if pk not in self.lists]
+        if missing:
+            cached = cache.get_many([f'{CACHE_PREFIX}{pk}' for pk in missing])
+            for key, ids in cached.items():
+                self.lists[int(key[len(CACHE_PREFIX):])] = ids
+            missing = [pk for pk in missing if pk not in self.lists]
+        if missing:
+            loaded = load_adjacency(missing)
+            cache.set_many(
+                {f'{CACHE_PREFIX}{pk}': ids for pk, ids in loaded.items()}, graph_setting('GRAPH_ADJACENCY_TTL', 300)
+            )
+            self.lists.update(loaded)
+        return {pk: self.lists[pk] for pk in user_ids}
+
+    def __getitem__(self, user_id):
+        return self.get_many([user_id])[user_id]
+
+
+def invalidate(*user_ids):
+    cache.delete_many([f'{CACHE_PREFIX}{pk}' for pk in user_ids])
+
+
+def intersect_sorted(a, b):
+    """Items common to two ascending lists, ascending"""
+    if len(a) > len(b):
+        a, b = b, a
+    common = []
+    if len(a) * 16 < len(b):
+        # Very different sizes: binary-search the short list's items in the long one.
+        position = 0
+        for item in a:
+            position = bisect_left(b, item, position)
+            if position == len(b):
+                break
+            if b[position] == item:
+                common.append(item)
+        return common
+    i = j = 0
+    while i < len(a) and j < len(b):
+        if a[i] < b[j]:
+            i += 1
+        elif a[i] > b[j]:
+            j += 1
+        else:
+            common.append(a[i])
+            i += 1
+            j += 1
+    return common
+
+
+def mutual_connections(user_id, other_id, adjacency=None):
+    """Ascending ids of the users connected to both"""
+    adjacency = adjacency or Adjacency()
+    lists = adjacency.get_many([user_id, other_id])
+    return [pk for pk in intersect_sorted(lists[user_id], lists[other_id]) if pk not in (user_id, other_id)]
+
+
+def connections_among(user_id, queryset, field='user_id', adjacency=None):
+    """
+    Ascending ids of ``user_id``'s accepted connections found in ``field`` of
+    ``queryset``. Reads about as many rows as the smaller side has: the
+    queryset's first rows when it is no longer than the connection list,
+    otherwise one indexed lookup per batch of (at most
+    ``GRAPH_INTERSECTION_MAX``) connections.
+    """
+    adjacency = adjacency or Adjacency()
+    connections = adjacency[user_id][:graph_setting('GRAPH_INTERSECTION_MAX', 5000)]
+    if not connections:
+        return []
+    values = list(queryset.values_list(field, flat=True)[:len(connections) + 1])
+    if len(values) <= len(connections):
+        return intersect_sorted(connections, sorted(set(values)))
+    found = set()
+    for start in range(0, len(connections), LOAD_BATCH_SIZE):
+        batch = connections[start:start + LOAD_BATCH_SIZE]
+        found.update(queryset.order_by().filter(**{f'{field}__in': batch}).values_list(field, flat=True))
+    return sorted(found)
+
+
+def expand(frontier, parents, other, adjacency, deadline):
+    """Visit the next level from ``frontier``; returns (next frontier, meeting node or None)"""
+    following = []
+    for start in range(0, len(frontier), LOAD_BATCH_SIZE):
+        if time.monotonic() > deadline:
+            raise SearchTimeout
+        for node, neighbours in adjacency.get_many(frontier[start:start + LOAD_BATCH_SIZE]).items():
+            for neighbour in neighbours:
+                if neighbour in parents:
+                    continue
+                parents[neighbour] = node
+                if neighbour in other:
+                    return following, neighbour
+                following.append(neighbour)
+    return following, None
+
+
+def shortest_path(source, target, max_depth=None, time_budget=None, adjacency=None):
+    """
+    (path, complete): user ids of a shortest path from ``source`` to
+    ``target`` of at most ``max_depth`` hops, or None; ``complete`` is False
+    when the time budget ran out before the search could tell.
+    """
+    if source == target:
+        return [source], True
+    adjacency = adjacency or Adjacency()
+    max_depth = max_depth or graph_setting('GRAPH_MAX_DEPTH', 3)
+    if time_budget is None:
+        time_budget = graph_setting('GRAPH_TIME_BUDGET', 0.05)
+    deadline = time.monotonic() + time_budget
+    # Each side maps the nodes it reached to the node it reached them from.
+    forward, backward = {source: None}, {target: None}
+    forward_frontier, backward_frontier = [source], [target]
+    try:
+        for _ in range(max_depth):
+            if not forward_frontier or not backward_frontier:
+                break
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = expand(forward_frontier, forward, backward, adjacency, deadline)
+            else:
+                backward_frontier, meeting = expand(backward_frontier, backward, forward, adjacency, deadline)
+            if meeting is not None:
+                return join(meeting, forward, backward), True
+    except SearchTimeout:
+        return None, False
+    return None, True
+
+
+def join(meeting, forward, backward):
+    path = []
+    node = meeting
+    while node is not None:
+        path.append(node)
+        node = forward[node]
+    path.reverse()
+    node = backward[meeting]
+    while node is not None:
+        path.append(node)
+        node = backward[node]
+    return path
+
+
+def relationship(user_id, other_id):
+    """Degree of separation, its badge label, a sample path and the mutual connection count"""
+    adjacency = Adjacency()
+    path, complete = shortest_path(user_id, other_id, adjacency=adjacency)
+    degree = len(path) - 1 if path else None
+    if degree is not None:
+        label = LABELS.get(degree, '3rd+')
+    else:
+        # Not within the depth limit is further than it; a timeout tells nothing.
+        label = '3rd+' if complete else None
+    return {
+        'degree': degree,
+        'label': label,
+        'path': path,
+        'complete': complete,
+        'mutual_connections_count': len(mutual_connections(user_id, other_id, adjacency)),
+    }
@@ -0,0 +1,346 @@
+"""
+Bulk import of users, profiles, posts, comments, likes and connections.
+
+Records are streamed from JSONL or CSV and buffered per type. A buffer is
+written with ``bulk_create`` once it holds ``batch_size`` records, after the
+buffers it depends on (users before posts, posts before comments and likes),
+so a file only has to list rows after the rows they refer to. Password hashes
+and profile slugs are computed in a process pool. Rows go straight to the
+database: signals, the change log and notifications do not fire, and the
+stored profile counts of affected users are dropped to be rebuilt on read.
+
+Record fields (``type`` selects the kind; CSV files may set it for the whole file):
+
+    user        username, email, password or password_hash, first_name, last_name, bio
+    post        id (optional UUID), author (username), content
+    comment     ref (optional), post (UUID), author, content, parent (ref of an earlier comment)
+    like        user, post
+    connection  sender, receiver, status
+"""
+import csv
+import json
+import multiprocessing
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .models import Comment, Connection, Like, Post, UserProfile
+from . import profiles
+
+TYPES = ('user', 'post', 'comment', 'like', 'connection')
+DEPENDENCIES = {
+    'user': (),
+    'post': ('user',),
+    'comment': ('user', 'post'),
+    'like': ('user', 'post'),
+    'connection': ('user',),
+}
+REQUIRED_FIELDS = {
+    'user': ('username',),
+    'post': ('author',),
+    'comment': ('post', 'author'),
+    'like': ('user', 'post'),
+    'connection': ('sender', 'receiver'),
+}
+INDEXED_TABLES = ('user_profiles', 'posts', 'comments', 'likes', 'connections')
+CONNECTION_STATUSES = {choice for choice, _ in Connection.STATUS_CHOICES}
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(path, fmt=None, record_type=None):
+    """Yield (line number, record dict) from a JSONL or CSV file without loading it"""
+    fmt = fmt or ('csv' if str(path).endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                record = {key: value for key, value in row.items() if value not in ('', None)}
+                record.setdefault('type', record_type)
+                yield line, record
+            return
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except json.JSONDecodeError as exc:
+                raise InvalidRecord(f'line {line}: {exc}') from exc
+            if record_type and 'type' not in record:
+                record['type'] = record_type
+            yield line, record
+
+
+def prepare_user(record):
+    """Pool worker: (slug base, password hash) for a user record"""
+    password_hash = record.get('password_hash') or make_password(record.get('password') or None)
+    return slugify(record['username']), password_hash
+
+
+@contextmanager
+def deferred_indexes(tables=INDEXED_TABLES):
+    """
+    Drop the non-unique indexes on ``tables`` and recreate them on exit.
+
+    Unique indexes stay so duplicates are still rejected. Only SQLite and
+    PostgreSQL expose index definitions to replay; elsewhere this is a no-op.
+    """
+    if connection.vendor == 'sqlite':
+        sql = (
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            "AND sql NOT LIKE 'CREATE UNIQUE%%' AND tbl_name IN (" + ', '.join(['%s'] * len(tables)) + ')'
+        )
+    elif connection.vendor == 'postgresql':
+        sql = (
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+            "AND indexdef NOT LIKE 'CREATE UNIQUE%%' AND tablename IN (" + ', '.join(['%s'] * len(tables)) + ')'
+        )
+    else:
+        yield []
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(tables))
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield [name for name, _ in indexes]
+    finally:
+        with connection.cursor() as cursor:
+            for _, definition in indexes:
+                cursor.execute(definition)
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE ' + ', '.join(connection.ops.quote_name(table) for table in tables))
+
+
+def post_key(value):
+    """Canonical string form of a post UUID, or None if it is not one"""
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+def existing_pairs(model, first, second, pairs):
+    """Those of the (first, second) value pairs that already have a row in ``model``"""
+    if not pairs:
+        return set()
+    rows = model.objects.filter(
+        **{f'{first}__in': {pair[0] for pair in pairs}, f'{second}__in': {pair[1] for pair in pairs}}
+    ).values_list(first, second)
+    found = {(str(a), str(b)) for a, b in rows}
+    return {pair for pair in pairs if (str(pair[0]), str(pair[1])) in found}
+
+
+class Importer:
+    def __init__(self, batch_size=5000, workers=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.buffers = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.skipped = defaultdict(int)
+        self.user_ids = {}
+        self.post_ids = set()
+        self.comment_ids = {}
+        self.pending_comment_refs = set()
+        self.slugs = set()
+        self.executor = None
+
+    def map(self, func, items):
+        if not self.workers or self.workers < 2 or len(items) < 2:
+            return list(map(func, items))
+        if self.executor is None:
+            # fork: workers inherit the configured Django settings (as in taskqueue.Worker).
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+        return list(self.executor.map(func, items, chunksize=max(1, len(items) // (self.workers * 4))))
+
+    def run(self, records):
+        """Import (line, record) pairs; returns {type: rows written}"""
+        try:
+            for line, record in records:
+                self.add(line, record)
+            for record_type in TYPES:
+                self.flush(record_type)
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+        return dict(self.counts)
+
+    def add(self, line, record):
+        record_type = record.get('type')
+        if record_type not in TYPES:
+            raise InvalidRecord(f'line {line}: unknown record type {record_type!r}')
+        missing = [field for field in REQUIRED_FIELDS[record_type] if not record.get(field)]
+        if missing:
+            raise InvalidRecord(f"line {line}: {record_type} record is missing {', '.join(missing)}")
+        if record_type == 'comment':
+            if record.get('parent') is not None and str(record['parent']) in self.pending_comment_refs:
+                # The parent is still buffered; write it first so its id is known.
+                self.flush('comment')
+            if record.get('ref') is not None:
+                self.pending_comment_refs.add(str(record['ref']))
+        self.buffers[record_type].append(record)
+        if len(self.buffers[record_type]) >= self.batch_size:
+            self.flush(record_type)
+
+    def flush(self, record_type):
+        for dependency in DEPENDENCIES[record_type]:
+            self.flush(dependency)
+        records = self.buffers.pop(record_type, [])
+        if not records:
+            return
+        with transaction.atomic():
+            written = getattr(self, f'write_{record_type}s')(records)
+        self.counts[record_type] += written
+        self.skipped[record_type] += len(records) - written
+
+    def resolve_users(self, usernames):
+        missing = set(usernames) - self.user_ids.keys()
+        if missing:
+            self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+
+    def resolve_posts(self, post_ids):
+        missing = {post_key(post_id) for post_id in post_ids} - self.post_ids - {None}
+        if missing:
+            self.post_ids.update(str(pk) for pk in Post.objects.filter(pk__in=missing).values_list('pk', flat=True))
+
+    def assign_slugs(self, bases):
+        """Same scheme as UserProfile.save (base, base-1, ...) without a query per row"""
+        existing = set(UserProfile.objects.filter(slug__in=set(bases)).values_list('slug', flat=True))
+        slugs = []
+        for base in bases:
+            slug, counter = base, 1
+            while slug in self.slugs or slug in existing or (
+                slug != base and UserProfile.objects.filter(slug=slug).exists()
+            ):
+                slug = f'{base}-{counter}'
+                counter += 1
+            self.slugs.add(slug)
+            slugs.append(slug)
+        return slugs
+
+    def write_users(self, records):
+        self.resolve_users(record['username'] for record in records)
+        new, seen = [], set()
+        for record in records:
+            if record['username'] not in self.user_ids and record['username'] not in seen:
+                seen.add(record['username'])
+                new.append(record)
+        if not new:
+            return 0
+        prepared = self.map(prepare_user, new)
+        users = User.objects.bulk_create(
+            User(
+                username=record['username'],
+                email=record.get('email', ''),
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                password=password_hash,
+            )
+            for record, (_, password_hash) in zip(new, prepared)
+        )
+        if any(user.pk is None for user in users):
+            # Backends that cannot return ids from bulk inserts.
+            ids = dict(User.objects.filter(username__in=seen).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+        slugs = self.assign_slugs([base for base, _ in prepared])
+        UserProfile.objects.bulk_create(
+            UserProfile(user=user, slug=slug, bio=record.get('bio', ''))
+            for user, slug, record in zip(users, slugs, new)
+        )
+        self.user_ids.update((user.username, user.pk) for user in users)
+        return len(users)
+
+    def write_posts(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        self.resolve_posts(record['id'] for record in records if record.get('id'))
+        posts, seen = [], set()
+        for record in records:
+            author_id = self.user_ids.get(record.get('author'))
+            post_id = post_key(record['id']) if record.get('id') else str(uuid.uuid4())
+            # Posts with an id that already exists are skipped, so re-running an import is safe.
+            if author_id is None or post_id is None or post_id in self.post_ids or post_id in seen:
+                continue
+            seen.add(post_id)
+            posts.append(Post(id=post_id, author_id=author_id, content=record.get('content', '')))
+        Post.objects.bulk_create(posts)
+        profiles.forget({post.author_id for post in posts})
+        self.post_ids.update(str(post.pk) for post in posts)
+        return len(posts)
+
+    def write_comments(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        self.resolve_posts(record['post'] for record in records)
+        comments, refs = [], []
+        for record in records:
+            author_id = self.user_ids.get(record.get('author'))
+            parent = record.get('parent')
+            parent_id = self.comment_ids.get(str(parent)) if parent is not None else None
+            if author_id is None or post_key(record.get('post')) not in self.post_ids or (parent is not None and parent_id is None):
+                continue
+            comments.append(Comment(post_id=post_key(record['post']), author_id=author_id, parent_id=parent_id,
+                                    content=record.get('content', '')))
+            refs.append(record.get('ref'))
+        Comment.objects.bulk_create(comments)
+        self.comment_ids.update((str(ref), comment.pk) for ref, comment in zip(refs, comments) if ref is not None)
+        self.pending_comment_refs.clear()
+        return len(comments)
+
+    def write_likes(self, records):
+        self.resolve_users(record.get('user') for record in records)
+        self.resolve_posts(record['post'] for record in records)
+        pairs = {
+            (self.user_ids[record['user']], post_key(record['post']))
+            for record in records
+            if record.get('user') in self.user_ids and post_key(record.get('post')) in self.post_ids
+        }
+        pairs -= existing_pairs(Like, 'user_id', 'post_id', pairs)
+        likes = [Like(user_id=user_id, post_id=post_id) for user_id, post_id in pairs]
+        # Likes made concurrently are still dropped by the (user, post) unique constraint.
+        Like.objects.bulk_create(likes, ignore_conflicts=True)
+        return len(likes)
+
+    def write_connections(self, records):
+        self.resolve_users([record.get('sender') for record in records] + [record.get('receiver') for record in records])
+        # One connection per pair of users, whichever of them sent it: keyed
+        # by (lower id, higher id), first record wins.
+        pairs = {}
+        for record in records:
+            sender_id = self.user_ids.get(record.get('sender'))
+            receiver_id = self.user_ids.get(record.get('receiver'))
+            status = record.get('status', 'pending')
+            if sender_id is None or receiver_id is None or sender_id == receiver_id or status not in CONNECTION_STATUSES:
+                continue
+            pairs.setdefault((min(sender_id, receiver_id), max(sender_id, receiver_id)), (sender_id, receiver_id, status))
+        both_directions = set(pairs) | {(second, first) for first, second in pairs}
+        for first, second in existing_pairs(Connection, 'sender_id', 'receiver_id', both_directions):
+            pairs.pop((min(first, second), max(first, second)), None)
+        connections = [
+            Connection(sender_id=sender_id, receiver_id=receiver_id, status=status)
+            for sender_id, receiver_id, status in pairs.values()
+        ]
+        Connection.objects.bulk_create(connections, ignore_conflicts=True)
+        profiles.forget({pk for row in connections if row.status == 'accepted' for pk in (row.sender_id, row.receiver_id)})
+        return len(connections)
+
+
+def import_file(path, fmt=None, record_type=None, batch_size=5000, workers=None, defer_indexes=False):
+    """Import one file; returns (rows written by type, rows skipped by type, seconds)"""
+    started = time.perf_counter()
+    importer = Importer(batch_size=batch_size, workers=workers)
+    records = read_records(path, fmt, record_type)
+    if defer_indexes:
+        with deferred_indexes():
+            importer.run(records)
+    else:
+        importer.run(records)
+    return dict(importer.counts), dict(importer.skipped), time.perf_counter() - started
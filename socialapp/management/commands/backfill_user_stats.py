@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from socialapp.profiles import backfill
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored post and connection counts of every user, in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = backfill(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed counts of {written} users in {time.perf_counter() - started:.2f}s'
+        ))
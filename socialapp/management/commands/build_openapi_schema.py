@@ -0,0 +1,25 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from social_media_backend.schema import FORMATS, clear_cache, render_schema, schema_dir
+
+
+class Command(BaseCommand):
+    help = 'Write the OpenAPI schema as JSON and YAML to OPENAPI_SCHEMA_DIR for the cached schema views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Default: OPENAPI_SCHEMA_DIR')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or schema_dir()
+        os.makedirs(directory, exist_ok=True)
+        for fmt, (name, _, _) in FORMATS.items():
+            path = os.path.join(directory, name)
+            body = render_schema(fmt)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(body)
+            os.replace(path + '.tmp', path)
+            self.stdout.write(f'{path}: {len(body)} bytes')
+        clear_cache()
+        self.stdout.write(self.style.SUCCESS('OpenAPI schema written'))
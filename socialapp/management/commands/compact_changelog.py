@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from socialapp.sync import compact_change_log
+
+
+class Command(BaseCommand):
+    help = 'Remove superseded change log entries and expired tombstones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        deleted = compact_change_log(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} change log entries'))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from socialapp.storage import collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = 'Remove stored media blobs that no row refers to any more, in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--grace-seconds', type=int, default=None,
+                            help='Keep blobs released this recently (default MEDIA_GC_GRACE)')
+        parser.add_argument('--recount', action='store_true',
+                            help='First rebuild reference counts from the posts and profiles')
+    
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = recount_references(batch_size=options['batch_size'])
+            self.stdout.write(f'Corrected {fixed} reference counts')
+        grace = options['grace_seconds']
+        removed, freed = collect_garbage(
+            grace=None if grace is None else timedelta(seconds=grace), batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} unreferenced blobs ({freed} bytes)'))
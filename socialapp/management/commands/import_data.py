@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from socialapp.importer import TYPES, InvalidRecord, import_file
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users, profiles, posts, comments, likes and connections from JSONL or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Default: from the file extension')
+        parser.add_argument('--type', choices=TYPES, help='Record type for files without a "type" field')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processes hashing passwords')
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help='Drop non-unique indexes during the import and rebuild them afterwards')
+
+    def handle(self, *args, **options):
+        try:
+            written, skipped, elapsed = import_file(
+                options['path'],
+                fmt=options['format'],
+                record_type=options['type'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                defer_indexes=options['defer_indexes'],
+            )
+        except (InvalidRecord, OSError) as exc:
+            raise CommandError(str(exc))
+
+        for record_type in TYPES:
+            if written.get(record_type) or skipped.get(record_type):
+                self.stdout.write(f"{record_type:12} {written.get(record_type, 0):>10} written {skipped.get(record_type, 0):>8} skipped")
+        total = sum(written.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from socialapp.tokens import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete expired knox auth tokens in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        deleted = purge_expired(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {deleted} expired tokens in {elapsed:.2f}s ({deleted / max(elapsed, 1e-9):.0f} rows/s)'
+        ))
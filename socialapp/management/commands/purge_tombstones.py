@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from socialapp.purge import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Physically remove comments and posts soft-deleted before SOFT_DELETE_RETENTION'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        comments, posts = purge_tombstones(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {comments} comment tombstones and {posts} deleted posts'))
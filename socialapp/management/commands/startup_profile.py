@@ -0,0 +1,78 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Environment overrides per profile; see API_ONLY in settings.py
+PROFILES = {
+    'full': {'DJANGO_API_ONLY': 'false'},
+    'api': {'DJANGO_API_ONLY': 'true'},
+}
+WATCHED = ('drf_yasg', 'django.contrib.admin', 'django.contrib.staticfiles', 'knox', 'corsheaders', 'PIL', 'yaml')
+
+# Runs in a fresh interpreter with -X importtime; reports on stdout.
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': len(sys.modules),
+    'loaded': [name for name in {watched!r} if name in sys.modules],
+}}))
+'''
+
+
+def parse_importtime(stderr):
+    """Self import time in microseconds summed per top-level package"""
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Measure cold start time, peak RSS and import cost of a worker for each settings profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=PROFILES, action='append', help='Default: all profiles')
+        parser.add_argument('--module', default='social_media_backend.wsgi', help='Module a worker imports')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10, help='Packages to list by import time')
+
+    def probe(self, module, overrides):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, **overrides)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, watched=WATCHED)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or list(PROFILES)
+        self.stdout.write(f"{'profile':8} {'start ms':>9} {'RSS MiB':>8} {'modules':>8}  loaded")
+        breakdowns = {}
+        for name in profiles:
+            runs = [self.probe(options['module'], PROFILES[name]) for _ in range(options['runs'])]
+            reports = [report for report, _ in runs]
+            breakdowns[name] = runs[-1][1]
+            self.stdout.write(
+                f"{name:8} {statistics.median(r['seconds'] for r in reports) * 1000:>9.1f} "
+                f"{statistics.median(r['rss_kb'] for r in reports) / 1024:>8.1f} "
+                f"{reports[-1]['modules']:>8}  {', '.join(reports[-1]['loaded'])}"
+            )
+        for name, totals in breakdowns.items():
+            self.stdout.write(f'\nSlowest packages to import ({name}):')
+            for package, microseconds in sorted(totals.items(), key=lambda item: -item[1])[:options['top']]:
+                self.stdout.write(f'  {package:28} {microseconds / 1000:>8.1f} ms')
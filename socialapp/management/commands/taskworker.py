@@ -0,0 +1,52 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils.module_loading import autodiscover_modules
+
+from socialapp.models import Task
+from socialapp.taskqueue import Worker, metrics
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks queued with @task(...).delay()'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=getattr(settings, 'TASKWORKER_CONCURRENCY', 4),
+            help='Task threads or processes; default: the TASKWORKER_CONCURRENCY setting',
+        )
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--stats', action='store_true', help='Print queue counts by task and status, then exit')
+    
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        
+        if options['stats']:
+            rows = Task.objects.values('name', 'status').annotate(total=Count('id')).order_by('name', 'status')
+            for row in rows:
+                self.stdout.write(f"{row['name']:60} {row['status']:10} {row['total']}")
+            return
+        
+        worker = Worker(concurrency=options['concurrency'], pool=options['pool'])
+        # Let the running tasks finish, then exit.
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+        
+        self.stdout.write(f"Worker {worker.worker_id} started ({options['pool']} pool x{options['concurrency']})")
+        started = time.monotonic()
+        worker.run(poll_interval=options['poll_interval'], burst=options['burst'])
+        self.report(time.monotonic() - started)
+    
+    def report(self, elapsed):
+        for name, stats in sorted(metrics.snapshot().items()):
+            runs = stats['succeeded'] + stats['retried'] + stats['failed'] + stats['lost']
+            self.stdout.write(
+                f"{name}: {stats['succeeded']} ok, {stats['retried']} retried, {stats['failed']} failed, "
+                f"{stats['lost']} lost, avg {stats['seconds'] / runs * 1000:.1f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped after {elapsed:.1f}s'))
@@ -0,0 +1,160 @@
+"""
+In-process request metrics with HDR-style histograms and Prometheus export.
+
+Histograms use log-linear buckets: every power of two is split into
+``SUB_BUCKETS`` equal slices, so any recorded value is known to within
+1 / SUB_BUCKETS of itself at constant memory. Metrics are per process; with
+several gunicorn workers each one reports its own series.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+SUB_BUCKETS = 8
+
+
+class Histogram:
+    def __init__(self, lowest=1.0):
+        # Values below ``lowest`` share bucket 0.
+        self.lowest = lowest
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def bucket_index(self, value):
+        scaled = value / self.lowest
+        if scaled < 1:
+            return 0
+        exponent = int(math.log2(scaled))
+        sub = min(int((scaled / 2 ** exponent - 1) * SUB_BUCKETS), SUB_BUCKETS - 1)
+        return 1 + exponent * SUB_BUCKETS + sub
+
+    def upper_bound(self, index):
+        if index == 0:
+            return self.lowest
+        exponent, sub = divmod(index - 1, SUB_BUCKETS)
+        return self.lowest * 2 ** exponent * (1 + (sub + 1) / SUB_BUCKETS)
+
+    def record(self, value):
+        self.buckets[self.bucket_index(value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (q in 0..100)"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Counts of values <= each bound; exact for bounds that are lowest * 2**k"""
+        result = []
+        for bound in bounds:
+            result.append(sum(n for index, n in self.buckets.items() if self.upper_bound(index) <= bound * (1 + 1e-9)))
+        return result
+
+
+class Registry:
+    """Histograms keyed by (metric, route) plus simple counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = defaultdict(int)
+
+    def observe(self, metric, route, value, lowest):
+        with self._lock:
+            histogram = self.histograms.get((metric, route))
+            if histogram is None:
+                histogram = self.histograms[(metric, route)] = Histogram(lowest)
+            histogram.record(value)
+
+    def increment(self, metric, route, amount=1):
+        with self._lock:
+            self.counters[(metric, route)] += amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = Registry()
+
+# name -> (help, unit scale for export, lowest recorded value, exported bucket bounds)
+TIME_BOUNDS_MS = [0.25 * 2 ** k for k in range(17)]
+COUNT_BOUNDS = [2 ** k for k in range(11)]
+HISTOGRAMS = {
+    'request_duration_seconds': ('Total request latency', 1000, 0.25, TIME_BOUNDS_MS),
+    'request_db_seconds': ('Time spent in database queries', 1000, 0.25, TIME_BOUNDS_MS),
+    'request_serializer_seconds': ('Time spent rendering the response body', 1000, 0.25, TIME_BOUNDS_MS),
+    'request_queries': ('Database queries per request', 1, 1, COUNT_BOUNDS),
+}
+COUNTERS = {
+    'query_budget_exceeded_total': 'Requests that ran more queries than their route budget',
+}
+PREFIX = 'socialapp_'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(reg=None):
+    """Prometheus text exposition (version 0.0.4) of the registry"""
+    reg = reg or registry
+    with reg._lock:
+        histograms = {key: histogram for key, histogram in reg.histograms.items()}
+        counters = dict(reg.counters)
+        lines = []
+        for metric, (help_text, scale, _, bounds) in HISTOGRAMS.items():
+            name = PREFIX + metric
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (key_metric, route), histogram in sorted(histograms.items()):
+                if key_metric != metric:
+                    continue
+                label = f'route="{_escape(route)}"'
+                for bound, count in zip(bounds, histogram.cumulative(bounds)):
+                    lines.append(f'{name}_bucket{{{label},le="{bound / scale:g}"}} {count}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{{label}}} {histogram.sum / scale:g}')
+                lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        for metric, help_text in COUNTERS.items():
+            name = PREFIX + metric
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for (key_metric, route), value in sorted(counters.items()):
+                if key_metric == metric:
+                    lines.append(f'{name}{{route="{_escape(route)}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    """Per-request accumulator filled by the DB execute wrapper and the response renderer"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+current_stats = ContextVar('socialapp_request_stats', default=None)
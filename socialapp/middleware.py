@@ -0,0 +1,78 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import HISTOGRAMS, RequestStats, current_stats, registry
+from .routers import routing_scope
+
+perf_logger = logging.getLogger('socialapp.perf')
+
+
+class ReplicaRoutingMiddleware:
+    """Scope database routing to the request and record writes for stickiness"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with routing_scope(request) as state:
+            response = self.get_response(request)
+            state.record_write()
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, DB time, response rendering time and latency per URL route.
+    
+    Routes are keyed by their namespaced URL name (``socialapp:post-list-create``).
+    Requests over their route's entry in ``QUERY_BUDGETS`` (or
+    ``DEFAULT_QUERY_BUDGET``) are logged to ``socialapp.perf``.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        elapsed = time.perf_counter() - started
+        
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        self.record(route, stats, elapsed)
+        self.check_budget(request, route, stats, elapsed)
+        return response
+    
+    def record(self, route, stats, elapsed):
+        values = {
+            'request_duration_seconds': elapsed * 1000,
+            'request_db_seconds': stats.db_time * 1000,
+            'request_serializer_seconds': stats.serializer_time * 1000,
+            'request_queries': stats.queries,
+        }
+        for metric, value in values.items():
+            registry.observe(metric, route, value, lowest=HISTOGRAMS[metric][2])
+    
+    def check_budget(self, request, route, stats, elapsed):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(route, getattr(settings, 'DEFAULT_QUERY_BUDGET', None))
+        if budget is None or stats.queries <= budget:
+            return
+        registry.increment('query_budget_exceeded_total', route)
+        perf_logger.warning(
+            '%s %s (%s) ran %d queries (budget %d), db %.1f ms, render %.1f ms, total %.1f ms',
+            request.method, request.path, route, stats.queries, budget,
+            stats.db_time * 1000, stats.serializer_time * 1000, elapsed * 1000,
+        )
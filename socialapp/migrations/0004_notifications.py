@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('socialapp', '0003_change_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'notification_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('like', 'Like'), ('comment', 'Comment'), ('reply', 'Reply'), ('connection_request', 'Connection request'), ('connection_accepted', 'Connection accepted')], max_length=20)),
+                ('target', models.CharField(max_length=64)),
+                ('actor_count', models.PositiveIntegerField(default=0)),
+                ('recent_actors', models.JSONField(blank=True, default=list)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'notifications',
+                'indexes': [models.Index(fields=['recipient', '-updated_at', '-id'], name='notifications_inbox_idx'), models.Index(fields=['recipient', 'verb', 'target', 'is_read'], name='notifications_rollup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:41
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialapp', '0005_tasks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataExport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('archive', models.FileField(blank=True, upload_to='exports/')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('section', models.CharField(blank=True, max_length=20)),
+                ('rows_written', models.PositiveBigIntegerField(default=0)),
+                ('rows_total', models.PositiveBigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='data_exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'data_exports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knox', '0008_remove_authtoken_salt'),
+        ('socialapp', '0008_soft_delete_comments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthTokenDevice',
+            fields=[
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='device', serialize=False, to='knox.authtoken')),
+                ('fingerprint', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_devices', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'auth_token_devices',
+                'indexes': [models.Index(fields=['user', 'fingerprint'], name='token_devices_user_idx')],
+            },
+        ),
+        # knox_authtoken has no index on expiry; the batched purge walks it.
+        migrations.RunSQL(
+            'CREATE INDEX knox_authtoken_expiry_idx ON knox_authtoken (expiry)',
+            'DROP INDEX knox_authtoken_expiry_idx',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialapp', '0011_author_timeline_user_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='likes_post_recent_idx'),
+        ),
+    ]
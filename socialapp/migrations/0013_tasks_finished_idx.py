@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialapp', '0012_likes_post_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('finished_at__isnull', False)), fields=['finished_at'], name='tasks_finished_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialapp', '0014_comment_author_set_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthTokenPurgeStats',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('runs', models.PositiveBigIntegerField(default=0)),
+                ('deleted', models.PositiveBigIntegerField(default=0)),
+                ('seconds', models.FloatField(default=0.0)),
+                ('last_deleted', models.PositiveBigIntegerField(default=0)),
+                ('last_seconds', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'auth_token_purge_stats',
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+
+def merge_duplicate_unread(apps, schema_editor):
+    """Fold unread rows a racing flush duplicated into the newest one, so the constraint can be added"""
+    Notification = apps.get_model('socialapp', 'Notification')
+    NotificationCounter = apps.get_model('socialapp', 'NotificationCounter')
+    duplicated = (
+        Notification.objects.filter(is_read=False).values('recipient_id', 'verb', 'target')
+        .annotate(rows=Count('id')).filter(rows__gt=1)
+    )
+    for group in duplicated:
+        rows = list(
+            Notification.objects.filter(
+                is_read=False, recipient_id=group['recipient_id'], verb=group['verb'], target=group['target'],
+            ).order_by('-updated_at', '-id')
+        )
+        keep, extra = rows[0], rows[1:]
+        seen = {actor['id'] for actor in keep.recent_actors}
+        for row in extra:
+            keep.actor_count += row.actor_count
+            keep.recent_actors += [actor for actor in row.recent_actors if actor['id'] not in seen]
+            seen.update(actor['id'] for actor in row.recent_actors)
+        keep.recent_actors = keep.recent_actors[:3]
+        keep.save(update_fields=['actor_count', 'recent_actors'])
+        Notification.objects.filter(pk__in=[row.pk for row in extra]).delete()
+        NotificationCounter.objects.filter(user_id=group['recipient_id']).update(
+            unread=Greatest(F('unread') - len(extra), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('socialapp', '0015_auth_token_purge_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_unread, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notifications_rollup_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False)), fields=('recipient', 'verb', 'target'), name='notifications_unread_unique'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import FileExtensionValidator
+from knox.models import AuthToken
 import uuid
 
 
@@ -21,9 +23,13 @@ class UserProfile(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.user.username)
+            # Every taken slug of the base-N series in one query, not one query per collision.
+            taken = set(UserProfile.objects.filter(
+                models.Q(slug=base_slug) | models.Q(slug__startswith=f"{base_slug}-")
+            ).values_list('slug', flat=True))
             slug = base_slug
             counter = 1
-            while UserProfile.objects.filter(slug=slug).exists():
+            while slug in taken:
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
@@ -36,6 +42,13 @@ class UserProfile(models.Model):
         db_table = 'user_profiles'
 
 
+class LiveManager(models.Manager):
+    """Default manager that hides soft-deleted rows (``deleted_at`` set)"""
+    
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Post(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
@@ -48,17 +61,43 @@ class Post(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when the post is deleted; the row is purged later by a background task.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = LiveManager()
+    all_objects = models.Manager()
     
     def __str__(self):
         return f"Post by {self.author.username} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
     
     @property
     def likes_count(self):
+        # Annotated by the post list views (views.annotated_posts).
+        if hasattr(self, 'likes_total'):
+            return self.likes_total
         return self.likes.count()
     
+    def get_thread_comments(self):
+        """The comments shown under this post; the post views prefetch them as ``thread_comments``"""
+        if not hasattr(self, 'thread_comments'):
+            self.thread_comments = list(Comment.thread().filter(post=self).select_related('author'))
+        return self.thread_comments
+    
     class Meta:
         db_table = 'posts'
         ordering = ['-created_at']
+        # Partial indexes: live rows for the feed, deleted rows for the purge job.
+        indexes = [
+            models.Index(fields=['-created_at'], condition=models.Q(deleted_at__isnull=True), name='posts_live_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='posts_deleted_idx'),
+            # All rows, live and deleted, in the admin changelist order.
+            models.Index(fields=['-created_at', '-id'], name='posts_admin_idx'),
+            # An author's timeline: equality on author, then the keyset order.
+            models.Index(
+                fields=['author', '-created_at', '-id'], condition=models.Q(deleted_at__isnull=True),
+                name='posts_author_timeline_idx',
+            ),
+        ]
 
 
 class Like(models.Model):
@@ -69,9 +108,11 @@ class Like(models.Model):
     class Meta:
         db_table = 'likes'
         unique_together = ('user', 'post')
+        # A post's likers, newest first: equality on post, then the keyset order.
+        indexes = [models.Index(fields=['post', '-created_at', '-id'], name='likes_post_recent_idx')]
         
     def __str__(self):
-        return f"{self.user.username} likes {self.post.id}"
+        return f"{self.user.username} likes {self.post_id}"
 
 
 class Connection(models.Model):
@@ -124,15 +165,255 @@ class Connection(models.Model):
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
+    # Null on the tombstones left by a purged account (socialapp.purge).
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='comments')
     content = models.TextField(max_length=500)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')  # Add this line
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Deleted comments stay as tombstones so their replies keep a parent.
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = LiveManager()
+    all_objects = models.Manager()
+    
+    @classmethod
+    def thread(cls):
+        """Comments of a post's thread: those of deactivated accounts stay hidden until they are purged;
+        deleted comments that have replies stay as tombstones, author-less once their account is purged"""
+        return cls.all_objects.filter(
+            models.Q(deleted_at__isnull=True) | models.Exists(cls.all_objects.filter(parent=models.OuterRef('pk'))),
+            models.Q(author__is_active=True) | models.Q(author__isnull=True),
+        )
     
     class Meta:
         db_table = 'comments'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'created_at'], condition=models.Q(deleted_at__isnull=True), name='comments_live_idx'),
+            models.Index(fields=['deleted_at'], condition=models.Q(deleted_at__isnull=False), name='comments_deleted_idx'),
+            models.Index(fields=['-created_at', '-id'], name='comments_admin_idx'),
+        ]
         
     def __str__(self):
-        return f"Comment by {self.author.username} on {self.post.id}"
\ No newline at end of file
+        return f"Comment by {self.author.username if self.author else '[deleted]'} on {self.post_id}"
+
+class ChangeLogEntry(models.Model):
+    """Append-only record of row changes, read by the delta sync endpoint"""
+    MODEL_CHOICES = [
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+        ('like', 'Like'),
+        ('connection', 'Connection'),
+    ]
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Null means visible to every user; otherwise only to this user.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Identifying fields kept for tombstones, since the row itself is gone.
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'change_log'
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='change_log_object_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} {self.object_id} {self.action}"
+
+
+class Notification(models.Model):
+    """Inbox row; a burst of similar events on one target rolls up into a single unread row"""
+    VERB_CHOICES = [
+        ('like', 'Like'),
+        ('comment', 'Comment'),
+        ('reply', 'Reply'),
+        ('connection_request', 'Connection request'),
+        ('connection_accepted', 'Connection accepted'),
+    ]
+    
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    # Post id for likes/comments, parent comment id for replies, connection id otherwise.
+    target = models.CharField(max_length=64)
+    actor_count = models.PositiveIntegerField(default=0)
+    # Newest first, capped; [{'id': ..., 'username': ...}]
+    recent_actors = models.JSONField(default=list, blank=True)
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'notifications'
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notifications_inbox_idx'),
+        ]
+        constraints = [
+            # The row a burst rolls up into; also the index the fold looks it up by.
+            models.UniqueConstraint(
+                fields=['recipient', 'verb', 'target'], condition=models.Q(is_read=False),
+                name='notifications_unread_unique',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.verb} x{self.actor_count} for {self.recipient_id}"
+
+
+class NotificationCounter(models.Model):
+    """Stored unread count so the badge never needs a COUNT over the inbox"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'notification_counters'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class UserStats(models.Model):
+    """Stored profile counts so a profile read never runs a COUNT (see ``socialapp.profiles``)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    connections_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'user_stats'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.posts_count} posts, {self.connections_count} connections"
+
+
+class Task(models.Model):
+    """Queued background job, executed by ``manage.py taskworker``"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Enqueueing twice with the same key yields a single task while it is pending;
+    # a finished or failed row is queued again.
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'tasks'
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='tasks_ready_idx'),
+            # Finished rows, oldest first, for the retention purge.
+            models.Index(fields=['finished_at'], condition=models.Q(finished_at__isnull=False), name='tasks_finished_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class DataExport(models.Model):
+    """Archive of one user's data, built in the background by ``build_data_export``"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='data_exports')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    archive = models.FileField(upload_to='exports/', blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    # Progress: rows written so far out of the total counted when the job started.
+    section = models.CharField(max_length=20, blank=True)
+    rows_written = models.PositiveBigIntegerField(default=0)
+    rows_total = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'data_exports'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Export for {self.user_id} ({self.status})"
+
+
+class AuthTokenDevice(models.Model):
+    """Device a knox token was issued to; logging in again from it replaces the token"""
+    token = models.OneToOneField(AuthToken, on_delete=models.CASCADE, primary_key=True, related_name='device')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='token_devices')
+    # sha256 of the client's device id; blank when it sent none, so the token is never rotated.
+    fingerprint = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'auth_token_devices'
+        indexes = [
+            models.Index(fields=['user', 'fingerprint'], name='token_devices_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.fingerprint[:12] or 'unknown device'}"
+
+
+class AuthTokenPurgeStats(models.Model):
+    """Totals of the expired token purges, one row shared by every process"""
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    runs = models.PositiveBigIntegerField(default=0)
+    deleted = models.PositiveBigIntegerField(default=0)
+    seconds = models.FloatField(default=0.0)
+    last_deleted = models.PositiveBigIntegerField(default=0)
+    last_seconds = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'auth_token_purge_stats'
+    
+    def __str__(self):
+        return f"{self.runs} purges, {self.deleted} tokens"
+
+
+class MediaBlob(models.Model):
+    """One stored file of ``ContentAddressedStorage`` and how many rows refer to it"""
+    # Storage name: cas/<2 hex>/<2 hex>/<sha256><extension>
+    name = models.CharField(max_length=100, primary_key=True)
+    digest = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time a reference was taken or released; garbage collection waits a grace period after it.
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'media_blobs'
+        indexes = [
+            models.Index(fields=['updated_at'], condition=models.Q(refcount=0), name='media_blobs_garbage_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} x{self.refcount}"
@@ -0,0 +1,69 @@
+"""
+Normalized list responses (``?shape=normalized``).
+
+By default every post, comment and connection embeds its users. In the
+normalized shape those fields hold user ids instead and the response gains
+one ``users`` map of id -> user, read with a single ``in_bulk`` query, so a
+page where a few people wrote everything carries each of them once.
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+
+from .serializers import UserSerializer
+
+SHAPE_QUERY_PARAM = 'shape'
+
+
+class UserReferences:
+    """The users one normalized response refers to"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, user_id):
+        self.counts[user_id] += 1
+        return user_id
+
+    def discard(self, user_id):
+        self.counts[user_id] -= 1
+
+    def render(self, context=None):
+        user_ids = sorted(pk for pk, count in self.counts.items() if count > 0)
+        users = User.objects.in_bulk(user_ids)
+        data = UserSerializer([users[pk] for pk in user_ids if pk in users], many=True, context=context).data
+        return {user['id']: user for user in data}
+
+
+class NormalizedUsersMixin:
+    """List views that can answer in the normalized shape"""
+
+    @cached_property
+    def user_references(self):
+        # Schema generation runs the views without a request.
+        if getattr(self, 'swagger_fake_view', False) or self.request is None:
+            return None
+        if self.request.method == 'GET' and self.request.query_params.get(SHAPE_QUERY_PARAM) == 'normalized':
+            return UserReferences()
+        return None
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.user_references is not None:
+            context['user_references'] = self.user_references
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Only user ids are read from the rows; the users come from one query at the end.
+        return queryset.select_related(None) if self.user_references is not None else queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.user_references is None or response.data is None:
+            return response
+        if not isinstance(response.data, dict):
+            response.data = {'results': response.data}
+        response.data['users'] = self.user_references.render(self.get_serializer_context())
+        return response
@@ -0,0 +1,177 @@
+"""
+Notification inbox writes.
+
+Once the transaction that produced them commits (see ``socialapp.signals``),
+events are queued as ``write_notifications`` task rows, one per event, so
+the request only pays for an INSERT and a restart loses nothing. The task
+worker runs up to ``NOTIFICATION_BATCH_SIZE`` queued events in one call,
+which groups them by (recipient, verb, target), folds them into the matching
+unread row (or one new row), and bumps the stored unread counters with one
+UPDATE per distinct increment. At most one unread row per (recipient, verb,
+target) is allowed by a unique constraint, so two writers racing to create
+the same row cannot both succeed; the loser folds again.
+"""
+import logging
+from collections import defaultdict, OrderedDict
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTORS = 3
+WRITE_ATTEMPTS = 3
+
+TARGET_KEYS = {
+    'like': 'post',
+    'comment': 'post',
+    'reply': 'parent',
+    'connection_request': 'connection',
+    'connection_accepted': 'connection',
+}
+
+
+def event_key(recipient_id, event):
+    """Idempotency key of one event: a retried commit hook does not queue it twice"""
+    target = event[TARGET_KEYS[event['type']]]
+    return f"notify:{recipient_id}:{event['type']}:{target}:{event['actor']}:{event.get('comment', '')}"
+
+
+def deliver(batch):
+    """Queue committed ``(recipient_id, event)`` pairs; failures are logged, not raised into the request"""
+    from .tasks import write_notifications
+
+    for recipient_id, event in batch:
+        try:
+            write_notifications.delay(recipient_id, event, idempotency_key=event_key(recipient_id, event))
+        except Exception:
+            logger.exception('Failed to queue notification event')
+
+
+def write_batch(batch):
+    """Fold ``(recipient_id, event)`` pairs into the inbox"""
+    groups = OrderedDict()
+    for recipient_id, event in batch:
+        key = (recipient_id, event['type'], str(event[TARGET_KEYS[event['type']]]))
+        groups.setdefault(key, []).append(event['actor'])
+
+    usernames = dict(
+        User.objects.filter(id__in={actor for actors in groups.values() for actor in actors})
+        .values_list('id', 'username')
+    )
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            fold(groups, usernames)
+            return
+        except IntegrityError:
+            # Another writer created one of the unread rows first; fold into it.
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+
+
+def fold(groups, usernames):
+    recipients = {recipient for recipient, _, _ in groups}
+    now = timezone.now()
+
+    with transaction.atomic():
+        # Superset query; exact (verb, target) matching happens below.
+        existing = {
+            (row.recipient_id, row.verb, row.target): row
+            for row in Notification.objects.select_for_update().filter(
+                recipient_id__in=recipients,
+                verb__in={verb for _, verb, _ in groups},
+                target__in={target for _, _, target in groups},
+                is_read=False,
+            )
+        }
+
+        updated, created = [], []
+        for key, actors in groups.items():
+            row = existing.get(key)
+            if row is None:
+                row = Notification(recipient_id=key[0], verb=key[1], target=key[2])
+                created.append(row)
+            else:
+                row.updated_at = now
+                updated.append(row)
+            seen = {actor['id'] for actor in row.recent_actors}
+            for actor_id in actors:
+                if actor_id in seen:
+                    continue
+                seen.add(actor_id)
+                row.actor_count += 1
+                row.recent_actors = [{'id': actor_id, 'username': usernames.get(actor_id, '')}] + row.recent_actors
+            row.recent_actors = row.recent_actors[:RECENT_ACTORS]
+
+        Notification.objects.bulk_update(updated, ['actor_count', 'recent_actors', 'updated_at'])
+        Notification.objects.bulk_create(created)
+
+        new_rows = defaultdict(int)
+        for row in created:
+            new_rows[row.recipient_id] += 1
+        if new_rows:
+            NotificationCounter.objects.bulk_create(
+                [NotificationCounter(user_id=user_id) for user_id in new_rows], ignore_conflicts=True
+            )
+            by_increment = defaultdict(list)
+            for user_id, increment in new_rows.items():
+                by_increment[increment].append(user_id)
+            for increment, user_ids in by_increment.items():
+                NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + increment)
+
+
+def unread_count(user):
+    return NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first() or 0
+
+
+def mark_read(user, ids=None):
+    """Mark the given (or all) unread notifications read; returns rows changed"""
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient=user, is_read=False)
+        if ids is not None:
+            unread = unread.filter(id__in=ids)
+        changed = unread.update(is_read=True)
+        if ids is None:
+            NotificationCounter.objects.filter(user=user).update(unread=0)
+        elif changed:
+            NotificationCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - changed, 0))
+    return changed
+
+
+def discard(notifications):
+    """Delete ``notifications`` and take the unread ones off their recipients' counters"""
+    with transaction.atomic():
+        unread = (
+            notifications.filter(is_read=False).order_by()
+            .values('recipient_id').annotate(total=Count('id'))
+        )
+        by_decrement = defaultdict(list)
+        for row in unread:
+            by_decrement[row['total']].append(row['recipient_id'])
+        deleted, _ = notifications.delete()
+        for decrement, user_ids in by_decrement.items():
+            NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=Greatest(F('unread') - decrement, 0))
+    return deleted
+
+
+def summary(notification):
+    """Human readable line, e.g. "A, B and 48 others liked your post" """
+    names = [actor['username'] for actor in notification.recent_actors[:2]]
+    others = notification.actor_count - len(names)
+    if others > 0:
+        who = f"{', '.join(names)} and {others} other{'s' if others != 1 else ''}"
+    else:
+        who = ' and '.join(names)
+    phrases = {
+        'like': 'liked your post',
+        'comment': 'commented on your post',
+        'reply': 'replied to your comment',
+        'connection_request': 'sent you a connection request',
+        'connection_accepted': 'accepted your connection request',
+    }
+    return f"{who} {phrases[notification.verb]}"
@@ -0,0 +1,143 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Composite keyset ("seek") pagination.
+
+    The cursor holds the ordering values of the last row served, and the next
+    page is a range scan past it, so page N costs the same as page 1 and no
+    COUNT is ever run. The ordering must end in a unique column. Views may set
+    ``keyset_ordering`` to override ``ordering``.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_position(self, request, view, model):
+        """The ordering values in ``request``'s cursor, or None for the first page"""
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        return self.decode_cursor(request, model)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def after(self, position):
+        """Q matching rows strictly after ``position`` in ``self.ordering``"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def position_of(self, row):
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def encode_cursor(self, position):
+        values = [value if isinstance(value, (int, float)) else str(value) for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for ``queryset`` (PostgreSQL), or None where there is none"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count costs the same on any table size.
+
+    Rows are counted exactly up to ``exact_limit``; past that the count is
+    the planner's estimate (never less than the rows already seen), so the
+    last page numbers are approximate on very large result sets.
+    """
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        seen = self.object_list.order_by().values('pk')[:self.exact_limit + 1].count()
+        if seen <= self.exact_limit:
+            return seen
+        return max(estimated_count(self.object_list) or 0, seen)
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from rest_framework import permissions
+
+
+class HasMetricsAccess(permissions.BasePermission):
+    """Staff users, or scrapers presenting ``Authorization: Bearer <METRICS_TOKEN>``"""
+    
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return True
+        return bool(request.user and request.user.is_staff)
@@ -0,0 +1,161 @@
+"""
+Public profile reads: slug resolution and stored counts.
+
+Profiles are addressed by slug, so each worker keeps an in-memory LRU of
+slug -> user id (``PROFILE_SLUG_CACHE_SIZE`` entries, each trusted for
+``PROFILE_SLUG_CACHE_TTL`` seconds); a hit turns ``/api/users/<slug>/posts/``
+into one index range scan on the author's timeline. Slugs never change, but
+one can be taken again after its account is purged, hence the TTL.
+
+Post and connection counts live in ``UserStats``. A user's row is created
+from live counts the first time it is read and then kept current by
+``adjust`` (signals, soft deletes, purges). Rows written around the ORM
+(``import_data``) drop the row, and ``manage.py backfill_user_stats``
+recomputes every row in batches.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Connection, Post, UserProfile, UserStats
+
+FIELDS = ('posts_count', 'connections_count')
+
+
+def profile_setting(name, default):
+    return getattr(settings, name, default)
+
+
+class SlugCache:
+    """Least-recently-used map of profile slug to user id, shared by a worker's threads"""
+
+    def __init__(self, size=None, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, slug):
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is None:
+                return None
+            user_id, expires = entry
+            if expires < time.monotonic():
+                del self._entries[slug]
+                return None
+            self._entries.move_to_end(slug)
+            return user_id
+
+    def set(self, slug, user_id):
+        size = self.size or profile_setting('PROFILE_SLUG_CACHE_SIZE', 10000)
+        ttl = self.ttl or profile_setting('PROFILE_SLUG_CACHE_TTL', 300)
+        with self._lock:
+            self._entries[slug] = (user_id, time.monotonic() + ttl)
+            self._entries.move_to_end(slug)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def discard(self, slug):
+        with self._lock:
+            self._entries.pop(slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slugs = SlugCache()
+
+
+def resolve_slug(slug):
+    """User id of the active account whose profile has ``slug``, or None"""
+    user_id = slugs.get(slug)
+    if user_id is None:
+        user_id = (
+            UserProfile.objects.filter(slug=slug, user__is_active=True).values_list('user_id', flat=True).first()
+        )
+        # Misses are not cached: a profile created a moment later must resolve.
+        if user_id is not None:
+            slugs.set(slug, user_id)
+    return user_id
+
+
+def profile_for_slug(slug):
+    """The profile (with its user) for ``slug``, or None"""
+    user_id = resolve_slug(slug)
+    if user_id is None:
+        return None
+    # The slug predicate checks the cached mapping in the same primary-key lookup.
+    profile = UserProfile.objects.select_related('user').filter(
+        user_id=user_id, slug=slug, user__is_active=True
+    ).first()
+    if profile is None:
+        slugs.discard(slug)
+    return profile
+
+
+def live_counts(user_ids):
+    """{user id: {field: count}} computed from the posts and connections tables"""
+    counts = {pk: dict.fromkeys(FIELDS, 0) for pk in user_ids}
+    posts = Post.objects.filter(author_id__in=user_ids).order_by().values('author_id').annotate(n=Count('pk'))
+    for row in posts:
+        counts[row['author_id']]['posts_count'] = row['n']
+    accepted = Connection.objects.filter(status='accepted').order_by()
+    for side in ('sender_id', 'receiver_id'):
+        for row in accepted.filter(**{f'{side}__in': user_ids}).values(side).annotate(n=Count('pk')):
+            counts[row[side]]['connections_count'] += row['n']
+    return counts
+
+
+def get_stats(user_ids):
+    """{user id: UserStats}, creating the missing rows from live counts"""
+    stats = UserStats.objects.in_bulk(user_ids)
+    missing = [pk for pk in user_ids if pk not in stats]
+    if missing:
+        counts = live_counts(missing)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk, **counts[pk]) for pk in missing], ignore_conflicts=True
+        )
+        stats.update(UserStats.objects.in_bulk(missing))
+    return stats
+
+
+def adjust(field, deltas):
+    """Add ``deltas`` ({user id: change}) to ``field`` of the rows that exist"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        UserStats.objects.filter(user_id__in=user_ids).update(
+            **{field: Greatest(F(field) + delta, 0)}, updated_at=timezone.now()
+        )
+
+
+def forget(user_ids):
+    """Drop stored rows whose counts can no longer be trusted; they are rebuilt on the next read"""
+    UserStats.objects.filter(user_id__in=list(user_ids)).delete()
+
+
+def backfill(batch_size=None):
+    """Recompute every user's row from live counts, in batches of users; returns rows written"""
+    batch_size = batch_size or profile_setting('USER_STATS_BATCH_SIZE', 1000)
+    written, last = 0, 0
+    while True:
+        user_ids = list(User.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return written
+        counts = live_counts(user_ids)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk, **counts[pk]) for pk in user_ids],
+            update_conflicts=True, unique_fields=['user'], update_fields=[*FIELDS, 'updated_at'],
+        )
+        written += len(user_ids)
+        last = user_ids[-1]
@@ -0,0 +1,309 @@
+"""
+Deferred purge of deleted posts, comments and accounts.
+
+Deleting a post or an account only hides it (``Post.deleted_at`` /
+``User.is_active``) and queues a task; deleting a comment leaves a tombstone
+(``Comment.deleted_at``) that ``purge_tombstones`` removes after
+``SOFT_DELETE_RETENTION``. A purged account's comments that others replied
+to become anonymous tombstones (no author or content); the rest are removed.
+The task removes dependent rows with
+set-based ``DELETE ... WHERE pk IN (SELECT pk ... LIMIT n)`` statements, one
+short transaction per batch, instead of Django's collector, which loads every
+related row into memory before deleting. Comment trees are removed leaves
+first so the self-referencing ``parent`` key holds after every batch. Media
+files and notification counters are cleaned up once the rows are gone.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import CharField, Exists, F, OuterRef, Q, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from knox.models import AuthToken
+
+from .models import ChangeLogEntry, Comment, Connection, DataExport, Like, Notification, NotificationCounter, Post, UserProfile
+from . import exports, graph, notifications, profiles, search, sync
+
+
+def purge_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def column(model, field):
+    return qn(model._meta.get_field(field).column)
+
+
+def table(model):
+    return qn(model._meta.db_table)
+
+
+def on_users_posts(model):
+    """Raw condition: ``model``'s post belongs to the user passed as the parameter"""
+    return (
+        f"{column(model, 'post')} IN "
+        f"(SELECT {column(Post, 'id')} FROM {table(Post)} WHERE {column(Post, 'author')} = %s)"
+    )
+
+
+def post_id_param(post_id):
+    # UUIDs are stored as char(32) on SQLite and native uuid on PostgreSQL.
+    return Post._meta.pk.get_db_prep_value(post_id, connection)
+
+
+def delete_batches(model, where, params=(), batch_size=None):
+    """Delete rows of ``model`` matching the raw ``where`` clause, one transaction per batch"""
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    pk = qn(model._meta.pk.column)
+    sql = f'DELETE FROM {table(model)} WHERE {pk} IN (SELECT {pk} FROM {table(model)} WHERE {where} LIMIT %s)'
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, batch_size])
+            deleted = cursor.rowcount
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def delete_logged(queryset, batch_size=None, skip_user=None):
+    """
+    Delete ``queryset``'s rows in batches, appending their change log
+    tombstones in the same transaction so delta-sync clients drop them too.
+    ``skip_user`` gets no private tombstones (it is the account being purged).
+    """
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    model = queryset.model
+    pk = qn(model._meta.pk.column)
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by()[:batch_size])
+            if rows:
+                ChangeLogEntry.objects.bulk_create(
+                    entry for row in rows for entry in sync.change_entries(row, 'deleted', skip_user)
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {table(model)} WHERE {pk} IN ({', '.join(['%s'] * len(rows))})",
+                        [row.pk for row in rows],
+                    )
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def delete_comment_trees(root_where, params=(), batch_size=None):
+    """Delete comments matching ``root_where`` plus every reply below them, leaves first"""
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    comments, pk, parent = table(Comment), column(Comment, 'id'), column(Comment, 'parent')
+    # The CTE sits inside the subquery: sqlite3 only reports rowcount for
+    # statements that start with DELETE.
+    sql = (
+        f'DELETE FROM {comments} WHERE {pk} IN ('
+        f'WITH RECURSIVE tree(id) AS ('
+        f'SELECT {pk} FROM {comments} WHERE {root_where} '
+        f'UNION SELECT c.{pk} FROM {comments} c JOIN tree ON c.{parent} = tree.id) '
+        f'SELECT tree.id FROM tree WHERE NOT EXISTS (SELECT 1 FROM {comments} r WHERE r.{parent} = tree.id) '
+        f'LIMIT %s)'
+    )
+    total = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [*params, batch_size])
+            deleted = cursor.rowcount
+        if not deleted:
+            return total
+        total += deleted
+
+
+def remove_user_comments(user_id, batch_size=None):
+    """
+    Delete a user's comments that have no replies, then turn the rest into
+    anonymous tombstones so other users' replies keep their thread.
+    Returns ``(deleted, tombstoned)``.
+    """
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    leaves = Comment.all_objects.filter(author_id=user_id).exclude(
+        Exists(Comment.all_objects.filter(parent=OuterRef('pk')))
+    )
+    deleted = 0
+    # Removing a reply can leave its parent (by the same user) without replies.
+    while True:
+        removed = delete_logged(leaves, batch_size)
+        if not removed:
+            break
+        deleted += removed
+    tombstoned = 0
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            rows = list(Comment.all_objects.filter(author_id=user_id).only('pk', 'post_id', 'parent_id')[:batch_size])
+            ids = [row.pk for row in rows]
+            Comment.all_objects.filter(pk__in=ids).update(
+                author=None, content='', deleted_at=Coalesce(F('deleted_at'), Value(now)), updated_at=now
+            )
+            ChangeLogEntry.objects.bulk_create(
+                entry for row in rows for entry in sync.change_entries(row, 'deleted')
+            )
+        tombstoned += len(ids)
+        if len(ids) < batch_size:
+            return deleted, tombstoned
+
+
+def delete_files(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def as_targets(queryset):
+    """Notification targets (stringified ids) for an integer-keyed queryset"""
+    return queryset.annotate(target_id=Cast('pk', CharField())).values('target_id')
+
+
+def hide_post(post):
+    """Soft-delete a post; ``purge_post`` removes it for good"""
+    now = timezone.now()
+    if Post.all_objects.filter(pk=post.pk, deleted_at__isnull=True).update(deleted_at=now, updated_at=now):
+        profiles.adjust('posts_count', {post.author_id: -1})
+    sync.record_change(post, 'deleted')
+
+
+def hide_comment(comment):
+    """Turn a comment into a tombstone; its replies stay attached"""
+    now = timezone.now()
+    Comment.all_objects.filter(pk=comment.pk).update(deleted_at=now, updated_at=now)
+    sync.record_change(comment, 'deleted')
+
+
+def deactivate_account(user, batch_size=None):
+    """Lock the account and hide its posts; ``purge_user`` removes everything"""
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        AuthToken.objects.filter(user=user).delete()
+        # update() sends no post_save, so the typeahead is told directly.
+        transaction.on_commit(lambda: search.unindex_user(user.pk))
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            ids = list(Post.objects.filter(author=user).values_list('pk', flat=True)[:batch_size])
+            Post.all_objects.filter(pk__in=ids).update(deleted_at=now)
+            profiles.adjust('posts_count', {user.pk: -len(ids)})
+            ChangeLogEntry.objects.bulk_create(
+                ChangeLogEntry(model='post', object_id=str(pk), action='deleted') for pk in ids
+            )
+        if len(ids) < batch_size:
+            return
+
+
+def purge_post(post_id):
+    """Remove a hidden post with its likes, comments, notifications and image"""
+    post = Post.all_objects.filter(pk=post_id, deleted_at__isnull=False).values('image').first()
+    if post is None:
+        return False
+    param = [post_id_param(post_id)]
+    notifications.discard(Notification.objects.filter(
+        Q(verb__in=['like', 'comment'], target=str(post_id))
+        | Q(verb='reply', target__in=as_targets(Comment.objects.filter(post_id=post_id)))
+    ))
+    delete_batches(Like, f"{column(Like, 'post')} = %s", param)
+    delete_comment_trees(f"{column(Comment, 'post')} = %s", param)
+    delete_batches(Post, f"{column(Post, 'id')} = %s", param)
+    delete_files([post['image']])
+    return True
+
+
+def purge_user(user_id, batch_size=None):
+    """Remove a deactivated account and everything it owns"""
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    user = User.objects.filter(pk=user_id, is_active=False).first()
+    if user is None:
+        return False
+    param = [user_id]
+
+    AuthToken.objects.filter(user_id=user_id).delete()
+    # Other users' notifications about this account's comments and connections.
+    notifications.discard(Notification.objects.filter(
+        Q(verb='reply', target__in=as_targets(Comment.objects.filter(Q(author_id=user_id) | Q(post__author_id=user_id))))
+        | Q(verb__in=['connection_request', 'connection_accepted'],
+            target__in=as_targets(Connection.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id))))
+    ))
+    delete_batches(Notification, f"{column(Notification, 'recipient')} = %s", param, batch_size)
+    NotificationCounter.objects.filter(user_id=user_id).delete()
+
+    # Likes and comments on other people's posts need tombstones for delta sync;
+    # those on this account's posts go with the posts, already logged as deleted.
+    delete_logged(Like.objects.filter(user_id=user_id), batch_size)
+    delete_batches(Like, on_users_posts(Like), param, batch_size)
+    delete_comment_trees(on_users_posts(Comment), param, batch_size)
+    remove_user_comments(user_id, batch_size)
+    # The other side of each accepted connection loses one.
+    accepted = Connection.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id), status='accepted')
+    others = defaultdict(int)
+    for sender_id, receiver_id in accepted.values_list('sender_id', 'receiver_id').iterator():
+        others[receiver_id if sender_id == user_id else sender_id] -= 1
+    delete_logged(Connection.objects.filter(Q(sender_id=user_id) | Q(receiver_id=user_id)), batch_size, skip_user=user_id)
+    profiles.adjust('connections_count', others)
+    # The raw deletes send no signals: drop the cached neighbour lists here.
+    graph.invalidate(user_id, *others)
+    delete_batches(ChangeLogEntry, f"{column(ChangeLogEntry, 'user')} = %s", param, batch_size)
+
+    while True:
+        with transaction.atomic():
+            rows = list(Post.all_objects.filter(author_id=user_id).values_list('pk', 'image')[:batch_size])
+            ids = [post_id_param(pk) for pk, _ in rows]
+            if ids:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"DELETE FROM {table(Post)} WHERE {column(Post, 'id')} IN ({', '.join(['%s'] * len(ids))})", ids
+                    )
+        delete_files(image for _, image in rows)
+        if len(rows) < batch_size:
+            break
+
+    exports.delete_exports(DataExport.objects.filter(user_id=user_id))
+    files = list(UserProfile.objects.filter(user_id=user_id).values_list('profile_picture', flat=True))
+    # Whatever is left (profile, admin log) is small enough for the collector.
+    user.delete()
+    delete_files(files)
+    return True
+
+
+def purge_tombstones(now=None, batch_size=None):
+    """
+    Physically remove comments and posts deleted longer than ``SOFT_DELETE_RETENTION`` ago.
+
+    Tombstones go leaves first; one that still has replies stays until they
+    are gone. Returns ``(comments removed, posts purged)``.
+    """
+    batch_size = batch_size or purge_setting('PURGE_BATCH_SIZE', 1000)
+    cutoff = (now or timezone.now()) - purge_setting('SOFT_DELETE_RETENTION', timedelta(days=30))
+    comments, pk, parent = table(Comment), column(Comment, 'id'), column(Comment, 'parent')
+    leaf_tombstones = (
+        f"{column(Comment, 'deleted_at')} < %s "
+        f"AND NOT EXISTS (SELECT 1 FROM {comments} r WHERE r.{parent} = {comments}.{pk})"
+    )
+    param = [Comment._meta.get_field('deleted_at').get_db_prep_value(cutoff, connection)]
+    removed = 0
+    while True:
+        deleted = delete_batches(Comment, leaf_tombstones, param, batch_size)
+        if not deleted:
+            break
+        removed += deleted
+
+    posts = 0
+    while True:
+        ids = list(Post.all_objects.filter(deleted_at__lt=cutoff).values_list('pk', flat=True)[:batch_size])
+        for post_id in ids:
+            posts += purge_post(post_id)
+        if len(ids) < batch_size:
+            return removed, posts
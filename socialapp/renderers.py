@@ -0,0 +1,24 @@
+"""
+Response renderers.
+
+``TimedJSONRenderer`` adds the time it takes to render a response body to the
+request's stats (``socialapp.metrics``), once per response however deeply its
+serializers nest.
+"""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import current_stats
+
+
+class TimedJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        stats = current_stats.get()
+        if stats is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        started = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
@@ -0,0 +1,107 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+``ReplicaRoutingMiddleware`` opens a routing scope per request. Inside it,
+reads of socialapp models from safe requests go to one of
+``DATABASE_REPLICAS``; writes, unsafe requests, and any request from a user
+who wrote within ``REPLICA_STICKINESS_SECONDS`` stay on the primary so users
+always see their own likes, comments and connections. Outside a request
+(management commands, tasks, tests) everything uses the primary.
+
+The pins live in the ``REPLICA_STICKINESS_CACHE`` cache alias, which must be
+shared by every worker (``settings_prod`` uses the database or Redis);
+with a per-process cache a write pins the user only in the worker that
+served it.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+ROUTED_APPS = {'socialapp'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('replica_routing_state', default=None)
+
+
+def stickiness_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_cache():
+    return caches[getattr(settings, 'REPLICA_STICKINESS_CACHE', 'default')]
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.wrote = request.method not in SAFE_METHODS
+        self.replica = None
+        self._user_pinned = None
+
+    def user_id(self):
+        # DRF authenticates inside the view and copies the user onto the
+        # underlying HttpRequest, so this is only meaningful once a view runs.
+        user = getattr(self.request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else None
+
+    def use_primary(self):
+        if self.wrote:
+            return True
+        if self._user_pinned is None:
+            user_id = self.user_id()
+            if user_id is None:
+                return False
+            pinned_until = pin_cache().get(stickiness_key(user_id))
+            self._user_pinned = pinned_until is not None and pinned_until > time.time()
+        return self._user_pinned
+
+    def record_write(self):
+        """Pin the user to the primary long enough for replicas to catch up"""
+        user_id = self.user_id()
+        if self.wrote and user_id is not None:
+            window = getattr(settings, 'REPLICA_STICKINESS_SECONDS', 5)
+            pin_cache().set(stickiness_key(user_id), time.time() + window, timeout=window)
+
+
+@contextmanager
+def routing_scope(request):
+    state = RoutingState(request)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        state = _state.get()
+        if not replicas or state is None or model._meta.app_label not in ROUTED_APPS:
+            return None
+        if state.use_primary():
+            return 'default'
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the database the instance came from.
+            return instance._state.db
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', [])
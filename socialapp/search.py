@@ -0,0 +1,230 @@
+"""
+In-memory prefix index for the user typeahead (``/api/search/users/``).
+
+Every active user contributes the casefolded words of their username, first
+and last name and profile slug. The index keeps the distinct terms in one
+sorted list with their user ids concatenated in an ``array`` (each term
+stored once however many users share it), so the users matching a prefix
+are a binary search plus a slice. Saves of users and profiles are applied as
+small add/remove deltas that are merged into the arrays every
+``SEARCH_INDEX_COMPACT_AFTER`` changes.
+
+Each worker builds its index from the database on first use and rebuilds it
+in the background once it is ``SEARCH_INDEX_MAX_AGE`` seconds old, which is
+how changes saved by other workers arrive. Results put the caller's accepted
+connections first, then users by mutual connections (``socialapp.graph``),
+and stop at ``SEARCH_RESULTS_LIMIT``.
+"""
+import heapq
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+
+from . import graph
+
+WORD_RE = re.compile(r'[^\W_]+')
+LOAD_BATCH_SIZE = 5000
+FIELDS = ('username', 'first_name', 'last_name', 'slug')
+
+
+def search_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def terms_for(fields):
+    """Distinct casefolded search terms of a user's (username, first_name, last_name, slug)"""
+    username, first_name, last_name, slug = fields
+    terms = {username.casefold()} if username else set()
+    for value in (username, first_name, last_name, slug):
+        terms.update(WORD_RE.findall(value.casefold()))
+    return terms
+
+
+class PrefixIndex:
+    def __init__(self, compact_after=None):
+        self.compact_after = compact_after or search_setting('SEARCH_INDEX_COMPACT_AFTER', 20000)
+        self.users = {}
+        self.user_terms = {}
+        self.terms = []
+        self.starts = array('q', [0])
+        self.postings = array('q')
+        self.added = []
+        self.removed = set()
+        self.built_at = None
+        self._lock = threading.RLock()
+
+    def load(self, rows):
+        """Index (id, username, first_name, last_name, slug) rows, replacing what was there"""
+        with self._lock:
+            self.users = {row[0]: tuple(value or '' for value in row[1:]) for row in rows}
+            self.user_terms = {user_id: tuple(terms_for(fields)) for user_id, fields in self.users.items()}
+            self.compact()
+            self.built_at = time.monotonic()
+        return self
+
+    def compact(self):
+        """Merge the pending deltas into the sorted arrays"""
+        with self._lock:
+            pairs = sorted((term, user_id) for user_id, terms in self.user_terms.items() for term in terms)
+            terms, starts, postings = [], array('q'), array('q')
+            for term, user_id in pairs:
+                if not terms or terms[-1] != term:
+                    terms.append(term)
+                    starts.append(len(postings))
+                postings.append(user_id)
+            starts.append(len(postings))
+            self.terms, self.starts, self.postings = terms, starts, postings
+            self.added.clear()
+            self.removed.clear()
+
+    def put(self, user_id, create=True, **fields):
+        """Add a user or change some of their indexed fields"""
+        with self._lock:
+            old = self.users.get(user_id)
+            if old is None and not create:
+                return
+            new = tuple(fields.get(name, old[i] if old else '') or '' for i, name in enumerate(FIELDS))
+            terms = terms_for(new)
+            self._change(user_id, set(self.user_terms.get(user_id, ())), terms)
+            self.users[user_id] = new
+            self.user_terms[user_id] = tuple(terms)
+
+    def remove(self, user_id):
+        with self._lock:
+            self.users.pop(user_id, None)
+            terms = self.user_terms.pop(user_id, None)
+            if terms is not None:
+                self._change(user_id, set(terms), set())
+
+    def _change(self, user_id, old_terms, new_terms):
+        # Pending additions stay sorted, so a query finds them with one bisect too.
+        for pair in ((term, user_id) for term in old_terms - new_terms):
+            position = bisect_left(self.added, pair)
+            if position < len(self.added) and self.added[position] == pair:
+                del self.added[position]
+            else:
+                self.removed.add(pair)
+        for pair in ((term, user_id) for term in new_terms - old_terms):
+            if pair in self.removed:
+                self.removed.discard(pair)
+            else:
+                insort(self.added, pair)
+        if len(self.added) + len(self.removed) > self.compact_after:
+            self.compact()
+
+    def matches(self, user_id, prefixes):
+        """Whether every prefix starts one of the user's terms"""
+        terms = self.user_terms.get(user_id, ())
+        return bool(terms) and all(any(term.startswith(prefix) for term in terms) for prefix in prefixes)
+
+    def search(self, prefixes, limit):
+        """Up to ``limit`` ids of users matching every prefix, in order of the matched term"""
+        # Scan the longest prefix's range, the narrowest, and filter by the others.
+        first = max(prefixes, key=len)
+        rest = [prefix for prefix in prefixes if prefix != first]
+        found, seen = [], set()
+        with self._lock:
+            lo = bisect_left(self.terms, first)
+            hi = bisect_left(self.terms, first + '\U0010ffff')
+            stored = (
+                (self.terms[i], user_id) for i in range(lo, hi)
+                for user_id in self.postings[self.starts[i]:self.starts[i + 1]]
+            )
+            pending = self.added[bisect_left(self.added, (first,)):bisect_left(self.added, (first + '\U0010ffff',))]
+            # Lazily, in term order: a one-letter prefix only reads as far as ``limit`` needs.
+            for term, user_id in heapq.merge(stored, pending):
+                if user_id in seen or (term, user_id) in self.removed:
+                    continue
+                if rest and not self.matches(user_id, rest):
+                    continue
+                seen.add(user_id)
+                found.append(user_id)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+_index = None
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def load_rows():
+    queryset = User.objects.filter(is_active=True).order_by('pk').values_list(
+        'pk', 'username', 'first_name', 'last_name', 'profile__slug'
+    )
+    return queryset.iterator(chunk_size=LOAD_BATCH_SIZE)
+
+
+def rebuild():
+    """Build a fresh index from the database and swap it in"""
+    global _index, _rebuilding
+    try:
+        _index = PrefixIndex().load(load_rows())
+    finally:
+        _rebuilding = False
+    return _index
+
+
+def get_index():
+    global _rebuilding
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                return rebuild()
+    elif time.monotonic() - _index.built_at > search_setting('SEARCH_INDEX_MAX_AGE', 300) and not _rebuilding:
+        with _build_lock:
+            if not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=rebuild_in_background, daemon=True).start()
+    return _index
+
+
+def rebuild_in_background():
+    try:
+        rebuild()
+    finally:
+        connection.close()
+
+
+def index_user(user_id, create=True, **fields):
+    """Apply a saved user or profile to this worker's index, if it has one"""
+    if _index is not None:
+        _index.put(user_id, create, **fields)
+
+
+def unindex_user(user_id):
+    if _index is not None:
+        _index.remove(user_id)
+
+
+def search_users(user_id, query, limit=None):
+    """Best matches for ``query`` as seen by ``user_id``: connections first, then by mutual connections"""
+    limit = max(1, min(limit or search_setting('SEARCH_RESULTS_LIMIT', 10), search_setting('SEARCH_RESULTS_MAX', 50)))
+    prefixes = WORD_RE.findall(query.casefold())
+    if not prefixes:
+        return []
+    index = get_index()
+    adjacency = graph.Adjacency()
+    friends = adjacency[user_id]
+    candidates = [pk for pk in friends if index.matches(pk, prefixes)]
+    candidates += index.search(prefixes, search_setting('SEARCH_MAX_CANDIDATES', 200))
+    candidates = [pk for pk in dict.fromkeys(candidates) if pk != user_id and pk in index.users]
+    neighbours = adjacency.get_many(candidates)
+    friend_set = set(friends)
+    mutual = {pk: len(graph.intersect_sorted(friends, neighbours[pk])) for pk in candidates}
+    candidates.sort(key=lambda pk: (pk not in friend_set, -mutual[pk], index.users[pk][0].casefold(), pk))
+    results = []
+    for pk in candidates[:limit]:
+        username, first_name, last_name, slug = index.users[pk]
+        results.append({
+            'id': pk, 'username': username, 'first_name': first_name, 'last_name': last_name, 'slug': slug,
+            'connected': pk in friend_set, 'mutual_connections_count': mutual[pk],
+        })
+    return results
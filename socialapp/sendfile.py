@@ -0,0 +1,110 @@
+"""
+File responses that leave the bytes to the web server.
+
+``MEDIA_SENDFILE`` picks how a stored file is sent: ``'nginx'`` answers with
+an empty response whose ``X-Accel-Redirect`` points into the internal
+``MEDIA_SENDFILE_URL`` location, ``'apache'`` (mod_xsendfile, lighttpd) with
+``X-Sendfile`` and the file's path. Either way the web server streams the file
+and answers range requests while the worker is already free. With ``''``
+(development, tests, gunicorn alone) Django sends the file itself: whole files
+through ``wsgi.file_wrapper`` (``sendfile()`` under gunicorn), single byte
+ranges as 206 responses.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def sendfile_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def byte_range(header, size):
+    """Inclusive (start, end) of a single ``bytes=`` range; None to send it all, ValueError if unsatisfiable"""
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Malformed and multi-range requests may be answered with the whole file.
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def stream_file(request, path, size, validators):
+    """Django-side delivery: the whole file, or one requested byte range"""
+    header = request.headers.get('Range', '')
+    if_range = request.headers.get('If-Range')
+    if header and (if_range is None or if_range in validators):
+        try:
+            span = byte_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if span is not None:
+            start, end = span
+            response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+            return response
+    return FileResponse(open(path, 'rb'))
+
+
+def send_file(request, name, storage=None, etag=None, cache_control=None, as_attachment=False, filename=None):
+    """Respond with the stored file ``name``, honouring conditional and range requests"""
+    storage = storage or default_storage
+    path = storage.path(name)
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404(name)
+    last_modified = http_date(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        backend = sendfile_setting('MEDIA_SENDFILE', '')
+        if backend == 'nginx':
+            response = HttpResponse()
+            response['X-Accel-Redirect'] = sendfile_setting('MEDIA_SENDFILE_URL', '/protected-media/') + quote(name)
+        elif backend == 'apache':
+            response = HttpResponse()
+            response['X-Sendfile'] = quote(path)
+        else:
+            response = stream_file(request, path, stat.st_size, {etag, last_modified})
+        if response.status_code == 416:
+            return response
+        response['Content-Type'] = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if as_attachment or filename:
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename or os.path.basename(name))
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = last_modified
+    if etag:
+        response['ETag'] = etag
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.urls import reverse
 # Add this to the imports at the top
-from .models import UserProfile, Post, Like, Connection, Comment
+from .models import UserProfile, Post, Like, Connection, Comment, Notification, DataExport
+from . import notifications
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -12,6 +14,22 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'date_joined')
 
 
+class UserReferenceSerializer(UserSerializer):
+    """A nested user, or only its id when the view collects ``user_references`` (socialapp.normalize)"""
+    
+    def get_attribute(self, instance):
+        if self.context.get('user_references') is None:
+            return super().get_attribute(instance)
+        # The foreign key column: the related user is never loaded.
+        return getattr(instance, instance._meta.get_field(self.source).attname)
+    
+    def to_representation(self, instance):
+        references = self.context.get('user_references')
+        if references is None:
+            return super().to_representation(instance)
+        return references.add(instance)
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
@@ -37,6 +55,7 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         user = User.objects.create_user(**validated_data)
+        # One INSERT (the slug is picked with one query): the profile and its slug exist as soon as the account does.
         UserProfile.objects.create(user=user)
         return user
 
@@ -63,19 +82,33 @@ class LoginSerializer(serializers.Serializer):
 
 # Add this after the ConnectionSerializer
 class CommentSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = UserReferenceSerializer(read_only=True)
+    is_deleted = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'author', 'content', 'created_at', 'updated_at')
-        read_only_fields = ('id', 'post', 'author', 'created_at', 'updated_at')
+        fields = ('id', 'post', 'parent', 'author', 'content', 'is_deleted', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'post', 'parent', 'author', 'created_at', 'updated_at')
+    
+    def get_is_deleted(self, obj):
+        return obj.deleted_at is not None
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.deleted_at is not None:
+            # Tombstone: keeps its place in the thread without the content.
+            data['author'] = None
+            data['content'] = None
+            if self.context.get('user_references') is not None:
+                self.context['user_references'].discard(instance.author_id)
+        return data
 
 # Modify the PostSerializer to include comments
 class PostSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = UserReferenceSerializer(read_only=True)
     likes_count = serializers.ReadOnlyField()
     is_liked = serializers.SerializerMethodField()
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = CommentSerializer(source='get_thread_comments', many=True, read_only=True)
     comments_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -85,17 +118,38 @@ class PostSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'author', 'created_at', 'updated_at')
     
     def get_is_liked(self, obj):
+        if hasattr(obj, 'liked'):
+            return obj.liked
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Like.objects.filter(user=request.user, post=obj).exists()
         return False
     
     def get_comments_count(self, obj):
-        return obj.comments.count()
+        # Tombstones keep their place in the thread but are not counted.
+        return sum(1 for comment in obj.get_thread_comments() if comment.deleted_at is None)
+
+
+class PublicProfileFieldsSerializer(serializers.ModelSerializer):
+    """A profile nested under its own user: no second copy of the user"""
+    
+    class Meta:
+        model = UserProfile
+        fields = ('bio', 'profile_picture', 'slug')
+        read_only_fields = fields
+
+
+class ConnectedUserSerializer(serializers.ModelSerializer):
+    """Another user as any signed-in user may see them: no email, here or in the profile"""
+    profile = PublicProfileFieldsSerializer(read_only=True)
+    
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'first_name', 'last_name', 'profile')
 
 
 class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+    user = ConnectedUserSerializer(read_only=True)
     
     class Meta:
         model = Like
@@ -104,8 +158,8 @@ class LikeSerializer(serializers.ModelSerializer):
 
 
 class ConnectionSerializer(serializers.ModelSerializer):
-    sender = UserSerializer(read_only=True)
-    receiver = UserSerializer(read_only=True)
+    sender = UserReferenceSerializer(read_only=True)
+    receiver = UserReferenceSerializer(read_only=True)
     
     class Meta:
         model = Connection
@@ -119,4 +173,80 @@ class UserRecommendationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = User
-        fields = ('id', 'username', 'first_name', 'last_name', 'profile', 'mutual_connections_count')
\ No newline at end of file
+        fields = ('id', 'username', 'first_name', 'last_name', 'profile', 'mutual_connections_count')
+
+
+class PublicProfileSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='user_id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    # Stored counts (socialapp.profiles), attached by the view.
+    posts_count = serializers.IntegerField(source='stats.posts_count', read_only=True)
+    connections_count = serializers.IntegerField(source='stats.connections_count', read_only=True)
+    
+    class Meta:
+        model = UserProfile
+        fields = ('id', 'username', 'first_name', 'last_name', 'slug', 'bio', 'profile_picture',
+                  'posts_count', 'connections_count', 'created_at')
+        read_only_fields = fields
+
+# Flat representations used by the delta sync endpoint; related rows are ids.
+class SyncPostSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Post
+        fields = ('id', 'author', 'content', 'image', 'created_at', 'updated_at')
+
+
+class SyncCommentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Comment
+        fields = ('id', 'post', 'author', 'parent', 'content', 'created_at', 'updated_at')
+
+
+class SyncLikeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Like
+        fields = ('id', 'post', 'user', 'created_at')
+
+
+class SyncConnectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Connection
+        fields = ('id', 'sender', 'receiver', 'status', 'created_at', 'updated_at')
+
+
+class DataExportSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = DataExport
+        fields = ('id', 'status', 'section', 'rows_written', 'rows_total', 'progress', 'size',
+                  'download_url', 'created_at', 'finished_at')
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        if obj.status == 'succeeded':
+            return 1.0
+        return round(obj.rows_written / obj.rows_total, 3) if obj.rows_total else 0.0
+    
+    def get_download_url(self, obj):
+        if obj.status != 'succeeded':
+            return None
+        url = reverse('socialapp:data-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    summary = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Notification
+        fields = ('id', 'verb', 'target', 'actor_count', 'recent_actors', 'summary',
+                  'is_read', 'created_at', 'updated_at')
+        read_only_fields = fields
+    
+    def get_summary(self, obj):
+        return notifications.summary(obj)
@@ -0,0 +1,135 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Post, Comment, Like, Connection, UserProfile
+from .sync import record_change
+from . import events, graph, notifications, profiles, search
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Connection)
+def log_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(instance, 'created' if created else 'updated')
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Connection)
+def log_deleted(sender, instance, **kwargs):
+    record_change(instance, 'deleted')
+
+
+def dispatch_events(pending):
+    for user_id, event in pending:
+        events.publish(user_id, event)
+    notifications.deliver(pending)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Connection)
+def publish_events(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    pending = events.events_for(instance, created)
+    if pending:
+        # Only announce rows that actually committed.
+        transaction.on_commit(lambda: dispatch_events(pending))
+
+
+MEDIA_FIELDS = {Post: 'image', UserProfile: 'profile_picture'}
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=UserProfile)
+def release_replaced_media(sender, instance, raw=False, update_fields=None, **kwargs):
+    """A new upload or a cleared field drops the stored file: release its reference once committed"""
+    field = MEDIA_FIELDS[sender]
+    upload = getattr(instance, field)
+    if raw or instance._state.adding or (upload and upload._committed):
+        return
+    if update_fields is not None and field not in update_fields:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if old:
+        transaction.on_commit(lambda: default_storage.delete(old))
+
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_adjacency(sender, instance, **kwargs):
+    # After commit, so a concurrent read cannot cache the old list again.
+    transaction.on_commit(lambda: graph.invalidate(instance.sender_id, instance.receiver_id))
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.deleted_at is None:
+        profiles.adjust('posts_count', {instance.author_id: 1})
+
+
+@receiver(pre_save, sender=Connection)
+def remember_connection_status(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._stored_status = sender.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Connection)
+def count_accepted_connection(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_accepted = not created and getattr(instance, '_stored_status', None) == 'accepted'
+    delta = (instance.status == 'accepted') - was_accepted
+    if delta:
+        profiles.adjust('connections_count', {instance.sender_id: delta, instance.receiver_id: delta})
+
+
+@receiver(post_delete, sender=Connection)
+def count_deleted_connection(sender, instance, **kwargs):
+    if instance.status == 'accepted':
+        profiles.adjust('connections_count', {instance.sender_id: -1, instance.receiver_id: -1})
+
+
+@receiver(post_save, sender=User)
+def index_saved_user(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.is_active:
+        fields = {'username': instance.username, 'first_name': instance.first_name, 'last_name': instance.last_name}
+        transaction.on_commit(lambda: search.index_user(instance.pk, **fields))
+    else:
+        transaction.on_commit(lambda: search.unindex_user(instance.pk))
+
+
+# User fields other resources embed (UserSerializer) or filter on.
+EMBEDDED_USER_FIELDS = {'username', 'email', 'first_name', 'last_name', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def touch_profile(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Validators read profile.updated_at as the user's version: bump it when an embedded field may have changed"""
+    if raw or created or (update_fields is not None and not EMBEDDED_USER_FIELDS & set(update_fields)):
+        return
+    UserProfile.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=User)
+def unindex_deleted_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.unindex_user(instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+def index_saved_slug(sender, instance, raw=False, **kwargs):
+    # Only users the index already holds: an inactive account's profile stays out.
+    if not raw:
+        slug = instance.slug
+        transaction.on_commit(lambda: search.index_user(instance.user_id, create=False, slug=slug))
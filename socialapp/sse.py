@@ -0,0 +1,102 @@
+"""
+Server-sent events endpoint, mounted directly on the ASGI application.
+
+Each open stream is one coroutine waiting on a small bounded queue, so an idle
+connection costs a few KB and no thread; heartbeats keep proxies from timing
+the stream out and reveal dead peers.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from knox.auth import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .events import Subscriber, get_broker
+
+
+def _token_from_scope(scope):
+    # EventSource cannot set headers, so the token may also come in the query string.
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.split()
+            if len(parts) == 2 and parts[0].lower() == b'token':
+                return parts[1]
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+    return token[0].encode() if token else None
+
+
+@sync_to_async
+def _authenticate(token):
+    close_old_connections()
+    try:
+        user, _ = TokenAuthentication().authenticate_credentials(token)
+    except AuthenticationFailed:
+        return None
+    finally:
+        close_old_connections()
+    return user
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+
+
+async def _send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def event_stream(scope, receive, send):
+    """ASGI app streaming the authenticated user's events as text/event-stream"""
+    token = _token_from_scope(scope)
+    user = await _authenticate(token) if token else None
+    if user is None:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': b'{"detail": "Invalid token."}'})
+        return
+
+    heartbeat = getattr(settings, 'EVENT_STREAM_HEARTBEAT_SECONDS', 15)
+    subscriber = Subscriber(user.pk, asyncio.get_running_loop(), getattr(settings, 'EVENT_STREAM_QUEUE_SIZE', 64))
+
+    async def watch_disconnect():
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                subscriber.close()
+                return
+
+    broker = get_broker()
+    broker.subscribe(subscriber)
+    watcher = asyncio.ensure_future(watch_disconnect())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await _send_body(send, f'retry: {heartbeat * 1000}\n\n'.encode())
+        reported_drops = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                await _send_body(send, b': heartbeat\n\n')
+                continue
+            if event is None or subscriber.closed:
+                break
+            if subscriber.dropped != reported_drops:
+                # Tell the client it missed events so it can catch up via /api/sync/.
+                await _send_body(send, format_event({
+                    'id': event['id'], 'type': 'overflow', 'dropped': subscriber.dropped - reported_drops,
+                }))
+                reported_drops = subscriber.dropped
+            await _send_body(send, format_event(event))
+    except OSError:
+        pass
+    finally:
+        broker.unsubscribe(subscriber)
+        watcher.cancel()
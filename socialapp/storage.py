@@ -0,0 +1,139 @@
+"""
+Content-addressed, deduplicated storage for uploaded media.
+
+An upload is hashed (sha256) while it is copied to a temporary file, then
+stored once as ``cas/<aa>/<bb>/<digest><ext>``; the same bytes uploaded again
+only add a reference to the existing ``MediaBlob``. ``delete()`` releases a
+reference instead of removing the file, and ``collect_garbage`` (``manage.py
+gc_media``) removes blobs that nothing has referred to for ``MEDIA_GC_GRACE``,
+in batches. A blob's name never changes, so it can be served with immutable
+cache headers. Other names (data export archives, files stored before this
+backend) behave as on ``FileSystemStorage``.
+"""
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+PREFIX = 'cas/'
+CHUNK_SIZE = 64 * 1024
+
+
+def storage_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def blob_name(digest, extension):
+    return f'{PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The stored name is decided by the content in _save.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        temp_dir = self.path(PREFIX + '.tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            name = blob_name(digest.hexdigest(), os.path.splitext(name)[1].lower())
+            path = self.path(name)
+            # The row lock orders this against collect_garbage removing the same blob.
+            with transaction.atomic():
+                blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                    name=name, defaults={'digest': digest.hexdigest(), 'size': size, 'refcount': 1}
+                )
+                if not created:
+                    MediaBlob.objects.filter(pk=name).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    def delete(self, name):
+        """Release one reference to a blob; other files are deleted as usual"""
+        if not is_blob(name):
+            return super().delete(name)
+        from .models import MediaBlob
+
+        MediaBlob.objects.filter(pk=name, refcount__gt=0).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+
+
+def collect_garbage(grace=None, batch_size=None, storage=None):
+    """Remove blobs unreferenced for ``grace``, one transaction per batch; returns (blobs, bytes)"""
+    from .models import MediaBlob
+
+    storage = storage or default_storage
+    grace = storage_setting('MEDIA_GC_GRACE', timedelta(hours=1)) if grace is None else grace
+    batch_size = batch_size or storage_setting('MEDIA_GC_BATCH_SIZE', 500)
+    cutoff = timezone.now() - grace
+    removed = freed = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                MediaBlob.objects.select_for_update(skip_locked=True)
+                .filter(refcount=0, updated_at__lte=cutoff)
+                .values_list('name', 'size')[:batch_size]
+            )
+            for name, size in batch:
+                path = storage.path(name)
+                if os.path.exists(path):
+                    os.remove(path)
+                freed += size
+            MediaBlob.objects.filter(pk__in=[name for name, _ in batch]).delete()
+        removed += len(batch)
+        if len(batch) < batch_size:
+            return removed, freed
+
+
+def references():
+    """(queryset, field) pairs of every column that stores a media name"""
+    from .models import Post, UserProfile
+
+    return [(Post.all_objects.all(), 'image'), (UserProfile.objects.all(), 'profile_picture')]
+
+
+def recount_references(batch_size=None):
+    """Reset refcounts from the rows that point at each blob; returns how many were wrong"""
+    from .models import MediaBlob
+
+    batch_size = batch_size or storage_setting('MEDIA_GC_BATCH_SIZE', 500)
+    counts = Counter()
+    for queryset, field in references():
+        grouped = queryset.filter(**{f'{field}__startswith': PREFIX}).order_by().values(field).annotate(n=Count('pk'))
+        for row in grouped.iterator():
+            counts[row[field]] += row['n']
+    fixed, last = 0, ''
+    while True:
+        batch = list(MediaBlob.objects.filter(name__gt=last).order_by('name').values_list('name', 'refcount')[:batch_size])
+        for name, refcount in batch:
+            if refcount != counts[name]:
+                MediaBlob.objects.filter(pk=name).update(refcount=counts[name], updated_at=timezone.now())
+                fixed += 1
+        if len(batch) < batch_size:
+            return fixed
+        last = batch[-1][0]
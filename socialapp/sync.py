@@ -0,0 +1,172 @@
+"""
+Delta sync backed by the append-only ``ChangeLogEntry`` table.
+
+Model signals append one entry per change; clients poll with an opaque
+watermark and receive only entries written after it, so the cost of a poll
+tracks the change volume instead of the dataset size.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Post, Comment, Like, Connection, ChangeLogEntry
+from .serializers import (
+    SyncPostSerializer, SyncCommentSerializer, SyncLikeSerializer, SyncConnectionSerializer
+)
+
+WATERMARK_SALT = 'socialapp.sync'
+
+SYNC_MODELS = {
+    'post': (Post, SyncPostSerializer),
+    'comment': (Comment, SyncCommentSerializer),
+    'like': (Like, SyncLikeSerializer),
+    'connection': (Connection, SyncConnectionSerializer),
+}
+MODEL_NAMES = {model: name for name, (model, _) in SYNC_MODELS.items()}
+
+
+class WatermarkExpired(Exception):
+    """The watermark predates the tombstone retention window; a full resync is needed"""
+
+
+def sync_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def tombstone_payload(instance):
+    """Enough identifying fields for a client to drop the row locally"""
+    if isinstance(instance, Like):
+        return {'post': str(instance.post_id), 'user': instance.user_id}
+    if isinstance(instance, Comment):
+        return {'post': str(instance.post_id), 'parent': instance.parent_id}
+    if isinstance(instance, Connection):
+        return {'sender': instance.sender_id, 'receiver': instance.receiver_id}
+    return {}
+
+
+def change_entries(instance, action, skip_user=None):
+    """Unsaved change log entries for one change to ``instance``"""
+    name = MODEL_NAMES[type(instance)]
+    payload = tombstone_payload(instance) if action == 'deleted' else {}
+    if isinstance(instance, Connection):
+        # Connections are private to the two parties.
+        audience = [user_id for user_id in (instance.sender_id, instance.receiver_id) if user_id != skip_user]
+    else:
+        audience = [None]
+    return [
+        ChangeLogEntry(model=name, object_id=str(instance.pk), action=action, user_id=user_id, payload=payload)
+        for user_id in audience
+    ]
+
+
+def record_change(instance, action):
+    """Append change log entries for a saved or deleted instance"""
+    ChangeLogEntry.objects.bulk_create(change_entries(instance, action))
+
+
+def encode_watermark(cursor):
+    return signing.dumps({'c': cursor}, salt=WATERMARK_SALT)
+
+
+def decode_watermark(token):
+    """Return the cursor in ``token``; raises BadSignature or WatermarkExpired"""
+    retention = sync_setting('SYNC_TOMBSTONE_RETENTION', timedelta(days=30))
+    try:
+        return signing.loads(token, salt=WATERMARK_SALT, max_age=retention)['c']
+    except signing.SignatureExpired:
+        raise WatermarkExpired()
+
+
+def settled_entries(now=None):
+    # Entries younger than the settle window may still have lower-id siblings in
+    # uncommitted transactions; hold them back so a cursor never skips a row.
+    now = now or timezone.now()
+    settle = sync_setting('SYNC_SETTLE_SECONDS', 2)
+    return ChangeLogEntry.objects.filter(created_at__lte=now - timedelta(seconds=settle))
+
+
+def current_watermark():
+    latest = settled_entries().order_by('-id').values_list('id', flat=True).first()
+    return encode_watermark(latest or 0)
+
+
+def changes_since(user, cursor, limit):
+    """
+    Collapse the next ``limit`` entries visible to ``user`` into one change per object.
+
+    Returns ``(changes, next_cursor, has_more)``.
+    """
+    entries = list(
+        settled_entries()
+        .filter(id__gt=cursor)
+        .filter(Q(user__isnull=True) | Q(user=user))
+        .order_by('id')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], cursor, False
+
+    latest = {}
+    created = set()
+    for entry in entries:
+        key = (entry.model, entry.object_id)
+        latest[key] = entry
+        if entry.action == 'created':
+            created.add(key)
+
+    live_ids = {}
+    for (name, object_id), entry in latest.items():
+        if entry.action != 'deleted':
+            live_ids.setdefault(name, []).append(object_id)
+
+    rows = {}
+    for name, ids in live_ids.items():
+        model, serializer_class = SYNC_MODELS[name]
+        for pk, instance in model.objects.in_bulk(ids).items():
+            rows[(name, str(pk))] = serializer_class(instance).data
+
+    changes = []
+    for key, entry in sorted(latest.items(), key=lambda item: item[1].id):
+        name, object_id = key
+        data = rows.get(key)
+        if entry.action == 'deleted' or data is None:
+            changes.append({'model': name, 'id': object_id, 'action': 'deleted', 'data': entry.payload})
+        else:
+            action = 'created' if key in created else 'updated'
+            changes.append({'model': name, 'id': object_id, 'action': action, 'data': data})
+    return changes, entries[-1].id, has_more
+
+
+def compact_change_log(batch_size=1000, now=None):
+    """
+    Drop superseded entries and expired tombstones in bounded batches.
+
+    An entry is superseded once a newer entry exists for the same object and
+    audience; readers only ever need the latest one. Returns rows deleted.
+    """
+    now = now or timezone.now()
+    compact_before = now - sync_setting('SYNC_COMPACT_AFTER', timedelta(hours=1))
+    tombstone_before = now - sync_setting('SYNC_TOMBSTONE_RETENTION', timedelta(days=30))
+
+    newer = ChangeLogEntry.objects.filter(
+        model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id')
+    )
+    candidates = ChangeLogEntry.objects.filter(created_at__lt=compact_before)
+    superseded = [
+        candidates.filter(user__isnull=True).filter(Exists(newer.filter(user__isnull=True))),
+        candidates.filter(user__isnull=False).filter(Exists(newer.filter(user=OuterRef('user')))),
+    ]
+    expired = [ChangeLogEntry.objects.filter(action='deleted', created_at__lt=tombstone_before)]
+
+    deleted = 0
+    for queryset in superseded + expired:
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += ChangeLogEntry.objects.filter(id__in=ids).delete()[0]
+    return deleted
@@ -0,0 +1,392 @@
+"""
+A small database-backed task queue.
+
+Decorate a function with ``@task`` and call ``func.delay(...)`` to enqueue it
+as a ``Task`` row; ``manage.py taskworker`` claims ready rows and runs them on
+a thread or process pool, retrying failures with exponential backoff. With
+``TASKS_ALWAYS_EAGER`` the call runs inline instead, which is what tests and
+local development use.
+
+A claimed row is leased to its worker: the worker renews ``locked_at`` every
+``TASKS_HEARTBEAT_INTERVAL`` seconds while the task runs, and rows not renewed
+for ``TASKS_VISIBILITY_TIMEOUT`` seconds are given to another worker. Outcomes
+are only written while the lease is held, so a worker that lost its task
+cannot overwrite the state recorded by the one that took it over. Finished
+rows are deleted ``TASKS_RETENTION`` after they finish.
+
+A task declared with ``batch_size`` is called with a list of the argument
+lists of up to that many queued calls, which one worker slot claims and runs
+together; ``delay`` still enqueues one row per call.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts, backoff, batch_size=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, idempotency_key=None, countdown=0, **kwargs):
+        """Enqueue a call; returns the ``Task`` row (or None when run eagerly)"""
+        if getattr(settings, 'TASKS_ALWAYS_EAGER', False):
+            if self.batch_size:
+                self.func([list(args)])
+            else:
+                self.func(*args, **kwargs)
+            return None
+        return enqueue(self, args, kwargs, idempotency_key=idempotency_key, countdown=countdown)
+
+
+def task(func=None, *, name=None, max_attempts=5, backoff=2.0, batch_size=None):
+    """Register ``func`` as a background task; arguments must be JSON serializable"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        wrapped = TaskFunction(func, task_name, max_attempts, backoff, batch_size)
+        registry[task_name] = wrapped
+        return wrapped
+    return decorator(func) if func is not None else decorator
+
+
+def enqueue(task_function, args=(), kwargs=None, idempotency_key=None, countdown=0):
+    fields = {
+        'name': task_function.name,
+        'args': list(args),
+        'kwargs': kwargs or {},
+        'max_attempts': task_function.max_attempts,
+        'run_at': timezone.now() + timedelta(seconds=countdown),
+    }
+    if idempotency_key is None:
+        return Task.objects.create(**fields)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                return Task.objects.create(idempotency_key=idempotency_key, **fields)
+        except IntegrityError:
+            pass
+        # The key only deduplicates pending work: a finished row is queued again with the new call.
+        Task.objects.filter(idempotency_key=idempotency_key, status__in=('succeeded', 'failed')).update(
+            status='queued', attempts=0, locked_by='', locked_at=None, last_error='', finished_at=None,
+            updated_at=timezone.now(), **fields,
+        )
+        existing = Task.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+        # Pruned in between: try the insert again.
+    raise RuntimeError(f'Could not enqueue task with idempotency key {idempotency_key!r}')
+
+
+class TaskMetrics:
+    """Per-task-name counters and run time, kept in the worker process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'succeeded': 0, 'retried': 0, 'failed': 0, 'lost': 0, 'seconds': 0.0})
+
+    def record(self, name, outcome, seconds):
+        with self._lock:
+            stats = self._stats[name]
+            stats[outcome] += 1
+            stats['seconds'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+metrics = TaskMetrics()
+
+
+def retry_delay(task_function, attempts):
+    base = task_function.backoff ** attempts if task_function else 2 ** attempts
+    cap = getattr(settings, 'TASKS_MAX_RETRY_DELAY', 3600)
+    return min(base, cap) * random.uniform(0.8, 1.2)
+
+
+def finish(instance, task_function, worker_id, error):
+    """Record the outcome of a run of ``instance`` if ``worker_id`` still holds its lease; returns it"""
+    # Every outcome is written only if this worker still holds the lease.
+    leased = Task.objects.filter(pk=instance.pk, status='running', locked_by=worker_id)
+    if error is None:
+        updated = leased.update(status='succeeded', finished_at=timezone.now(), last_error='')
+        outcome = 'succeeded'
+    elif task_function is not None and instance.attempts < instance.max_attempts:
+        updated = leased.update(
+            status='queued', locked_by='', locked_at=None, last_error=error,
+            run_at=timezone.now() + timedelta(seconds=retry_delay(task_function, instance.attempts)),
+        )
+        outcome = 'retried'
+    else:
+        updated = leased.update(status='failed', last_error=error, finished_at=timezone.now())
+        outcome = 'failed'
+    if updated and error is not None:
+        logger.warning('Task %s (%s) %s after attempt %s', instance.name, instance.pk, outcome, instance.attempts)
+    if not updated:
+        logger.warning('Task %s (%s) lost its lease to another worker; outcome %s discarded', instance.name, instance.pk, outcome)
+        outcome = 'lost'
+    return outcome
+
+
+def execute(task_id, worker_id):
+    """
+    Run a task claimed by ``worker_id`` and record the outcome. Returns
+    ``(name, outcome, seconds)``; the outcome is ``lost`` when the lease had
+    passed to another worker by the time the task finished.
+
+    Module level so it can be shipped to a process pool by id.
+    """
+    close_old_connections()
+    instance = Task.objects.get(pk=task_id)
+    task_function = registry.get(instance.name)
+    started = time.monotonic()
+    error = None
+    try:
+        if task_function is None:
+            raise LookupError(f'Unknown task {instance.name!r}')
+        task_function.func(*instance.args, **instance.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+    elapsed = time.monotonic() - started
+    try:
+        outcome = finish(instance, task_function, worker_id, error)
+    finally:
+        close_old_connections()
+    return instance.name, outcome, elapsed
+
+
+def execute_batch(task_ids, worker_id):
+    """
+    Run claimed calls of one batch task as a single call; returns one
+    ``(name, outcome, seconds)`` per task, each with its share of the run time.
+    """
+    close_old_connections()
+    instances = list(Task.objects.filter(pk__in=task_ids).order_by('run_at', 'id'))
+    task_function = registry.get(instances[0].name)
+    started = time.monotonic()
+    error = None
+    try:
+        if task_function is None:
+            raise LookupError(f'Unknown task {instances[0].name!r}')
+        task_function.func([instance.args for instance in instances])
+    except Exception:
+        error = traceback.format_exc()
+    elapsed = (time.monotonic() - started) / len(instances)
+    try:
+        if error is None:
+            # One UPDATE for the whole batch; rows whose lease moved on are not matched.
+            updated = Task.objects.filter(pk__in=task_ids, status='running', locked_by=worker_id).update(
+                status='succeeded', finished_at=timezone.now(), last_error=''
+            )
+            outcomes = ['succeeded'] * updated + ['lost'] * (len(instances) - updated)
+        else:
+            outcomes = [finish(instance, task_function, worker_id, error) for instance in instances]
+    finally:
+        close_old_connections()
+    return [(instance.name, outcome, elapsed) for instance, outcome in zip(instances, outcomes)]
+
+
+def prune_finished(retention=None, batch_size=1000):
+    """Delete succeeded and failed rows that finished more than ``retention`` ago; returns rows deleted"""
+    retention = retention or getattr(settings, 'TASKS_RETENTION', timedelta(days=7))
+    finished = Task.objects.filter(
+        status__in=('succeeded', 'failed'), finished_at__lt=timezone.now() - retention
+    ).order_by('finished_at')
+    deleted = 0
+    while True:
+        batch = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Task.objects.filter(pk__in=batch).delete()[0]
+
+
+class Worker:
+    """
+    Polls for ready tasks and runs them on a thread or process pool.
+
+    Tasks are submitted one by one as slots free up, so a slow task only
+    holds its own slot. A heartbeat thread renews the leases of the running
+    tasks. The process pool forks (Unix only) so children inherit the task
+    registry and settings; database connections are closed before each
+    submission so no socket is shared across the fork.
+    """
+
+    def __init__(self, concurrency=4, pool='thread', worker_id=None):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopped = threading.Event()
+        self.heartbeat_stopped = threading.Event()
+        # Future -> ids of the tasks it runs (several for a batch); the heartbeat thread reads it.
+        self.running = {}
+        self._running_lock = threading.Lock()
+        self.pruned_at = None
+        if pool == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('fork'))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='taskworker')
+
+    def requeue_stale(self):
+        """Give tasks whose lease was not renewed (their worker died) back to the queue"""
+        timeout = getattr(settings, 'TASKS_VISIBILITY_TIMEOUT', 600)
+        return Task.objects.filter(
+            status='running', locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+        ).update(status='queued', locked_by='', locked_at=None)
+
+    def claim(self, limit):
+        now = timezone.now()
+        candidates = Task.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+        claimed = []
+        for task_id in candidates.values_list('id', flat=True)[:limit]:
+            # Conditional UPDATE: exactly one worker wins each row, on any backend.
+            won = Task.objects.filter(pk=task_id, status='queued').update(
+                status='running', locked_by=self.worker_id, locked_at=now, attempts=F('attempts') + 1
+            )
+            if won:
+                claimed.append(task_id)
+        return claimed
+
+    def claim_batch(self, name, limit):
+        """Claim up to ``limit`` ready calls of the task ``name`` with one UPDATE; returns their ids"""
+        now = timezone.now()
+        ready = Task.objects.filter(name=name, status='queued', run_at__lte=now).order_by('run_at', 'id')
+        task_ids = list(ready.values_list('id', flat=True)[:limit])
+        if not task_ids:
+            return []
+        Task.objects.filter(pk__in=task_ids, status='queued').update(
+            status='running', locked_by=self.worker_id, locked_at=now, attempts=F('attempts') + 1
+        )
+        # Rows another worker claimed in between keep its lock.
+        return list(Task.objects.filter(
+            pk__in=task_ids, status='running', locked_by=self.worker_id, locked_at=now
+        ).values_list('id', flat=True))
+
+    def renew_leases(self):
+        """Push back the lease of every task this worker is running; returns rows renewed"""
+        with self._running_lock:
+            task_ids = [task_id for ids in self.running.values() for task_id in ids]
+        if not task_ids:
+            return 0
+        return Task.objects.filter(pk__in=task_ids, status='running', locked_by=self.worker_id).update(
+            locked_at=timezone.now()
+        )
+
+    def heartbeat(self):
+        interval = getattr(settings, 'TASKS_HEARTBEAT_INTERVAL', 60)
+        try:
+            while not self.heartbeat_stopped.wait(interval):
+                try:
+                    self.renew_leases()
+                except Exception:
+                    logger.exception('Could not renew task leases')
+        finally:
+            connections.close_all()
+
+    def prune(self):
+        interval = getattr(settings, 'TASKS_PRUNE_INTERVAL', 3600)
+        if self.pruned_at is None or time.monotonic() - self.pruned_at > interval:
+            self.pruned_at = time.monotonic()
+            prune_finished()
+
+    def submit_ready(self):
+        """Claim tasks for the free slots and start them; returns the number started"""
+        self.requeue_stale()
+        self.prune()
+        claimed = self.claim(self.concurrency - len(self.running))
+        names = dict(Task.objects.filter(pk__in=claimed).values_list('id', 'name')) if claimed else {}
+        started = len(claimed)
+        batches = {}
+        for task_id in claimed:
+            task_function = registry.get(names.get(task_id))
+            if task_function is not None and task_function.batch_size:
+                batches.setdefault(task_function, []).append(task_id)
+            else:
+                self.submit(execute, task_id, [task_id])
+        for task_function, task_ids in batches.items():
+            more = self.claim_batch(task_function.name, task_function.batch_size - len(task_ids))
+            started += len(more)
+            self.submit(execute_batch, task_ids + more, task_ids + more)
+        return started
+
+    def submit(self, function, argument, task_ids):
+        if self.pool == 'process':
+            connections.close_all()
+        future = self.executor.submit(function, argument, self.worker_id)
+        with self._running_lock:
+            self.running[future] = task_ids
+
+    def collect(self, timeout):
+        """Wait up to ``timeout`` seconds for running tasks; returns the number that finished"""
+        if not self.running:
+            return 0
+        done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            with self._running_lock:
+                task_ids = self.running.pop(future)
+            try:
+                results = future.result()
+            except Exception:
+                # The pool itself failed (e.g. a killed child); the lease expires and the task is retried.
+                logger.exception('Tasks %s crashed their worker', task_ids)
+                continue
+            # execute returns one result, execute_batch a list of them.
+            for name, outcome, seconds in (results if isinstance(results, list) else [results]):
+                metrics.record(name, outcome, seconds)
+        return len(done)
+
+    def run_once(self):
+        """Claim one batch and wait for all of it; returns the number of tasks run"""
+        started = self.submit_ready()
+        while self.running:
+            self.collect(None)
+        return started
+
+    def run(self, poll_interval=1.0, burst=False):
+        beat = threading.Thread(target=self.heartbeat, name='taskworker-heartbeat', daemon=True)
+        beat.start()
+        try:
+            while not self.stopped.is_set():
+                started = self.submit_ready() if len(self.running) < self.concurrency else 0
+                if not started and not self.running:
+                    if burst:
+                        return
+                    self.stopped.wait(poll_interval)
+                    continue
+                # Back as soon as any task finishes, to refill its slot.
+                self.collect(poll_interval)
+        finally:
+            # Leases are still renewed while the running tasks finish.
+            while self.running:
+                self.collect(None)
+            self.heartbeat_stopped.set()
+            self.executor.shutdown(wait=True)
+            beat.join()
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .exports import build_export, prune_expired
+from .models import DataExport, UserProfile
+from . import notifications, purge, tokens
+from .taskqueue import task
+
+
+@task
+def create_user_profile(user_id):
+    """Create a user's profile if they have none; registration creates it inline, so this is a repair"""
+    try:
+        with transaction.atomic():
+            UserProfile.objects.get_or_create(user_id=user_id)
+    except IntegrityError:
+        # Created concurrently (e.g. by ProfileView); nothing left to do.
+        pass
+
+
+@task(max_attempts=3)
+def build_data_export(export_id):
+    """Write the user's data archive for a ``DataExport`` request"""
+    export = DataExport.objects.select_related('user').filter(pk=export_id).first()
+    if export is not None and export.status != 'succeeded':
+        build_export(export)
+
+
+@task
+def prune_data_exports():
+    """Delete exports, archive and row, older than ``EXPORT_RETENTION``"""
+    prune_expired()
+
+
+@task
+def purge_post(post_id):
+    """Remove a soft-deleted post and everything hanging off it"""
+    purge.purge_post(post_id)
+
+
+@task
+def purge_user(user_id):
+    """Remove a deactivated account and everything it owns"""
+    purge.purge_user(user_id)
+
+
+@task
+def purge_expired_tokens():
+    """Delete expired knox tokens in batches"""
+    tokens.purge_expired()
+
+
+@task(batch_size=getattr(settings, 'NOTIFICATION_BATCH_SIZE', 500))
+def write_notifications(calls):
+    """Fold queued inbox events into the inbox, one batch per call"""
+    notifications.write_batch([(recipient_id, event) for recipient_id, event in calls])
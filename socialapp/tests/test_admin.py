@@ -0,0 +1,93 @@
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from socialapp.models import Comment, Like, Post
+from socialapp.pagination import EstimatedCountPaginator
+
+
+class ScalableAdminTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpassword123')
+        self.client.force_login(self.admin)
+        self.author = User.objects.create_user(username='author', password='testpassword123')
+        self.post = Post.objects.create(author=self.author, content='Admin post')
+        Like.objects.create(user=self.admin, post=self.post)
+        self.url = reverse('admin:socialapp_post_changelist')
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_post_changelist_queries_do_not_grow_with_rows(self):
+        before = self.changelist_queries(self.url)
+        for i in range(20):
+            post = Post.objects.create(author=self.author, content=f'Post {i}')
+            Comment.objects.create(post=post, author=self.author, content='Comment')
+        self.assertEqual(self.changelist_queries(self.url), before)
+        self.assertEqual(self.changelist_queries(reverse('admin:socialapp_comment_changelist')), before)
+
+    def test_post_changelist_shows_annotated_likes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_list[0].likes_total, 1)
+
+    def test_soft_deleted_rows_are_listed_and_editable(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Comment')
+        Post.all_objects.filter(pk=self.post.pk).update(deleted_at=self.post.created_at)
+        Comment.all_objects.filter(pk=comment.pk).update(deleted_at=comment.created_at)
+        response = self.client.get(self.url)
+        self.assertEqual([post.pk for post in response.context['cl'].result_list], [self.post.pk])
+        response = self.client.get(self.url, {'deleted_at__isempty': '1'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+        comments = self.client.get(reverse('admin:socialapp_comment_changelist'))
+        self.assertEqual([row.pk for row in comments.context['cl'].result_list], [comment.pk])
+        change = self.client.get(reverse('admin:socialapp_post_change', args=[self.post.pk]))
+        self.assertEqual(change.status_code, 200)
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_changelists_are_ordered_by_an_index_over_every_row(self):
+        for url, index in ((self.url, 'posts_admin_idx'), (reverse('admin:socialapp_comment_changelist'), 'comments_admin_idx')):
+            cl = self.client.get(url).context['cl']
+            plan = cl.queryset[:cl.list_per_page].explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_likes_column_is_not_sortable(self):
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context['cl'].get_ordering_field('likes_total'))
+
+    def test_search_matches_exact_keys_only(self):
+        other = Post.objects.create(author=self.admin, content='Other post')
+        for term, expected in ((str(other.id), [other]), ('author', [self.post]), ('auth', []), ('Admin post', [])):
+            response = self.client.get(self.url, {'q': term})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['cl'].result_list), expected)
+
+    def test_comment_search_skips_fields_the_term_does_not_fit(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Comment')
+        response = self.client.get(reverse('admin:socialapp_comment_changelist'), {'q': str(comment.id)})
+        self.assertEqual(list(response.context['cl'].result_list), [comment])
+
+    def test_autocomplete_uses_index_backed_search(self):
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'auth', 'app_label': 'socialapp', 'model_name': 'post', 'field_name': 'author',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['author'])
+        change = self.client.get(reverse('admin:socialapp_post_change', args=[self.post.pk]))
+        self.assertEqual(change.status_code, 200)
+
+    def test_estimated_count_paginator_stops_counting_at_limit(self):
+        for i in range(4):
+            Post.objects.create(author=self.author, content=f'Post {i}')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        paginator.exact_limit = 3
+        # SQLite has no planner estimate, so the count stops at limit + 1.
+        self.assertEqual(paginator.count, 4)
+        paginator = EstimatedCountPaginator(Post.objects.filter(author=self.admin), 2)
+        self.assertEqual(paginator.count, 0)
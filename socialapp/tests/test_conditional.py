@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from socialapp.models import Post, Like, Comment, UserProfile
+
+
+class PostConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(author=self.user, content='Test post content')
+        self.posts_url = reverse('socialapp:post-list-create')
+        self.post_detail_url = reverse('socialapp:post-detail', kwargs={'pk': self.post.id})
+
+    def test_list_emits_validators(self):
+        response = self.client.get(self.posts_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_list_not_modified(self):
+        etag = self.client.get(self.posts_url)['ETag']
+        response = self.client.get(self.posts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_new_like(self):
+        etag = self.client.get(self.posts_url)['ETag']
+        Like.objects.create(user=self.user, post=self.post)
+        response = self.client.get(self.posts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_covers_only_the_page(self):
+        newer = [Post.objects.create(author=self.user, content=f'Newer post {i}') for i in range(20)][-1]
+        etag = self.client.get(self.posts_url)['ETag']
+        # A like on a post of page 2 leaves page 1 as it was.
+        Like.objects.create(user=self.user, post=self.post)
+        response = self.client.get(self.posts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        Like.objects.create(user=self.user, post=newer)
+        response = self.client.get(self.posts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_changes_when_an_author_profile_changes(self):
+        profile = UserProfile.objects.create(user=self.user, bio='Before')
+        etag = self.client.get(self.posts_url)['ETag']
+        UserProfile.objects.filter(pk=profile.pk).update(updated_at=profile.updated_at + timedelta(seconds=1))
+        response = self.client.get(self.posts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etags_change_when_a_user_is_renamed(self):
+        UserProfile.objects.create(user=self.user)
+        comment = Comment.objects.create(post=self.post, author=self.user, content='Comment')
+        urls = [
+            self.posts_url, self.post_detail_url, reverse('socialapp:profile'),
+            reverse('socialapp:comment-list-create', kwargs={'post_id': self.post.id}),
+            reverse('socialapp:comment-detail', kwargs={'pk': comment.id}),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        # A login only stamps last_login, which no response shows.
+        self.user.last_login = self.user.date_joined
+        self.user.save(update_fields=['last_login'])
+        for url in urls:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.user.username = 'renamed'
+        self.user.save()
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+
+    def test_detail_not_modified_skips_serialization(self):
+        etag = self.client.get(self.post_detail_url)['ETag']
+        # Validators + auth only; the serializer's per-post queries must not run.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.post_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_on_new_comment(self):
+        etag = self.client.get(self.post_detail_url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, content='New comment')
+        response = self.client.get(self.post_detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.post_detail_url)['Last-Modified']
+        response = self.client.get(self.post_detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class CommentConditionalGetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(author=self.user, content='Test post content')
+        Comment.objects.create(post=self.post, author=self.user, content='First')
+        self.comments_url = reverse('socialapp:comment-list-create', kwargs={'post_id': self.post.id})
+
+    def test_comment_list_not_modified(self):
+        etag = self.client.get(self.comments_url)['ETag']
+        response = self.client.get(self.comments_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
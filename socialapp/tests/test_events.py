@@ -0,0 +1,97 @@
+import asyncio
+from django.test import SimpleTestCase, TestCase
+from django.contrib.auth.models import User
+from knox.models import AuthToken
+from socialapp.models import Post, Like, Comment, Connection
+from socialapp.events import InProcessBackend, Subscriber, events_for
+from socialapp.sse import event_stream
+from socialapp import events
+
+
+class BrokerTest(SimpleTestCase):
+    def test_bounded_queue_drops_oldest(self):
+        async def scenario():
+            backend = InProcessBackend()
+            subscriber = Subscriber(1, asyncio.get_running_loop(), maxsize=2)
+            backend.subscribe(subscriber)
+            for i in range(3):
+                backend.publish(1, {'type': 'like', 'n': i})
+            backend.publish(2, {'type': 'like', 'n': 99})
+            await asyncio.sleep(0)
+            received = [subscriber.queue.get_nowait()['n'] for _ in range(subscriber.queue.qsize())]
+            return received, subscriber.dropped
+
+        received, dropped = asyncio.run(scenario())
+        self.assertEqual(received, [1, 2])
+        self.assertEqual(dropped, 1)
+
+    def test_unsubscribe(self):
+        backend = InProcessBackend()
+        subscriber = Subscriber(1, asyncio.new_event_loop(), maxsize=2)
+        backend.subscribe(subscriber)
+        backend.unsubscribe(subscriber)
+        self.assertEqual(backend.subscriber_count(), 0)
+
+
+class EventsForTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpassword123')
+        self.fan = User.objects.create_user(username='fan', password='testpassword123')
+        self.post = Post.objects.create(author=self.author, content='Hello')
+
+    def test_like_notifies_post_author(self):
+        like = Like.objects.create(user=self.fan, post=self.post)
+        self.assertEqual(events_for(like, created=True), [
+            (self.author.id, {'type': 'like', 'post': str(self.post.id), 'actor': self.fan.id}),
+        ])
+
+    def test_own_like_is_silent(self):
+        like = Like.objects.create(user=self.author, post=self.post)
+        self.assertEqual(events_for(like, created=True), [])
+
+    def test_reply_notifies_post_and_parent_authors(self):
+        parent = Comment.objects.create(post=self.post, author=self.fan, content='First')
+        third = User.objects.create_user(username='third', password='testpassword123')
+        reply = Comment.objects.create(post=self.post, author=third, content='Reply', parent=parent)
+        types = {(user_id, event['type']) for user_id, event in events_for(reply, created=True)}
+        self.assertEqual(types, {(self.author.id, 'comment'), (self.fan.id, 'reply')})
+
+    def test_connection_accept_notifies_sender(self):
+        connection = Connection.objects.create(sender=self.fan, receiver=self.author)
+        connection.status = 'accepted'
+        self.assertEqual(events_for(connection, created=False)[0][0], self.fan.id)
+
+
+class EventStreamTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author', password='testpassword123')
+        self.token = AuthToken.objects.create(self.user)[1]
+
+    async def run_stream(self, query_string, publish=None):
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if publish and message['type'] == 'http.response.start':
+                asyncio.get_running_loop().call_soon(publish)
+            elif message.get('body', b'').startswith(b'id:'):
+                disconnect.set()
+
+        scope = {'type': 'http', 'path': '/api/events/', 'headers': [], 'query_string': query_string}
+        await asyncio.wait_for(event_stream(scope, receive, send), 5)
+        return sent
+
+    async def test_rejects_missing_token(self):
+        sent = await self.run_stream(b'')
+        self.assertEqual(sent[0]['status'], 401)
+
+    async def test_streams_published_event(self):
+        publish = lambda: events.publish(self.user.id, {'type': 'like', 'post': 'abc', 'actor': 2})
+        sent = await self.run_stream(f'token={self.token}'.encode(), publish)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'event: like', sent[-1]['body'])
@@ -0,0 +1,109 @@
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from django.utils import timezone
+from rest_framework import status
+from socialapp import exports, purge
+from socialapp.models import UserProfile, Post, Like, Connection, Comment, DataExport
+from socialapp.exports import keyset_batches
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, DATA_EXPORT_BATCH_SIZE=2, TASKS_ALWAYS_EAGER=True)
+class DataExportTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        UserProfile.objects.create(user=self.user, bio='Test bio')
+        self.other = User.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [Post.objects.create(author=self.user, content=f'Post {i}') for i in range(5)]
+        self.posts[0].image = SimpleUploadedFile('photo.png', b'fake image bytes', content_type='image/png')
+        self.posts[0].save()
+        Comment.objects.create(post=self.posts[1], author=self.user, content='Test comment')
+        Like.objects.create(user=self.user, post=self.posts[2])
+        Connection.objects.create(sender=self.other, receiver=self.user, status='accepted')
+        Post.objects.create(author=self.other, content='Not mine')
+
+    def test_keyset_batches_cover_every_row_once(self):
+        batches = list(keyset_batches(Post.objects.filter(author=self.user), ('content',), 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual({row['content'] for batch in batches for row in batch}, {f'Post {i}' for i in range(5)})
+
+    def test_export_builds_archive_and_downloads(self):
+        response = self.client.post(reverse('socialapp:data-export-list-create'))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual(response.data['rows_written'], response.data['rows_total'])
+        self.assertEqual(response.data['rows_total'], 9)
+
+        detail = self.client.get(reverse('socialapp:data-export-detail', args=[response.data['id']]))
+        self.assertEqual(detail.data['progress'], 1.0)
+
+        download = self.client.get(detail.data['download_url'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        with tempfile.TemporaryFile() as f:
+            for chunk in download.streaming_content:
+                f.write(chunk)
+            with zipfile.ZipFile(f) as archive:
+                names = set(archive.namelist())
+                posts = [json.loads(line) for line in archive.read('posts.ndjson').splitlines()]
+                connections = [json.loads(line) for line in archive.read('connections.ndjson').splitlines()]
+                image = archive.read(f'media/{self.posts[0].image.name}')
+                compression = {info.filename: info.compress_type for info in archive.infolist()}
+        self.assertIn('profile.ndjson', names)
+        self.assertEqual(len(posts), 5)
+        self.assertNotIn('Not mine', [post['content'] for post in posts])
+        self.assertEqual(connections[0]['sender__username'], 'otheruser')
+        self.assertEqual(image, b'fake image bytes')
+        self.assertEqual(compression[f'media/{self.posts[0].image.name}'], zipfile.ZIP_STORED)
+        self.assertEqual(compression['posts.ndjson'], zipfile.ZIP_DEFLATED)
+
+    def test_running_export_is_reused(self):
+        export = DataExport.objects.create(user=self.user, status='running')
+        response = self.client.post(reverse('socialapp:data-export-list-create'))
+        self.assertEqual(response.data['id'], str(export.pk))
+        self.assertEqual(DataExport.objects.count(), 1)
+
+    def test_other_users_export_is_not_visible(self):
+        export = DataExport.objects.create(user=self.other, status='succeeded', archive='exports/x.zip')
+        response = self.client.get(reverse('socialapp:data-export-download', args=[export.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_exports_are_pruned_with_their_archives(self):
+        exports._scheduled_slot = None
+        with self.captureOnCommitCallbacks(execute=True):
+            old = self.client.post(reverse('socialapp:data-export-list-create')).data
+        archive = DataExport.objects.get(pk=old['id']).archive.name
+        DataExport.objects.filter(pk=old['id']).update(finished_at=timezone.now() - timedelta(days=8))
+        self.assertTrue(default_storage.exists(archive))
+
+        exports._scheduled_slot = None
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            recent = self.client.post(reverse('socialapp:data-export-list-create')).data
+            self.client.post(reverse('socialapp:data-export-list-create'))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(DataExport.objects.filter(pk=old['id']).exists())
+        self.assertTrue(DataExport.objects.filter(pk=recent['id']).exists())
+        self.assertFalse(default_storage.exists(archive))
+
+    def test_purge_user_deletes_exports(self):
+        archive = DataExport.objects.get(pk=self.client.post(reverse('socialapp:data-export-list-create')).data['id']).archive.name
+        purge.deactivate_account(self.user)
+        self.assertTrue(purge.purge_user(self.user.pk))
+        self.assertFalse(DataExport.objects.exists())
+        self.assertFalse(default_storage.exists(archive))
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp import graph
+from socialapp.models import ChangeLogEntry, Connection
+
+
+class ConnectionGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = {
+            name: User.objects.create_user(username=name, password='testpassword123')
+            for name in ('me', 'ann', 'bob', 'cat', 'dan', 'eve', 'far')
+        }
+        self.me = self.users['me']
+        self.client.force_authenticate(user=self.me)
+        # me - ann - cat - dan - eve, me - bob - cat, far on its own
+        for sender, receiver in (('me', 'ann'), ('bob', 'me'), ('ann', 'cat'), ('cat', 'bob'), ('cat', 'dan'), ('dan', 'eve')):
+            self.connect(sender, receiver)
+        Connection.objects.create(sender=self.me, receiver=self.users['far'], status='pending')
+
+    def connect(self, sender, receiver):
+        with self.captureOnCommitCallbacks(execute=True):
+            Connection.objects.create(sender=self.users[sender], receiver=self.users[receiver], status='accepted')
+
+    def ids(self, *names):
+        return [self.users[name].pk for name in names]
+
+    def degree(self, name):
+        response = self.client.get(reverse('socialapp:user-degree', args=[self.users[name].pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_degrees_with_sample_paths(self):
+        ann = self.degree('ann')
+        self.assertEqual((ann['degree'], ann['label']), (1, '1st'))
+        self.assertEqual([step['username'] for step in ann['path']], ['me', 'ann'])
+        cat = self.degree('cat')
+        self.assertEqual((cat['degree'], cat['label'], cat['mutual_connections_count']), (2, '2nd', 2))
+        self.assertIn([step['username'] for step in cat['path']], (['me', 'ann', 'cat'], ['me', 'bob', 'cat']))
+        self.assertEqual(self.degree('dan')['label'], '3rd')
+        eve = self.degree('eve')
+        self.assertEqual((eve['degree'], eve['label'], eve['path'], eve['complete']), (None, '3rd+', None, True))
+        self.assertEqual(self.degree('far')['degree'], None)
+
+    def test_own_degree_is_labelled_self(self):
+        me = self.degree('me')
+        self.assertEqual((me['degree'], me['label']), (0, 'self'))
+
+    def test_path_through_a_purged_account_is_searched_again(self):
+        self.degree('cat')
+        # Deleted without the on-commit invalidation, as in another process.
+        ann = self.users['ann'].pk
+        self.users['ann'].delete()
+        ChangeLogEntry.objects.filter(user_id=ann).delete()
+        cat = self.degree('cat')
+        self.assertEqual([step['username'] for step in cat['path']], ['me', 'bob', 'cat'])
+
+    def test_search_limits(self):
+        me, eve = self.ids('me', 'eve')
+        path, complete = graph.shortest_path(me, eve, max_depth=4)
+        self.assertTrue(complete)
+        self.assertEqual(path[2:], self.ids('cat', 'dan', 'eve'))
+        self.assertEqual(graph.shortest_path(me, eve, time_budget=-1), (None, False))
+
+    def test_mutual_connections_paginate_by_id(self):
+        self.connect('me', 'dan')
+        self.connect('me', 'eve')
+        self.connect('eve', 'cat')
+        url = reverse('socialapp:mutual-connections', args=[self.users['cat'].pk])
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual([user['username'] for user in response.data['results']], ['ann', 'bob'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([user['username'] for user in response.data['results']], ['dan', 'eve'])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.client.get(reverse('socialapp:mutual-connections', args=[999999])).status_code, 404)
+
+    def test_intersect_sorted(self):
+        self.assertEqual(graph.intersect_sorted([1, 3, 5, 7], [2, 3, 4, 7, 9]), [3, 7])
+        self.assertEqual(graph.intersect_sorted([5, 500], list(range(0, 1000, 5))), [5, 500])
+        self.assertEqual(graph.intersect_sorted([], [1, 2]), [])
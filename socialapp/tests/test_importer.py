@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+from socialapp.models import UserProfile, Post, Comment, Like, Connection
+from socialapp.importer import deferred_indexes, import_file
+
+POST_ID = '8b0f5a4e-6c0e-4a57-9d55-8f0e3f1d2c11'
+
+
+class ImportDataCommandTest(TestCase):
+    def write(self, lines, suffix='.jsonl'):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w') as f:
+            f.write('\n'.join(json.dumps(line) if isinstance(line, dict) else line for line in lines) + '\n')
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_data(self, path, *args):
+        out = StringIO()
+        call_command('import_data', path, '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_imports_all_record_types(self):
+        UserProfile.objects.create(user=User.objects.create_user(username='bob-smith'))
+        path = self.write([
+            {'type': 'user', 'username': 'alice', 'password': 'testpassword123', 'bio': 'Hi'},
+            {'type': 'user', 'username': 'Bob.Smith', 'password': 'testpassword123'},
+            {'type': 'post', 'id': POST_ID, 'author': 'alice', 'content': 'Test post content'},
+            {'type': 'comment', 'ref': 'c1', 'post': POST_ID, 'author': 'Bob.Smith', 'content': 'Nice'},
+            {'type': 'comment', 'parent': 'c1', 'post': POST_ID, 'author': 'alice', 'content': 'Thanks'},
+            {'type': 'like', 'user': 'Bob.Smith', 'post': POST_ID},
+            {'type': 'like', 'user': 'nobody', 'post': POST_ID},
+            {'type': 'connection', 'sender': 'alice', 'receiver': 'Bob.Smith', 'status': 'accepted'},
+        ])
+        output = self.import_data(path, '--batch-size', '2')
+
+        self.assertIn('Imported 7 rows', output)
+        alice = User.objects.get(username='alice')
+        self.assertTrue(alice.check_password('testpassword123'))
+        self.assertEqual(alice.profile.bio, 'Hi')
+        self.assertEqual(UserProfile.objects.get(user__username='Bob.Smith').slug, 'bobsmith')
+        self.assertEqual(Post.objects.get(pk=POST_ID).author, alice)
+        reply = Comment.objects.get(content='Thanks')
+        self.assertEqual(reply.parent.content, 'Nice')
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertTrue(Connection.are_connected(alice, User.objects.get(username='Bob.Smith')))
+
+    def test_rerun_skips_existing_users_and_posts(self):
+        path = self.write([
+            {'type': 'user', 'username': 'alice'},
+            {'type': 'post', 'id': POST_ID, 'author': 'alice', 'content': 'Test post content'},
+        ])
+        self.import_data(path)
+        self.import_data(path)
+        self.assertEqual(User.objects.count(), 1)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_duplicate_likes_and_connections_are_counted_as_skipped(self):
+        path = self.write([
+            {'type': 'user', 'username': 'alice'},
+            {'type': 'user', 'username': 'bob'},
+            {'type': 'post', 'id': POST_ID, 'author': 'alice', 'content': 'Test post content'},
+            {'type': 'like', 'user': 'bob', 'post': POST_ID},
+            {'type': 'like', 'user': 'bob', 'post': POST_ID},
+            {'type': 'connection', 'sender': 'alice', 'receiver': 'bob', 'status': 'accepted'},
+        ])
+        written, skipped, _ = import_file(path, workers=1)
+        self.assertEqual((written['like'], skipped['like']), (1, 1))
+        self.assertEqual((written['connection'], skipped['connection']), (1, 0))
+        written, skipped, _ = import_file(path, workers=1)
+        self.assertEqual((written.get('like', 0), skipped['like']), (0, 2))
+        self.assertEqual((written.get('connection', 0), skipped['connection']), (0, 1))
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(Connection.objects.count(), 1)
+
+    def test_connection_in_either_direction_is_one_connection(self):
+        users = [{'type': 'user', 'username': 'alice'}, {'type': 'user', 'username': 'bob'}]
+        path = self.write(users + [
+            {'type': 'connection', 'sender': 'alice', 'receiver': 'bob', 'status': 'accepted'},
+            {'type': 'connection', 'sender': 'bob', 'receiver': 'alice', 'status': 'pending'},
+        ])
+        written, skipped, _ = import_file(path, workers=1)
+        self.assertEqual((written['connection'], skipped['connection']), (1, 1))
+        reverse = self.write(users + [{'type': 'connection', 'sender': 'bob', 'receiver': 'alice'}])
+        written, skipped, _ = import_file(reverse, workers=1)
+        self.assertEqual((written.get('connection', 0), skipped['connection']), (0, 1))
+        self.assertEqual(
+            list(Connection.objects.values_list('sender__username', 'receiver__username', 'status')),
+            [('alice', 'bob', 'accepted')],
+        )
+
+    def test_slug_collisions_follow_profile_scheme(self):
+        UserProfile.objects.create(user=User.objects.create_user(username='carol'))
+        path = self.write(['type,username', 'user,Carol', 'user,CAROL'], suffix='.csv')
+        self.import_data(path)
+        slugs = set(UserProfile.objects.values_list('slug', flat=True))
+        self.assertEqual(slugs, {'carol', 'carol-1', 'carol-2'})
+
+    def test_invalid_record_raises_command_error(self):
+        path = self.write([{'type': 'post', 'content': 'No author'}])
+        with self.assertRaisesMessage(CommandError, 'line 1: post record is missing author'):
+            self.import_data(path)
+
+    def test_deferred_indexes_are_recreated(self):
+        def index_names():
+            with connection.cursor() as cursor:
+                return {name for name, info in connection.introspection.get_constraints(cursor, 'likes').items() if info['index']}
+
+        before = index_names()
+        with deferred_indexes(('likes',)) as dropped:
+            self.assertTrue(dropped)
+            self.assertFalse(set(dropped) & index_names())
+        self.assertEqual(index_names(), before)
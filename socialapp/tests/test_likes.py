@@ -0,0 +1,83 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp import graph
+from socialapp.models import Connection, Like, Post, UserProfile
+
+
+class PostLikesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.me = User.objects.create_user(username='me', password='testpassword123')
+        self.client.force_authenticate(user=self.me)
+        self.post = Post.objects.create(author=self.me, content='Liked')
+        self.likers = [
+            User.objects.create_user(username=f'liker{i}', password='testpassword123', email=f'liker{i}@example.com')
+            for i in range(5)
+        ]
+        for user in self.likers:
+            Like.objects.create(user=user, post=self.post)
+        for user in (self.likers[1], self.likers[3]):
+            Connection.objects.create(sender=self.me, receiver=user, status='accepted')
+        self.url = reverse('socialapp:post-likes', args=[self.post.pk])
+
+    def usernames(self, likes):
+        return [like['user']['username'] for like in likes]
+
+    def test_likers_newest_first_by_cursor(self):
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.usernames(response.data['results']), ['liker4', 'liker3', 'liker2'])
+        self.assertNotIn('email', response.data['results'][0]['user'])
+        self.assertNotIn('friends', response.data)
+        following = self.client.get(response.data['next'])
+        self.assertEqual(self.usernames(following.data['results']), ['liker1', 'liker0'])
+        self.assertIsNone(following.data['next'])
+
+    def test_friends_first(self):
+        response = self.client.get(self.url, {'friends_first': 'true', 'page_size': 2})
+        self.assertEqual(self.usernames(response.data['friends']), ['liker3', 'liker1'])
+        self.assertEqual(self.usernames(response.data['results']), ['liker4', 'liker2'])
+        following = self.client.get(response.data['next'])
+        self.assertEqual(self.usernames(following.data['results']), ['liker0'])
+        self.assertNotIn('friends', following.data)
+
+    def test_connections_among_reads_the_smaller_side(self):
+        likes = Like.objects.filter(post=self.post).order_by('-created_at', '-id')
+        expected = sorted([self.likers[1].pk, self.likers[3].pk])
+        # Two connections, fewer than the likes: load them, then look the likes up by connection id.
+        with self.assertNumQueries(4):
+            self.assertEqual(graph.connections_among(self.me.pk, likes), expected)
+        for user in self.likers[:3]:
+            Connection.objects.get_or_create(sender=self.me, receiver=user, status='accepted')
+        graph.invalidate(self.me.pk)
+        adjacency = graph.Adjacency()
+        adjacency[self.me.pk]
+        # Four connections and no more likes than that: read the likes once and intersect.
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                graph.connections_among(self.me.pk, likes.filter(user__in=self.likers[:4]), adjacency=adjacency),
+                sorted(user.pk for user in self.likers[:4]),
+            )
+
+    def test_likers_and_mutual_connections_omit_emails(self):
+        UserProfile.objects.create(user=self.likers[4], bio='Public')
+        Connection.objects.create(sender=self.likers[4], receiver=self.likers[1], status='accepted')
+        cache.clear()
+        likes = self.client.get(self.url).data['results']
+        self.assertEqual(likes[0]['user']['profile']['bio'], 'Public')
+        mutual = self.client.get(reverse('socialapp:mutual-connections', args=[self.likers[4].pk])).data['results']
+        self.assertEqual([user['username'] for user in mutual], ['liker1'])
+        for user in [like['user'] for like in likes] + mutual:
+            self.assertNotIn('email', user)
+            self.assertNotIn('email', str(user['profile']))
+        self.assertNotIn(b'@example.com', self.client.get(self.url).content)
+
+    def test_unknown_post(self):
+        response = self.client.get(reverse('socialapp:post-likes', args=['00000000-0000-0000-0000-000000000000']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
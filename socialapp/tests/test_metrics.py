@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from socialapp.models import Post
+from socialapp.metrics import Histogram, registry
+
+
+class HistogramTest(SimpleTestCase):
+    def test_percentiles_within_bucket_precision(self):
+        histogram = Histogram(lowest=1)
+        for value in range(1, 1001):
+            histogram.record(value)
+        self.assertAlmostEqual(histogram.percentile(50), 500, delta=500 / 8)
+        self.assertAlmostEqual(histogram.percentile(99), 990, delta=990 / 8)
+        self.assertEqual(histogram.percentile(100), 1000)
+
+    def test_cumulative_counts_at_power_of_two_bounds(self):
+        histogram = Histogram(lowest=1)
+        for value in (0, 1, 3, 4, 5, 9):
+            histogram.record(value)
+        self.assertEqual(histogram.cumulative([1, 2, 4, 8, 16]), [1, 2, 3, 5, 6])
+
+
+class QueryInstrumentationTest(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        Post.objects.create(author=self.user, content='Test post content')
+
+    def test_records_per_route_histograms(self):
+        self.client.get(reverse('socialapp:post-list-create'))
+        queries = registry.histograms[('request_queries', 'socialapp:post-list-create')]
+        self.assertEqual(queries.count, 1)
+        self.assertGreater(queries.sum, 0)
+        rendering = registry.histograms[('request_serializer_seconds', 'socialapp:post-list-create')]
+        self.assertEqual(rendering.count, 1)
+        self.assertGreater(rendering.sum, 0)
+
+    @override_settings(QUERY_BUDGETS={'socialapp:post-list-create': 1})
+    def test_logs_requests_over_budget(self):
+        with self.assertLogs('socialapp.perf', level='WARNING') as logs:
+            self.client.get(reverse('socialapp:post-list-create'))
+        self.assertIn('socialapp:post-list-create', logs.output[0])
+        self.assertEqual(registry.counters[('query_budget_exceeded_total', 'socialapp:post-list-create')], 1)
+
+    def test_metrics_endpoint_requires_staff(self):
+        response = self.client.get(reverse('socialapp:metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_prometheus_format(self):
+        self.client.get(reverse('socialapp:post-list-create'))
+        client = APIClient()
+        response = client.get(reverse('socialapp:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.content.decode()
+        self.assertIn('# TYPE socialapp_request_duration_seconds histogram', body)
+        self.assertIn('socialapp_request_queries_count{route="socialapp:post-list-create"} 1', body)
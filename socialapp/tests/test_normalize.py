@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp.models import Comment, Connection, Post
+
+
+class NormalizedResponseTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.me = User.objects.create_user(username='me', password='testpassword123')
+        self.writer = User.objects.create_user(username='writer', password='testpassword123', email='w@example.com')
+        self.hidden = User.objects.create_user(username='hidden', password='testpassword123')
+        self.client.force_authenticate(user=self.me)
+        self.posts = [Post.objects.create(author=self.writer, content=f'Post {i}') for i in range(3)]
+        Comment.objects.create(post=self.posts[0], author=self.me, content='Nice')
+        parent = Comment.objects.create(post=self.posts[0], author=self.hidden, content='Gone soon')
+        Comment.objects.create(post=self.posts[0], author=self.me, content='Reply', parent=parent)
+        Comment.all_objects.filter(pk=parent.pk).update(deleted_at=parent.created_at)
+
+    def test_posts_reference_one_users_map(self):
+        nested = self.client.get(reverse('socialapp:post-list-create'))
+        response = self.client.get(reverse('socialapp:post-list-create'), {'shape': 'normalized'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post['author'] for post in response.data['results']], [self.writer.pk] * 3)
+        self.assertEqual(sorted(response.data['users']), [self.me.pk, self.writer.pk])
+        self.assertEqual(response.data['users'][self.writer.pk], nested.data['results'][0]['author'])
+        self.assertNotEqual(response['ETag'], nested['ETag'])
+
+    def test_comment_tombstones_do_not_reveal_their_author(self):
+        url = reverse('socialapp:comment-list-create', args=[self.posts[0].pk])
+        response = self.client.get(url, {'shape': 'normalized'})
+        authors = {comment['content']: comment['author'] for comment in response.data['results']}
+        self.assertEqual(authors, {'Nice': self.me.pk, None: None, 'Reply': self.me.pk})
+        self.assertEqual(list(response.data['users']), [self.me.pk])
+
+    def test_connections_fetch_users_once(self):
+        for user in (self.writer, self.hidden):
+            Connection.objects.create(sender=user, receiver=self.me, status='pending')
+        url = reverse('socialapp:incoming-connections')
+        with self.assertNumQueries(4):
+            # The ETag aggregate, the page count and rows, then one in_bulk for the users.
+            response = self.client.get(url, {'shape': 'normalized'})
+        pairs = {(connection['sender'], connection['receiver']) for connection in response.data['results']}
+        self.assertEqual(pairs, {(self.writer.pk, self.me.pk), (self.hidden.pk, self.me.pk)})
+        self.assertEqual(sorted(response.data['users']), sorted([self.me.pk, self.writer.pk, self.hidden.pk]))
+        self.assertIsInstance(self.client.get(url).data['results'][0]['sender'], dict)
@@ -0,0 +1,99 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from socialapp.models import Post, Like, Connection, Notification, NotificationCounter, Task
+from socialapp.taskqueue import Worker, execute_batch
+from socialapp.tasks import write_notifications
+from socialapp.notifications import write_batch
+
+
+class NotificationRollupTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpassword123')
+        self.post = Post.objects.create(author=self.author, content='Hello')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='x') for i in range(4)]
+
+    def like_event(self, fan):
+        return (self.author.id, {'type': 'like', 'post': str(self.post.id), 'actor': fan.id})
+
+    def test_burst_rolls_up_into_one_row(self):
+        write_batch([self.like_event(fan) for fan in self.fans])
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual(notification.recent_actors[0]['username'], 'fan3')
+        self.assertEqual(self.author.notification_counter.unread, 1)
+
+    def test_later_events_fold_into_unread_row(self):
+        write_batch([self.like_event(self.fans[0])])
+        write_batch([self.like_event(self.fans[1]), self.like_event(self.fans[0])])
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 2)
+        self.assertEqual(NotificationCounter.objects.get(user=self.author).unread, 1)
+
+    def test_one_unread_row_per_target(self):
+        write_batch([self.like_event(self.fans[0])])
+        duplicate = Notification(recipient=self.author, verb='like', target=str(self.post.id), actor_count=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            duplicate.save()
+        Notification.objects.update(is_read=True)
+        write_batch([self.like_event(self.fans[1])])
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 1)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_events_are_queued_then_folded_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for fan in self.fans:
+                Like.objects.create(user=fan, post=self.post)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(Task.objects.filter(name=write_notifications.name, status='queued').count(), 4)
+
+        worker = Worker(concurrency=1)
+        self.addCleanup(worker.executor.shutdown)
+        task_ids = worker.claim_batch(write_notifications.name, 10)
+        with self.assertNumQueries(9):
+            # The same for 4 events as for 1: read the tasks and usernames, fold in a savepoint (lock,
+            # insert, counter row and bump), then mark every task done with one UPDATE.
+            execute_batch(task_ids, worker.worker_id)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 4)
+        self.assertEqual(NotificationCounter.objects.get(user=self.author).unread, 1)
+
+    def test_signals_feed_inbox_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Like.objects.create(user=self.fans[0], post=self.post)
+            Connection.objects.create(sender=self.fans[1], receiver=self.author)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+
+
+class NotificationViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = User.objects.create_user(username='author', password='testpassword123')
+        self.client.force_authenticate(user=self.author)
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='x') for i in range(3)]
+        for fan in self.fans:
+            post = Post.objects.create(author=self.author, content=f'Post for {fan.username}')
+            write_batch([(self.author.id, {'type': 'like', 'post': str(post.id), 'actor': fan.id})])
+
+    def test_keyset_pagination(self):
+        url = reverse('socialapp:notification-list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['unread_count'], 3)
+        self.assertEqual(response.data['results'][0]['summary'], 'fan2 liked your post')
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_mark_read_in_bulk(self):
+        ids = list(Notification.objects.values_list('id', flat=True)[:2])
+        response = self.client.post(reverse('socialapp:notification-mark-read'), {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'marked_read': 2, 'unread_count': 1})
+        response = self.client.post(reverse('socialapp:notification-mark-read'), {}, format='json')
+        self.assertEqual(response.data['unread_count'], 0)
+        response = self.client.get(reverse('socialapp:notification-unread-count'))
+        self.assertEqual(response.data, {'unread_count': 0})
@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp import profiles
+from socialapp.models import Comment, Connection, Like, Post, UserProfile, UserStats
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class PublicProfileTest(TestCase):
+    def setUp(self):
+        profiles.slugs.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.author = User.objects.create_user(username='Jane Doe', password='testpassword123')
+        UserProfile.objects.create(user=self.user)
+        self.profile = UserProfile.objects.create(user=self.author, bio='Writer')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [Post.objects.create(author=self.author, content=f'Post {i}') for i in range(5)]
+        Post.objects.create(author=self.user, content='Not hers')
+
+    def get_profile(self):
+        response = self.client.get(reverse('socialapp:user-profile', args=[self.profile.slug]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_profile_by_slug_with_stored_counts(self):
+        data = self.get_profile()
+        self.assertEqual((data['id'], data['username'], data['slug']), (self.author.pk, 'Jane Doe', 'jane-doe'))
+        self.assertEqual((data['posts_count'], data['connections_count']), (5, 0))
+        self.assertNotIn('email', data)
+
+        Post.objects.create(author=self.author, content='Another')
+        self.client.force_authenticate(user=self.author)
+        self.client.delete(reverse('socialapp:post-detail', args=[self.posts[0].pk]))
+        connection_request = Connection.objects.create(sender=self.user, receiver=self.author)
+        self.client.post(reverse('socialapp:accept-connection', args=[connection_request.pk]))
+        data = self.get_profile()
+        self.assertEqual((data['posts_count'], data['connections_count']), (5, 1))
+        self.assertEqual(profiles.get_stats([self.user.pk])[self.user.pk].connections_count, 1)
+
+        # Served from the slug cache and the stored row: no COUNT queries.
+        with self.assertNumQueries(2):
+            profiles.profile_for_slug(self.profile.slug)
+            profiles.get_stats([self.author.pk])
+        self.assertEqual(self.client.get(reverse('socialapp:user-profile', args=['nobody'])).status_code, 404)
+
+    def test_author_posts_keyset_pages(self):
+        url = reverse('socialapp:user-posts', args=[self.profile.slug])
+        self.posts[1].delete()
+        Post.all_objects.filter(pk=self.posts[2].pk).update(deleted_at=self.posts[2].created_at)
+        seen, next_url = [], url + '?page_size=2'
+        while next_url:
+            response = self.client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [post['content'] for post in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(seen, ['Post 4', 'Post 3', 'Post 0'])
+        self.assertEqual(self.client.get(reverse('socialapp:user-posts', args=['nobody'])).status_code, 404)
+
+    def test_author_posts_queries_do_not_grow_with_the_page(self):
+        url = reverse('socialapp:user-posts', args=[self.profile.slug])
+        Like.objects.create(user=self.user, post=self.posts[4])
+        Comment.objects.create(post=self.posts[4], author=self.user, content='Nice')
+        self.client.get(url)  # resolves and caches the slug
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url + '?page_size=1')
+        with CaptureQueriesContext(connection) as five:
+            response = self.client.get(url + '?page_size=5')
+        self.assertEqual(len(five), len(one))
+        newest = response.data['results'][0]
+        self.assertEqual((newest['likes_count'], newest['is_liked'], newest['comments_count']), (1, True, 1))
+        self.assertEqual(response.data['results'][1]['likes_count'], 0)
+
+    @skipUnless(connection.vendor == 'sqlite', 'reads the SQLite query plan')
+    def test_timeline_query_uses_author_index(self):
+        sql, params = Post.objects.filter(author_id=self.author.pk).order_by('-created_at', '-id')[:20].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = str(cursor.fetchall())
+        self.assertIn('posts_author_timeline_idx', plan)
+
+    def test_backfill_repairs_counts(self):
+        profiles.get_stats([self.author.pk])
+        UserStats.objects.filter(pk=self.author.pk).update(posts_count=99)
+        call_command('backfill_user_stats', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(pk=self.author.pk).posts_count, 5)
+        self.assertEqual(UserStats.objects.count(), 2)
@@ -0,0 +1,233 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from knox.models import AuthToken
+from rest_framework.test import APIClient
+from rest_framework import status
+from socialapp.models import (
+    UserProfile, Post, Like, Connection, Comment, Notification, NotificationCounter, ChangeLogEntry
+)
+from socialapp import purge, storage
+from socialapp.taskqueue import Worker, execute_batch
+from socialapp.tasks import write_notifications
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def write_queued_notifications():
+    """Run the queued inbox events the way the task worker would, in this thread"""
+    worker = Worker(concurrency=1)
+    try:
+        task_ids = worker.claim_batch(write_notifications.name, 1000)
+        return execute_batch(task_ids, worker.worker_id) if task_ids else []
+    finally:
+        worker.executor.shutdown()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PURGE_BATCH_SIZE=2, TASKS_ALWAYS_EAGER=False)
+class PurgeTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other = User.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(
+            author=self.user, content='Test post content',
+            image=SimpleUploadedFile('photo.png', b'fake image bytes', content_type='image/png'),
+        )
+        self.other_post = Post.objects.create(author=self.other, content='Other post')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                liker = User.objects.create_user(username=f'liker{i}', password='testpassword123')
+                Like.objects.create(user=liker, post=self.post)
+            top = Comment.objects.create(post=self.post, author=self.other, content='Top')
+            reply = Comment.objects.create(post=self.post, author=self.user, content='Reply', parent=top)
+            Comment.objects.create(post=self.post, author=self.other, content='Deep', parent=reply)
+        write_queued_notifications()
+
+    def test_delete_post_hides_then_purges(self):
+        image = self.post.image.name
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 3)
+        response = self.client.delete(reverse('socialapp:post-detail', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(ChangeLogEntry.objects.filter(object_id=str(self.post.pk), action='deleted').exists())
+        comments = self.client.get(reverse('socialapp:comment-list-create', args=[self.post.pk]))
+        self.assertEqual(comments.data['count'], 0)
+
+        self.assertTrue(purge.purge_post(self.post.pk))
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Like.objects.filter(post_id=self.post.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=self.post.pk).exists())
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 0)
+        # The purge releases the image; the blob goes with the next garbage collection.
+        self.assertTrue(default_storage.exists(image))
+        self.assertEqual(storage.collect_garbage(grace=timedelta(0)), (1, len(b'fake image bytes')))
+        self.assertFalse(default_storage.exists(image))
+
+    def test_purge_skips_visible_post(self):
+        self.assertFalse(purge.purge_post(self.post.pk))
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_delete_account_requires_password(self):
+        response = self.client.delete(reverse('socialapp:account-delete'), {'password': 'wrong'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_active)
+
+    def test_delete_account_deactivates_then_purges(self):
+        AuthToken.objects.create(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.other_post, author=self.user, content='Mine')
+            Connection.objects.create(sender=self.user, receiver=self.other)
+        write_queued_notifications()
+        UserProfile.objects.create(user=self.user)
+        self.assertEqual(
+            set(Notification.objects.filter(recipient=self.other).values_list('verb', flat=True)),
+            {'comment', 'reply', 'connection_request'},
+        )
+
+        response = self.client.delete(reverse('socialapp:account-delete'), {'password': 'testpassword123'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertFalse(AuthToken.objects.filter(user=self.user).exists())
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
+
+        self.assertTrue(purge.purge_user(self.user.pk))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Post.all_objects.filter(author_id=self.user.pk).exists())
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), [])
+        self.assertFalse(Connection.objects.exists())
+        self.assertEqual(Like.objects.count(), 0)
+        self.assertEqual(Post.objects.get().pk, self.other_post.pk)
+        # Notifications pointing at purged comments and connections go, with their unread counts.
+        self.assertEqual(list(Notification.objects.filter(recipient=self.other).values_list('verb', flat=True)), ['comment'])
+        self.assertEqual(NotificationCounter.objects.get(user=self.other).unread, 1)
+
+    def test_deactivated_account_comments_leave_post_embeds(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.other_post, author=self.user, content='Mine')
+            Comment.objects.create(post=self.other_post, author=self.other, content='Theirs')
+        purge.deactivate_account(self.user)
+        self.client.force_authenticate(user=self.other)
+
+        listed = self.client.get(reverse('socialapp:post-list-create')).data['results'][0]
+        detail = self.client.get(reverse('socialapp:post-detail', args=[self.other_post.pk])).data
+        for post in (listed, detail):
+            self.assertEqual([c['content'] for c in post['comments']], ['Theirs'])
+            self.assertEqual(post['comments_count'], 1)
+
+    def test_post_embed_keeps_deleted_comments_with_replies_as_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            answered = Comment.objects.create(post=self.other_post, author=self.other, content='Answered')
+            Comment.objects.create(post=self.other_post, author=self.user, content='Answer', parent=answered)
+            leaf = Comment.objects.create(post=self.other_post, author=self.other, content='Leaf')
+        Comment.objects.filter(pk__in=[answered.pk, leaf.pk]).update(deleted_at=timezone.now())
+
+        thread = self.client.get(reverse('socialapp:comment-list-create', args=[self.other_post.pk])).data['results']
+        post = self.client.get(reverse('socialapp:post-detail', args=[self.other_post.pk])).data
+        self.assertEqual(post['comments'], thread)
+        self.assertEqual([(c['content'], c['is_deleted']) for c in thread], [(None, True), ('Answer', False)])
+        self.assertEqual(post['comments_count'], 1)
+
+    def test_purge_user_keeps_other_users_replies_under_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            answered = Comment.objects.create(post=self.other_post, author=self.user, content='Answered')
+            answer = Comment.objects.create(post=self.other_post, author=self.other, content='Answer', parent=answered)
+            chain = Comment.objects.create(post=self.other_post, author=self.user, content='Chain')
+            Comment.objects.create(post=self.other_post, author=self.user, content='Self reply', parent=chain)
+        purge.deactivate_account(self.user)
+        self.assertTrue(purge.purge_user(self.user.pk))
+
+        tombstone = Comment.all_objects.get(pk=answered.pk)
+        self.assertEqual((tombstone.author_id, tombstone.content), (None, ''))
+        self.assertIsNotNone(tombstone.deleted_at)
+        self.assertEqual(Comment.objects.get(pk=answer.pk).parent_id, answered.pk)
+        self.assertFalse(Comment.all_objects.filter(pk=chain.pk).exists())
+        self.client.force_authenticate(user=self.other)
+        thread = self.client.get(reverse('socialapp:comment-list-create', args=[self.other_post.pk])).data['results']
+        self.assertEqual([(c['content'], c['author'], c['is_deleted']) for c in thread][0], (None, None, True))
+        self.assertEqual(thread[1]['content'], 'Answer')
+
+    def test_purge_user_logs_tombstones_for_rows_on_other_posts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            like = Like.objects.create(user=self.user, post=self.other_post)
+            leaf = Comment.objects.create(post=self.other_post, author=self.user, content='Leaf')
+            answered = Comment.objects.create(post=self.other_post, author=self.user, content='Answered')
+            Comment.objects.create(post=self.other_post, author=self.other, content='Answer', parent=answered)
+            connection = Connection.objects.create(sender=self.user, receiver=self.other, status='accepted')
+        purge.deactivate_account(self.user)
+        ChangeLogEntry.objects.all().delete()
+        self.assertTrue(purge.purge_user(self.user.pk))
+
+        deleted = ChangeLogEntry.objects.filter(action='deleted')
+        self.assertEqual(deleted.get(model='like').object_id, str(like.pk))
+        self.assertEqual(deleted.get(model='like').payload, {'post': str(self.other_post.pk), 'user': self.user.pk})
+        self.assertEqual(
+            set(deleted.filter(model='comment').values_list('object_id', flat=True)), {str(leaf.pk), str(answered.pk)}
+        )
+        self.assertEqual(
+            list(deleted.filter(model='connection').values_list('object_id', 'user_id')),
+            [(str(connection.pk), self.other.pk)],
+        )
+
+
+class CommentTombstoneTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(author=self.user, content='Test post content')
+        self.parent = Comment.objects.create(post=self.post, author=self.user, content='Parent')
+        self.reply = Comment.objects.create(post=self.post, author=self.user, content='Reply', parent=self.parent)
+        self.leaf = Comment.objects.create(post=self.post, author=self.user, content='Leaf')
+
+    def thread(self):
+        response = self.client.get(reverse('socialapp:comment-list-create', args=[self.post.pk]))
+        return {comment['id']: comment for comment in response.data['results']}
+
+    def test_deleted_comment_with_replies_is_a_tombstone(self):
+        response = self.client.delete(reverse('socialapp:comment-detail', args=[self.parent.pk]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(Comment.objects.filter(pk=self.reply.pk).exists())
+        self.assertFalse(Comment.objects.filter(pk=self.parent.pk).exists())
+
+        thread = self.thread()
+        self.assertTrue(thread[self.parent.pk]['is_deleted'])
+        self.assertIsNone(thread[self.parent.pk]['content'])
+        self.assertIsNone(thread[self.parent.pk]['author'])
+        self.assertEqual(thread[self.reply.pk]['parent'], self.parent.pk)
+
+    def test_deleted_leaf_is_hidden(self):
+        self.client.delete(reverse('socialapp:comment-detail', args=[self.leaf.pk]))
+        self.assertNotIn(self.leaf.pk, self.thread())
+        self.assertEqual(self.post.comments.count(), 2)
+
+    def test_purge_tombstones_removes_old_leaves_first(self):
+        purge.hide_comment(self.parent)
+        purge.hide_comment(self.leaf)
+        later = timezone.now() + timedelta(days=31)
+        self.assertEqual(purge.purge_tombstones(now=later), (1, 0))
+        self.assertTrue(Comment.all_objects.filter(pk=self.parent.pk).exists())
+
+        purge.hide_comment(self.reply)
+        self.assertEqual(purge.purge_tombstones(now=later), (2, 0))
+        self.assertFalse(Comment.all_objects.exists())
+
+    def test_purge_tombstones_keeps_recent_deletes(self):
+        purge.hide_comment(self.leaf)
+        purge.hide_post(self.post)
+        self.assertEqual(purge.purge_tombstones(), (0, 0))
+        self.assertEqual(purge.purge_tombstones(now=timezone.now() + timedelta(days=31)), (1, 1))
@@ -0,0 +1,110 @@
+import unittest
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connections
+from django.test import SimpleTestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth.models import User, AnonymousUser
+from rest_framework.test import APIClient
+from socialapp.models import Post
+from socialapp.routers import ReplicaRouter, routing_scope
+
+
+class StubUser:
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKINESS_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def request(self, method='get', user=None):
+        request = getattr(self.factory, method)('/api/posts/')
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_no_request_scope_uses_primary(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_safe_request_reads_from_replica(self):
+        with routing_scope(self.request()):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_unsafe_request_stays_on_primary(self):
+        with routing_scope(self.request('post')):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_after_write_in_same_request_use_primary(self):
+        with routing_scope(self.request()):
+            self.router.db_for_write(Post)
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_user_is_sticky_to_primary_after_write(self):
+        user = StubUser(7)
+        with routing_scope(self.request('post', user)) as state:
+            state.record_write()
+        with routing_scope(self.request('get', user)):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with routing_scope(self.request('get', StubUser(8))):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'pins': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pins'},
+        },
+        REPLICA_STICKINESS_CACHE='pins',
+    )
+    def test_stickiness_uses_its_own_cache(self):
+        user = StubUser(7)
+        with routing_scope(self.request('post', user)) as state:
+            state.record_write()
+        self.assertIsNotNone(caches['pins'].get('replica-pin:7'))
+        self.assertIsNone(caches['default'].get('replica-pin:7'))
+        with routing_scope(self.request('get', user)):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_stickiness_expires(self):
+        user = StubUser(7)
+        with override_settings(REPLICA_STICKINESS_SECONDS=-1):
+            with routing_scope(self.request('post', user)) as state:
+                state.record_write()
+        with routing_scope(self.request('get', user)):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'socialapp'))
+        self.assertTrue(self.router.allow_migrate('default', 'socialapp'))
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, 'needs --settings=social_media_backend.settings_replica')
+class ReplicaRoutingIntegrationTest(TransactionTestCase):
+    # Rows must be committed for the replica connection to see them.
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        Post.objects.create(author=self.user, content='Test post content')
+
+    def test_list_reads_from_replica_until_user_writes(self):
+        url = reverse('socialapp:post-list-create')
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get(url)
+        self.assertTrue(replica_queries.captured_queries)
+
+        self.client.post(url, {'content': 'New post'}, format='json')
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = self.client.get(url)
+        self.assertEqual(replica_queries.captured_queries, [])
+        self.assertEqual(len(response.data['results']), 2)
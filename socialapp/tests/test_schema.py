@@ -0,0 +1,51 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from social_media_backend import schema
+
+
+class CachedSchemaTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.schema_dir = tempfile.mkdtemp()
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+
+    def get(self, fmt='.json', **headers):
+        with override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir):
+            return schema.schema_document(self.factory.get(f'/swagger{fmt}', **headers), format=fmt)
+
+    def test_generated_once_and_served_with_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/api/posts/', json.loads(response.content)['paths'])
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIs(schema.get_document('.json'), schema.get_document('.json'))
+
+    def test_normalizable_lists_keep_their_response_schema(self):
+        paths = json.loads(self.get().content)['paths']
+        for path in ('/api/posts/', '/api/posts/{post_id}/comments/', '/api/users/{slug}/posts/',
+                     '/api/connections/incoming/'):
+            with self.subTest(path=path):
+                schema_ = paths[path]['get']['responses']['200']['schema']
+                self.assertIn('results', schema_['properties'])
+
+    def test_not_modified(self):
+        etag = self.get('.yaml')['ETag']
+        response = self.get('.yaml', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_prebuilt_file_is_served(self):
+        Path(self.schema_dir, 'schema.json').write_bytes(b'{"swagger": "2.0", "paths": {}}')
+        response = self.get()
+        self.assertEqual(response.content, b'{"swagger": "2.0", "paths": {}}')
+
+    def test_ui_has_no_live_schema_path(self):
+        view = schema.schema_ui('swagger')
+        self.assertEqual(view(self.factory.get('/swagger/')).status_code, 200)
+        self.assertEqual(view(self.factory.get('/swagger/', {'format': 'openapi'})).status_code, 404)
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp import purge, search
+from socialapp.models import Connection, UserProfile
+
+
+class PrefixIndexTest(TestCase):
+    def test_deltas_match_a_compacted_index(self):
+        index = search.PrefixIndex(compact_after=100).load([
+            (1, 'alice', 'Alice', 'Smith', 'alice'),
+            (2, 'alan_t', 'Alan', 'Turing', 'alan-t'),
+            (3, 'bob', 'Bob', 'Allen', 'bob'),
+        ])
+        self.assertEqual(index.search(['al'], 10), [2, 1, 3])
+        self.assertEqual(index.search(['al', 'tu'], 10), [2])
+        index.put(3, last_name='Brown')
+        index.put(4, username='albert', first_name='Albert', last_name='', slug='albert')
+        index.remove(1)
+        self.assertEqual(index.search(['al'], 10), [2, 4])
+        self.assertEqual(index.search(['br'], 10), [3])
+        index.put(3, last_name='Allen')
+        index.put(5, create=False, slug='ghost')
+        deltas = index.search(['al'], 10)
+        index.compact()
+        self.assertEqual(index.search(['al'], 10), deltas)
+        self.assertNotIn(5, index.users)
+        self.assertEqual(index.search(['al'], 1), [2])
+
+
+class UserSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        search._index = None
+        self.client = APIClient()
+        self.users = {
+            name: User.objects.create_user(username=name, password='testpassword123', first_name=first)
+            for name, first in (('me', 'Me'), ('sam1', 'Samantha'), ('sam2', 'Sam'), ('sam3', 'Samuel'), ('pal', 'Pat'))
+        }
+        self.me = self.users['me']
+        self.client.force_authenticate(user=self.me)
+        # me - sam3 and me - pal - sam2: sam3 is a connection, sam2 has one mutual connection.
+        for sender, receiver in (('me', 'sam3'), ('me', 'pal'), ('pal', 'sam2')):
+            Connection.objects.create(sender=self.users[sender], receiver=self.users[receiver], status='accepted')
+
+    def tearDown(self):
+        search._index = None
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('socialapp:search-users'), {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results']
+
+    def test_connections_then_mutual_connections_first(self):
+        results = self.search('sa')
+        self.assertEqual([user['username'] for user in results], ['sam3', 'sam2', 'sam1'])
+        self.assertEqual([(user['connected'], user['mutual_connections_count']) for user in results],
+                         [(True, 0), (False, 1), (False, 0)])
+        self.assertEqual([user['username'] for user in self.search('samu')], ['sam3'])
+        self.assertEqual(len(self.search('sa', limit=2)), 2)
+        self.assertEqual(self.search(''), [])
+        self.assertEqual(self.search('me'), [])
+
+    def test_saved_users_and_profiles_update_the_index(self):
+        self.search('sa')
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = User.objects.create_user(username='zed', password='testpassword123', last_name='Sandoval')
+        self.assertIn('zed', [user['username'] for user in self.search('sand')])
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProfile.objects.create(user=newcomer, slug='sandy')
+        self.assertEqual([user['slug'] for user in self.search('sandy')], ['sandy'])
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.is_active = False
+            newcomer.save()
+        self.assertEqual(self.search('sand'), [])
+
+    def test_deactivated_account_leaves_the_index(self):
+        self.assertEqual([user['username'] for user in self.search('pat')], ['pal'])
+        with self.captureOnCommitCallbacks(execute=True):
+            purge.deactivate_account(self.users['pal'])
+        self.assertEqual(self.search('pat'), [])
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp.models import DataExport
+
+MEDIA_ROOT = tempfile.mkdtemp()
+BODY = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class SendFileTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in ('post_images/photo.png', 'exports/1/archive.zip'):
+            os.makedirs(os.path.join(MEDIA_ROOT, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(MEDIA_ROOT, name), 'wb') as f:
+                f.write(BODY)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, **headers):
+        return self.client.get(reverse('media', args=['post_images/photo.png']), **headers)
+
+    def test_whole_file_and_byte_ranges(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), BODY)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        for header, start, end in (('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023), ('bytes=-4', 1020, 1023)):
+            response = self.get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(BODY)}')
+            self.assertEqual(b''.join(response.streaming_content), BODY[start:end + 1])
+
+        self.assertEqual(self.get(HTTP_RANGE='bytes=2000-').status_code, 416)
+        # A range of an older version of the file gets the whole current one.
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_private_media_is_not_served(self):
+        self.assertEqual(self.client.get(reverse('media', args=['exports/1/archive.zip'])).status_code, 404)
+        self.assertEqual(self.client.get('/media/post_images/../exports/1/archive.zip').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='nginx')
+    def test_nginx_sends_the_bytes(self):
+        response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/post_images/photo.png')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        export = DataExport.objects.create(user=user, status='succeeded', archive='exports/1/archive.zip')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.get(reverse('socialapp:data-export-download', args=[export.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/exports/1/archive.zip')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn(f'testuser-export-{timezone.now():%Y%m%d}.zip', response['Content-Disposition'])
+
+    @override_settings(MEDIA_SENDFILE='apache')
+    def test_apache_x_sendfile(self):
+        self.assertEqual(self.get()['X-Sendfile'], os.path.join(MEDIA_ROOT, 'post_images/photo.png'))
@@ -91,7 +91,8 @@ class PostSerializerTest(TestCase):
     
     def test_contains_expected_fields(self):
         data = self.serializer.data
-        self.assertEqual(set(data.keys()), set(['id', 'author', 'content', 'image', 'likes_count', 'is_liked', 'created_at', 'updated_at']))
+        self.assertEqual(set(data.keys()), set(['id', 'author', 'content', 'image', 'likes_count', 'is_liked',
+                                                'comments', 'comments_count', 'created_at', 'updated_at']))
     
     def test_content_field_content(self):
         data = self.serializer.data
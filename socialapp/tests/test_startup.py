@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+from django.urls import Resolver404, resolve
+
+from socialapp.management.commands.startup_profile import parse_importtime
+
+
+class StartupProfileTest(SimpleTestCase):
+    def test_parse_importtime_sums_self_time_per_package(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     django.utils\n'
+            'import time:        30 |        150 |   django\n'
+            'import time:        50 |         50 | knox\n'
+        )
+        self.assertEqual(parse_importtime(stderr), {'django': 150, 'knox': 50})
+
+    def test_api_only_urls_leave_out_admin_and_docs(self):
+        self.assertEqual(resolve('/api/posts/', urlconf='social_media_backend.urls_api').url_name, 'post-list-create')
+        for path in ('/admin/', '/swagger/', '/swagger.json'):
+            with self.assertRaises(Resolver404):
+                resolve(path, urlconf='social_media_backend.urls_api')
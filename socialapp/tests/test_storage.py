@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from socialapp import storage
+from socialapp.models import MediaBlob, Post
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def upload(data=b'the same meme', name='meme.PNG'):
+    return SimpleUploadedFile(name, data, content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+
+    def test_identical_uploads_are_stored_once(self):
+        first = Post.objects.create(author=self.user, content='One', image=upload())
+        second = Post.objects.create(author=self.user, content='Two', image=upload(name='copy.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        digest = MediaBlob.objects.get().digest
+        self.assertEqual(first.image.name, f'cas/{digest[:2]}/{digest[2:4]}/{digest}.png')
+        self.assertEqual(MediaBlob.objects.get().refcount, 2)
+        with default_storage.open(first.image.name) as f:
+            self.assertEqual(f.read(), b'the same meme')
+
+    def test_released_blobs_are_collected_after_grace(self):
+        post = Post.objects.create(author=self.user, content='One', image=upload())
+        name = post.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image = upload(b'a different meme')
+            post.save()
+        self.assertEqual(MediaBlob.objects.get(pk=name).refcount, 0)
+        self.assertEqual(storage.collect_garbage(), (0, 0))
+        self.assertEqual(storage.collect_garbage(grace=timedelta(0), batch_size=1), (1, len(b'the same meme')))
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(post.image.name))
+
+        MediaBlob.objects.filter(pk=post.image.name).update(refcount=5)
+        self.assertEqual(storage.recount_references(), 1)
+        self.assertEqual(MediaBlob.objects.get(pk=post.image.name).refcount, 1)
+
+    def test_clearing_an_image_releases_its_blob(self):
+        post = Post.objects.create(author=self.user, content='One', image=upload())
+        name = post.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            post.content = 'Edited'
+            post.save()
+        self.assertEqual(MediaBlob.objects.get(pk=name).refcount, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image = None
+            post.save()
+        self.assertEqual(MediaBlob.objects.get(pk=name).refcount, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(MediaBlob.objects.get(pk=name).refcount, 0)
+
+    def test_blobs_are_served_immutable(self):
+        name = Post.objects.create(author=self.user, content='One', image=upload()).image.name
+        url = reverse('media', args=[name])
+        self.assertEqual(url, f'/media/{name}')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'the same meme')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/media/cas/../../settings.py').status_code, 404)
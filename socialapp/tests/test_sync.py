@@ -0,0 +1,90 @@
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from socialapp.models import Post, Like, Connection, ChangeLogEntry
+from socialapp.sync import compact_change_log
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sync_url = reverse('socialapp:sync-changes')
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.other = User.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.watermark = self.client.get(self.sync_url).data['watermark']
+
+    def sync(self, watermark=None):
+        return self.client.get(self.sync_url, {'since': watermark or self.watermark})
+
+    def test_created_and_deleted_changes(self):
+        post = Post.objects.create(author=self.other, content='Hello')
+        like = Like.objects.create(user=self.user, post=post)
+        response = self.sync()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = {(c['model'], c['action']) for c in response.data['changes']}
+        self.assertEqual(changes, {('post', 'created'), ('like', 'created')})
+
+        like.delete()
+        response = self.sync(response.data['watermark'])
+        self.assertEqual(len(response.data['changes']), 1)
+        tombstone = response.data['changes'][0]
+        self.assertEqual(tombstone['action'], 'deleted')
+        self.assertEqual(tombstone['data']['post'], str(post.id))
+
+    def test_updates_collapse_to_one_change(self):
+        post = Post.objects.create(author=self.user, content='v1')
+        post.content = 'v2'
+        post.save()
+        changes = self.sync().data['changes']
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['data']['content'], 'v2')
+
+    def test_connections_only_visible_to_parties(self):
+        third = User.objects.create_user(username='third', password='testpassword123')
+        Connection.objects.create(sender=self.other, receiver=third)
+        self.assertEqual(self.sync().data['changes'], [])
+        Connection.objects.create(sender=self.other, receiver=self.user)
+        self.assertEqual(len(self.sync().data['changes']), 1)
+
+    def test_paging_with_limit(self):
+        for i in range(3):
+            Post.objects.create(author=self.user, content=f'Post {i}')
+        response = self.client.get(self.sync_url, {'since': self.watermark, 'limit': 2})
+        self.assertTrue(response.data['has_more'])
+        response = self.sync(response.data['watermark'])
+        self.assertEqual(len(response.data['changes']), 1)
+        self.assertFalse(response.data['has_more'])
+
+    def test_invalid_watermark(self):
+        response = self.sync('garbage')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_watermark(self):
+        with override_settings(SYNC_TOMBSTONE_RETENTION=timedelta(seconds=-1)):
+            response = self.sync()
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class CompactChangeLogTest(TestCase):
+    def test_compaction_keeps_latest_entry(self):
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        post = Post.objects.create(author=user, content='v1')
+        post.save()
+        post.save()
+        self.assertEqual(ChangeLogEntry.objects.filter(model='post').count(), 3)
+        compact_change_log(now=timezone.now() + timedelta(days=1))
+        remaining = ChangeLogEntry.objects.filter(model='post')
+        self.assertEqual(remaining.count(), 1)
+        self.assertEqual(remaining.get().action, 'updated')
+
+    def test_compaction_drops_expired_tombstones(self):
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        Post.objects.create(author=user, content='Gone').delete()
+        compact_change_log(now=timezone.now() + timedelta(days=60))
+        self.assertFalse(ChangeLogEntry.objects.exists())
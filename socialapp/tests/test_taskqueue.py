@@ -0,0 +1,182 @@
+import threading
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from socialapp.models import Task, UserProfile
+from socialapp.taskqueue import task, execute, execute_batch, prune_finished, Worker
+from socialapp.tasks import create_user_profile
+
+calls = []
+
+
+@task(max_attempts=2)
+def record_call(value):
+    calls.append(value)
+
+
+batches = []
+
+
+@task(batch_size=3)
+def record_batch(calls):
+    batches.append(sorted(value for value, in calls))
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise RuntimeError('boom')
+
+
+release = threading.Event()
+
+
+@task(max_attempts=1)
+def wait_for_release():
+    release.wait(10)
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = Worker(concurrency=2)
+
+    def tearDown(self):
+        self.worker.executor.shutdown()
+
+    def claim_and_execute(self):
+        return [execute(task_id, self.worker.worker_id) for task_id in self.worker.claim(10)]
+
+    def test_delay_enqueues_and_worker_runs(self):
+        task_row = record_call.delay(42)
+        self.assertEqual(task_row.status, 'queued')
+        self.assertEqual(calls, [])
+        results = self.claim_and_execute()
+        self.assertEqual(calls, [42])
+        self.assertEqual(results[0][1], 'succeeded')
+        task_row.refresh_from_db()
+        self.assertEqual(task_row.status, 'succeeded')
+        self.assertEqual(task_row.attempts, 1)
+
+    def test_idempotency_key_deduplicates(self):
+        first = record_call.delay(1, idempotency_key='once')
+        second = record_call.delay(2, idempotency_key='once')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_idempotency_key_requeues_a_finished_task(self):
+        failed = always_fails.delay(idempotency_key='retry-me')
+        Task.objects.filter(pk=failed.pk).update(status='failed', attempts=2, finished_at=timezone.now())
+        again = record_call.delay(3, idempotency_key='retry-me')
+        self.assertEqual(again.pk, failed.pk)
+        self.assertEqual((again.status, again.attempts, again.name), ('queued', 0, record_call.name))
+        self.claim_and_execute()
+        self.assertEqual(calls, [3])
+        self.assertEqual(record_call.delay(4, idempotency_key='retry-me').status, 'queued')
+
+    def test_claimed_task_is_not_claimed_twice(self):
+        record_call.delay(1)
+        self.assertEqual(len(self.worker.claim(10)), 1)
+        self.assertEqual(Worker(concurrency=1).claim(10), [])
+
+    def test_failure_retries_with_backoff_then_fails(self):
+        task_row = always_fails.delay()
+        self.assertEqual(self.claim_and_execute()[0][1], 'retried')
+        task_row.refresh_from_db()
+        self.assertEqual(task_row.status, 'queued')
+        self.assertIn('boom', task_row.last_error)
+        self.assertGreater(task_row.run_at, task_row.updated_at.replace(microsecond=0))
+
+        Task.objects.filter(pk=task_row.pk).update(run_at=task_row.created_at)
+        self.assertEqual(self.claim_and_execute()[0][1], 'failed')
+        task_row.refresh_from_db()
+        self.assertEqual(task_row.status, 'failed')
+
+    def test_create_user_profile_task(self):
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        create_user_profile.delay(user.pk)
+        self.assertFalse(UserProfile.objects.filter(user=user).exists())
+        self.claim_and_execute()
+        self.assertEqual(UserProfile.objects.get(user=user).slug, 'testuser')
+
+    def test_create_user_profile_task_keeps_an_existing_profile(self):
+        user = User.objects.create_user(username='testuser', password='testpassword123')
+        profile = UserProfile.objects.create(user=user, bio='Mine')
+        create_user_profile.delay(user.pk)
+        self.assertEqual(self.claim_and_execute()[0][1], 'succeeded')
+        self.assertEqual(list(UserProfile.objects.filter(user=user)), [profile])
+        self.assertEqual(UserProfile.objects.get(user=user).bio, 'Mine')
+
+    def test_outcome_is_dropped_once_the_lease_moved(self):
+        task_row = record_call.delay(1)
+        [task_id] = self.worker.claim(10)
+        # The lease expired and another worker took the task over.
+        Task.objects.filter(pk=task_id).update(locked_by='other:1')
+        self.assertEqual(execute(task_id, self.worker.worker_id)[1], 'lost')
+        task_row.refresh_from_db()
+        self.assertEqual((task_row.status, task_row.locked_by), ('running', 'other:1'))
+
+    def test_heartbeat_renews_running_leases(self):
+        record_call.delay(1)
+        [task_id] = self.worker.claim(10)
+        stale = timezone.now() - timedelta(hours=1)
+        Task.objects.filter(pk=task_id).update(locked_at=stale)
+        self.worker.running[object()] = [task_id]
+        self.assertEqual(self.worker.renew_leases(), 1)
+        self.assertEqual(self.worker.requeue_stale(), 0)
+        self.assertGreater(Task.objects.get(pk=task_id).locked_at, stale)
+
+    def test_batch_task_runs_claimed_calls_in_one_call(self):
+        batches.clear()
+        rows = [record_batch.delay(i) for i in range(4)]
+        task_ids = self.worker.claim_batch(record_batch.name, 3)
+        results = execute_batch(task_ids, self.worker.worker_id)
+        self.assertEqual(batches, [[0, 1, 2]])
+        self.assertEqual([outcome for _, outcome, _ in results], ['succeeded'] * 3)
+        self.assertEqual(Task.objects.get(pk=rows[3].pk).status, 'queued')
+
+    def test_prune_finished_keeps_recent_and_unfinished_rows(self):
+        old, recent, queued = record_call.delay(1), record_call.delay(2), record_call.delay(3)
+        Task.objects.filter(pk=old.pk).update(status='succeeded', finished_at=timezone.now() - timedelta(days=8))
+        Task.objects.filter(pk=recent.pk).update(status='failed', finished_at=timezone.now())
+        self.assertEqual(prune_finished(timedelta(days=7), batch_size=1), 1)
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {recent.pk, queued.pk})
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class WorkerSlotsTest(TransactionTestCase):
+    def test_slow_task_holds_only_its_own_slot(self):
+        calls.clear()
+        release.clear()
+        worker = Worker(concurrency=2)
+        self.addCleanup(worker.executor.shutdown)
+        slow = wait_for_release.delay()
+        fast = [record_call.delay(i, countdown=-1) for i in range(3)]
+        Task.objects.filter(pk=slow.pk).update(run_at=timezone.now() - timedelta(minutes=1))
+        while len(calls) < 3:
+            worker.submit_ready()
+            self.assertTrue(worker.collect(5))
+        self.assertEqual(sorted(calls), [0, 1, 2])
+        self.assertEqual(list(worker.running.values()), [[slow.pk]])
+        release.set()
+        worker.collect(5)
+        self.assertEqual(set(Task.objects.values_list('status', flat=True)), {'succeeded'})
+
+    def test_batch_calls_share_one_slot(self):
+        batches.clear()
+        calls.clear()
+        worker = Worker(concurrency=1)
+        self.addCleanup(worker.executor.shutdown)
+        for i in range(4):
+            record_batch.delay(i)
+        record_call.delay(9, countdown=1)
+        Task.objects.filter(name=record_call.name).update(run_at=timezone.now())
+        self.assertEqual(worker.run_once(), 3)
+        self.assertEqual(batches, [[0, 1, 2]])
+        while worker.run_once():
+            pass
+        self.assertEqual(batches, [[0, 1, 2], [3]])
+        self.assertEqual(calls, [9])
+        self.assertEqual(set(Task.objects.values_list('status', flat=True)), {'succeeded'})
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from socialapp import tokens
+from socialapp.models import AuthTokenDevice, AuthTokenPurgeStats
+
+
+class TokenLifecycleTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.login_url = reverse('socialapp:login')
+        tokens._scheduled_slot = None
+
+    def login(self, device='phone', agent='TestAgent/1.0'):
+        response = self.client.post(
+            self.login_url, {'username': 'testuser', 'password': 'testpassword123', 'device_id': device},
+            format='json', HTTP_USER_AGENT=agent,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def authenticates(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client.get(reverse('socialapp:profile')).status_code == status.HTTP_200_OK
+
+    def test_login_from_same_device_rotates_its_token(self):
+        first = self.login()
+        second = self.login()
+        laptop = self.login(device='laptop')
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(self.authenticates(first))
+        self.assertTrue(self.authenticates(second))
+        self.assertTrue(self.authenticates(laptop))
+
+    def test_logins_without_device_id_are_not_rotated(self):
+        tokens_issued = []
+        for _ in range(2):
+            response = self.client.post(
+                self.login_url, {'username': 'testuser', 'password': 'testpassword123'},
+                format='json', HTTP_USER_AGENT='TestAgent/1.0',
+            )
+            tokens_issued.append(response.data['token'])
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(all(self.authenticates(token) for token in tokens_issued))
+        self.assertEqual(set(AuthTokenDevice.objects.values_list('fingerprint', flat=True)), {''})
+
+    def test_device_id_alone_identifies_the_device(self):
+        first = self.login(agent='TestAgent/1.0')
+        second = self.login(agent='TestAgent/2.0')
+        self.assertFalse(self.authenticates(first))
+        self.assertTrue(self.authenticates(second))
+
+    @override_settings(AUTH_TOKEN_MAX_PER_USER=2)
+    def test_per_user_cap_evicts_oldest(self):
+        oldest = self.login(device='a')
+        self.login(device='b')
+        newest = self.login(device='c')
+        self.assertEqual(AuthToken.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(self.authenticates(oldest))
+        self.assertTrue(self.authenticates(newest))
+
+    def test_purge_expired_in_batches(self):
+        for _ in range(3):
+            instance, _ = AuthToken.objects.create(self.user, expiry=timedelta(hours=-1))
+            AuthTokenDevice.objects.create(token=instance, user=self.user)
+        live = self.login()
+        self.assertEqual(tokens.purge_expired(batch_size=2), 3)
+        self.assertEqual(AuthToken.objects.count(), 1)
+        self.assertEqual(AuthTokenDevice.objects.count(), 1)
+        self.assertTrue(self.authenticates(live))
+
+        body = tokens.render_metrics()
+        self.assertIn('socialapp_auth_tokens{state="live"} 1', body)
+        self.assertIn('socialapp_auth_tokens{state="expired"} 0', body)
+        self.assertIn('socialapp_auth_tokens_purged_total 3', body)
+        tokens.purge_expired()
+        stats = AuthTokenPurgeStats.objects.get()
+        self.assertEqual((stats.runs, stats.deleted, stats.last_deleted), (2, 3, 0))
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_login_schedules_purge_once_per_interval(self):
+        AuthToken.objects.create(self.user, expiry=timedelta(hours=-1))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.login()
+            self.login(device='laptop')
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(AuthToken.objects.filter(expiry__lt=timezone.now()).exists())
@@ -1,9 +1,9 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
-from socialapp.models import UserProfile, Post, Like, Connection
+from socialapp.models import UserProfile, Post, Like, Connection, Task
 import uuid
 
 
@@ -29,6 +29,18 @@ class RegisterViewTest(TestCase):
         self.assertEqual(User.objects.count(), 1)
         self.assertEqual(UserProfile.objects.count(), 1)
     
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_register_creates_profile_in_request(self):
+        UserProfile.objects.create(user=User.objects.create_user(username='TestUser'))
+        UserProfile.objects.create(user=User.objects.create_user(username='other'), slug='testuser-1')
+        response = self.client.post(self.register_url, self.user_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UserProfile.objects.get(user__username='testuser').slug, 'testuser-2')
+        self.assertFalse(Task.objects.exists())
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        response = self.client.get(reverse('socialapp:user-profile', args=['testuser-2']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
     def test_register_with_mismatched_passwords(self):
         self.user_data['password_confirm'] = 'wrongpassword'
         response = self.client.post(self.register_url, self.user_data, format='json')
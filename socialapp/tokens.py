@@ -0,0 +1,141 @@
+"""
+Lifecycle of knox auth tokens.
+
+Knox adds a row on every login and only deletes an expired token when its
+owner authenticates again, so the table (and the per-user scan knox runs on
+each authentication) keeps growing. Tokens are issued through
+``issue_token``, which keeps one token per device and at most
+``AUTH_TOKEN_MAX_PER_USER`` per user, evicting the oldest. A device is the
+id the client sends; clients that send none are never rotated, only capped,
+since two installs with the same user agent would revoke each other. Knox
+stores only a digest, so a returning device cannot be handed its old token;
+it gets a new one and the old one is deleted. Expired tokens are removed in batches by
+``purge_expired``, which logins schedule at most once per
+``AUTH_TOKEN_PURGE_INTERVAL``.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from knox.models import AuthToken
+
+from .metrics import PREFIX
+from .models import AuthTokenDevice, AuthTokenPurgeStats
+from .pagination import estimated_count
+from .purge import column, delete_batches, table
+
+_scheduled_slot = None
+
+
+def token_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def device_fingerprint(request):
+    """sha256 of the client's device id, or '' when it sent none"""
+    device = str(request.data.get('device_id') or request.headers.get('X-Device-ID', ''))
+    if not device:
+        return ''
+    return hashlib.sha256(device.encode()).hexdigest()
+
+
+def issue_token(user, request):
+    """Create a token for ``user``; returns (AuthToken, token string) like knox"""
+    fingerprint = device_fingerprint(request)
+    with transaction.atomic():
+        if fingerprint:
+            AuthToken.objects.filter(user=user, device__fingerprint=fingerprint).delete()
+        instance, token = AuthToken.objects.create(user)
+        AuthTokenDevice.objects.create(token=instance, user=user, fingerprint=fingerprint)
+        evict_oldest(user)
+    schedule_purge()
+    return instance, token
+
+
+def evict_oldest(user, limit=None):
+    """Delete the user's tokens beyond the newest ``limit``; returns how many went"""
+    limit = limit or token_setting('AUTH_TOKEN_MAX_PER_USER', 10)
+    if not limit:
+        return 0
+    stale = list(
+        AuthToken.objects.filter(user=user).order_by('-created', '-digest').values_list('digest', flat=True)[limit:]
+    )
+    if stale:
+        AuthToken.objects.filter(digest__in=stale).delete()
+    return len(stale)
+
+
+def purge_expired(now=None, batch_size=None):
+    """Delete expired tokens, one transaction per batch; returns how many went"""
+    batch_size = batch_size or token_setting('AUTH_TOKEN_PURGE_BATCH_SIZE', 1000)
+    param = [AuthToken._meta.get_field('expiry').get_db_prep_value(now or timezone.now(), connection)]
+    expired = f"{column(AuthToken, 'expiry')} < %s"
+    started = time.perf_counter()
+    # Devices first: the raw DELETE does not cascade.
+    delete_batches(
+        AuthTokenDevice,
+        f"{column(AuthTokenDevice, 'token')} IN (SELECT {column(AuthToken, 'digest')} FROM {table(AuthToken)} WHERE {expired})",
+        param, batch_size,
+    )
+    deleted = delete_batches(AuthToken, expired, param, batch_size)
+    record_purge(deleted, time.perf_counter() - started)
+    return deleted
+
+
+def record_purge(deleted, seconds):
+    # Kept in the database so every web worker exports what the task worker did.
+    AuthTokenPurgeStats.objects.bulk_create([AuthTokenPurgeStats()], ignore_conflicts=True)
+    AuthTokenPurgeStats.objects.filter(pk=1).update(
+        runs=F('runs') + 1,
+        deleted=F('deleted') + deleted,
+        seconds=F('seconds') + seconds,
+        last_deleted=deleted,
+        last_seconds=seconds,
+        updated_at=timezone.now(),
+    )
+
+
+def schedule_purge():
+    """Enqueue one purge per interval; each process tries once per interval"""
+    global _scheduled_slot
+    slot = int(time.time() // token_setting('AUTH_TOKEN_PURGE_INTERVAL', 3600))
+    if slot == _scheduled_slot:
+        return
+    _scheduled_slot = slot
+    from .tasks import purge_expired_tokens
+
+    transaction.on_commit(lambda: purge_expired_tokens.delay(idempotency_key=f'purge-tokens:{slot}'))
+
+
+def row_count(queryset):
+    """Planner estimate where there is one (large tables), exact count otherwise"""
+    estimate = estimated_count(queryset)
+    return queryset.count() if estimate is None else estimate
+
+
+def render_metrics():
+    """Token table size and purge throughput in Prometheus text format"""
+    now = timezone.now()
+    live = row_count(AuthToken.objects.filter(Q(expiry__isnull=True) | Q(expiry__gte=now)))
+    expired = row_count(AuthToken.objects.filter(expiry__lt=now))
+    stats = AuthTokenPurgeStats.objects.filter(pk=1).first() or AuthTokenPurgeStats()
+    throughput = stats.deleted / stats.seconds if stats.seconds else 0.0
+    lines = [
+        f'# HELP {PREFIX}auth_tokens Knox tokens in the table',
+        f'# TYPE {PREFIX}auth_tokens gauge',
+        f'{PREFIX}auth_tokens{{state="live"}} {live}',
+        f'{PREFIX}auth_tokens{{state="expired"}} {expired}',
+        f'# HELP {PREFIX}auth_token_purge_runs_total Expired token purges run',
+        f'# TYPE {PREFIX}auth_token_purge_runs_total counter',
+        f"{PREFIX}auth_token_purge_runs_total {stats.runs}",
+        f'# HELP {PREFIX}auth_tokens_purged_total Expired tokens deleted by purges',
+        f'# TYPE {PREFIX}auth_tokens_purged_total counter',
+        f"{PREFIX}auth_tokens_purged_total {stats.deleted}",
+        f'# HELP {PREFIX}auth_token_purge_rows_per_second Tokens deleted per second of purging',
+        f'# TYPE {PREFIX}auth_token_purge_rows_per_second gauge',
+        f'{PREFIX}auth_token_purge_rows_per_second {throughput:g}',
+    ]
+    return '\n'.join(lines) + '\n'
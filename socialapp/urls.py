@@ -16,26 +16,51 @@ urlpatterns = [
     
     # Profile
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('account/', views.delete_account, name='account-delete'),
+    
+    # Public profiles
+    path('users/<slug:slug>/', views.PublicProfileView.as_view(), name='user-profile'),
+    path('users/<slug:slug>/posts/', views.AuthorPostsView.as_view(), name='user-posts'),
     
     # Posts
     path('posts/', views.PostListCreateView.as_view(), name='post-list-create'),
     path('posts/<uuid:pk>/', views.PostDetailView.as_view(), name='post-detail'),
     path('posts/<uuid:pk>/like/', views.like_post, name='like-post'),
     path('posts/<uuid:pk>/unlike/', views.unlike_post, name='unlike-post'),
+    path('posts/<uuid:pk>/likes/', views.PostLikesView.as_view(), name='post-likes'),
     
     # Add these URL patterns to the urlpatterns list
     
     # Comments
     path('posts/<uuid:post_id>/comments/', views.CommentListCreateView.as_view(), name='comment-list-create'),
     path('comments/<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
-    path('comments/<uuid:comment_id>/reply/', views.ReplyCreateView.as_view(), name='reply-create'),
+    path('comments/<int:comment_id>/reply/', views.ReplyCreateView.as_view(), name='reply-create'),
     
     # Connections
     path('users/<int:pk>/connect/', views.connect_user, name='connect-user'),
+    path('users/<int:pk>/mutual/', views.MutualConnectionsView.as_view(), name='mutual-connections'),
+    path('users/<int:pk>/degree/', views.user_degree, name='user-degree'),
+    path('search/users/', views.search_users, name='search-users'),
     path('connections/incoming/', views.IncomingConnectionsView.as_view(), name='incoming-connections'),
     path('connections/<int:pk>/accept/', views.accept_connection, name='accept-connection'),
     path('connections/<int:pk>/decline/', views.decline_connection, name='decline-connection'),
     
     # Recommendations
     path('recommendations/', views.UserRecommendationsView.as_view(), name='user-recommendations'),
+    
+    # Notifications
+    path('notifications/', views.NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread-count/', views.notification_unread_count, name='notification-unread-count'),
+    path('notifications/read/', views.mark_notifications_read, name='notification-mark-read'),
+    
+    # Data export
+    path('exports/', views.DataExportListCreateView.as_view(), name='data-export-list-create'),
+    path('exports/<uuid:pk>/', views.DataExportDetailView.as_view(), name='data-export-detail'),
+    path('exports/<uuid:pk>/download/', views.download_data_export, name='data-export-download'),
+    
+    # Metrics (Prometheus)
+    path('metrics/', views.metrics, name='metrics'),
+    
+    # Delta sync
+    path('sync/', views.sync_changes, name='sync-changes'),
 ]
\ No newline at end of file
@@ -1,28 +1,80 @@
+from bisect import bisect_right
+
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from knox.models import AuthToken
 from knox.views import LoginView as KnoxLoginView
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, Count, Case, When, IntegerField
+from django.db.models import Q, Count, Case, When, IntegerField, Exists, Max, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.core import signing
+from django.http import HttpResponse, Http404
 # Add this to the imports at the top
-from .models import UserProfile, Post, Like, Connection, Comment
+from .models import UserProfile, Post, Like, Connection, Comment, Notification, DataExport
+from .conditional import ConditionalGetMixin, queryset_watermark, latest
+from .pagination import KeysetPagination
+from .normalize import NormalizedUsersMixin
+from .permissions import HasMetricsAccess
+from .metrics import render_prometheus
+from .sendfile import send_file
+from . import sync, notifications, exports, purge, tokens, graph, profiles, search
+from .tasks import build_data_export, purge_post, purge_user
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer, UserProfileSerializer,
     PostSerializer, LikeSerializer, ConnectionSerializer, UserRecommendationSerializer,
-    CommentSerializer
+    ConnectedUserSerializer, PublicProfileSerializer, CommentSerializer, NotificationSerializer,
+    DataExportSerializer
 )
 
+def engagement_watermark(**post_filter):
+    """Validator parts and latest timestamp for likes/comments on the matching posts"""
+    likes_modified, likes_total = queryset_watermark(Like.objects.filter(**post_filter), 'created_at')
+    comments_modified, comments_total = queryset_watermark(Comment.objects.filter(**post_filter))
+    parts = (likes_modified, likes_total, comments_modified, comments_total)
+    return parts, latest(likes_modified, comments_modified)
+
+
+def profiles_watermark(post_ids, author_ids):
+    """Latest profile (or user, see signals.touch_profile) change of the users embedded with
+    these posts: their authors and commenters"""
+    commenters = Comment.objects.filter(post__in=post_ids).values('author_id')
+    return UserProfile.objects.filter(Q(user_id__in=author_ids) | Q(user_id__in=commenters)).aggregate(
+        last=Max('updated_at')
+    )['last']
+
+
+def thread_prefetch():
+    """The comments embedded with each post, in one query for the whole page"""
+    return Prefetch('comments', queryset=Comment.thread().select_related('author'), to_attr='thread_comments')
+
+
+def annotated_posts(request):
+    """Live posts with their author, like count, the caller's like and comment thread: a fixed number of queries a page"""
+    likes = Like.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('pk')).values('n')
+    return Post.objects.select_related('author').annotate(
+        likes_total=Coalesce(Subquery(likes, output_field=IntegerField()), 0),
+        liked=Exists(Like.objects.filter(post=OuterRef('pk'), user_id=request.user.pk)),
+    ).prefetch_related(thread_prefetch())
+
+
 # Add these view classes after the UserRecommendationsView
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(NormalizedUsersMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        return Comment.objects.filter(post_id=post_id).select_related('author')
+        # Comments of deleted posts stay hidden until they are purged.
+        return Comment.thread().filter(post_id=post_id, post__deleted_at__isnull=True).select_related('author')
+    
+    def get_list_validators(self, queryset):
+        comments_modified, comments_total = queryset_watermark(queryset)
+        profiles_modified = profiles_watermark([self.kwargs.get('post_id')], ())
+        parts = (comments_modified, comments_total, profiles_modified)
+        return parts, latest(comments_modified, profiles_modified)
     
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
@@ -30,19 +82,27 @@ class CommentListCreateView(generics.ListCreateAPIView):
         serializer.save(author=self.request.user, post=post)
 
 
-class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return Comment.objects.select_related('author')
     
+    def get_object_validators(self, instance):
+        profiles_modified = profiles_watermark((), {instance.author_id})
+        parts = (instance.pk, instance.updated_at, profiles_modified)
+        return parts, latest(instance.updated_at, profiles_modified)
+    
     def get_object(self):
         comment = get_object_or_404(Comment, id=self.kwargs['pk'])
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             if comment.author != self.request.user:
                 self.permission_denied(self.request, message="You can only edit your own comments")
         return comment
+    
+    def perform_destroy(self, instance):
+        purge.hide_comment(instance)
 
 
 class ReplyCreateView(generics.CreateAPIView):
@@ -67,7 +127,7 @@ class RegisterView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        token = AuthToken.objects.create(user)[1]
+        token = tokens.issue_token(user, request)[1]
         
         return Response({
             'user': UserSerializer(user).data,
@@ -82,7 +142,7 @@ class LoginView(KnoxLoginView):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
-        token = AuthToken.objects.create(user)[1]
+        token = tokens.issue_token(user, request)[1]
         
         return Response({
             'user': UserSerializer(user).data,
@@ -90,7 +150,7 @@ class LoginView(KnoxLoginView):
         })
 
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     
@@ -99,23 +159,68 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 
-class PostListCreateView(generics.ListCreateAPIView):
+class PublicProfileView(generics.RetrieveAPIView):
+    """A user's profile by slug, with stored post and connection counts"""
+    serializer_class = PublicProfileSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_object(self):
+        profile = profiles.profile_for_slug(self.kwargs['slug'])
+        if profile is None:
+            raise Http404('No profile with this slug')
+        profile.stats = profiles.get_stats([profile.user_id])[profile.user_id]
+        return profile
+
+
+class AuthorPostsView(NormalizedUsersMixin, generics.ListAPIView):
+    """A user's posts, newest first, read from the author timeline index"""
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Post.objects.none()
+        author_id = profiles.resolve_slug(self.kwargs['slug'])
+        if author_id is None:
+            raise Http404('No profile with this slug')
+        return annotated_posts(self.request).filter(author_id=author_id)
+
+
+class PostListCreateView(NormalizedUsersMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Post.objects.select_related('author').prefetch_related('likes')
+        return annotated_posts(self.request)
+    
+    def get_list_validators(self, queryset):
+        posts_modified, posts_total = queryset_watermark(queryset)
+        # Likes, comments and profiles only of the posts on this page.
+        page = list(self.page_queryset(queryset.prefetch_related(None).values_list('pk', 'author_id')))
+        post_ids = [pk for pk, _ in page]
+        engagement, engagement_modified = engagement_watermark(post__in=post_ids)
+        profiles_modified = profiles_watermark(post_ids, {author_id for _, author_id in page})
+        parts = (posts_modified, posts_total, *post_ids) + engagement + (profiles_modified,)
+        return parts, latest(posts_modified, engagement_modified, profiles_modified)
     
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
+class PostDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Post.objects.select_related('author').prefetch_related('likes')
+        return Post.objects.select_related('author').prefetch_related('likes', thread_prefetch())
+    
+    def get_object_validators(self, instance):
+        engagement, engagement_modified = engagement_watermark(post=instance)
+        profiles_modified = profiles_watermark([instance.pk], {instance.author_id})
+        parts = (instance.pk, instance.updated_at) + engagement + (profiles_modified,)
+        return parts, latest(instance.updated_at, engagement_modified, profiles_modified)
     
     def get_object(self):
         post = get_object_or_404(Post, id=self.kwargs['pk'])
@@ -123,6 +228,11 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
             if post.author != self.request.user:
                 self.permission_denied(self.request, message="You can only edit your own posts")
         return post
+    
+    def perform_destroy(self, instance):
+        # Hide now; likes, comments and the image are removed by the task.
+        purge.hide_post(instance)
+        purge_post.delay(str(instance.pk), idempotency_key=f'purge-post:{instance.pk}')
 
 
 @api_view(['POST'])
@@ -149,6 +259,46 @@ def unlike_post(request, pk):
         return Response({'message': 'Post not liked yet'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PostLikesView(generics.ListAPIView):
+    """
+    Who liked a post, newest first. With ``?friends_first=true`` the first
+    page also lists the caller's connections who liked it under ``friends``,
+    and the pages leave them out.
+    """
+    serializer_class = LikeSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Like.objects.none()
+        post = get_object_or_404(Post, pk=self.kwargs['pk'])
+        likes = Like.objects.filter(post=post).select_related('user__profile')
+        self.friend_likes = None
+        if self.request.query_params.get('friends_first') in ('1', 'true'):
+            self.friend_likes = self.get_friend_likes(likes)
+            likes = likes.exclude(user_id__in=[like.user_id for like in self.friend_likes])
+        return likes
+    
+    def get_friend_likes(self, likes):
+        """The newest ``LIKES_FRIENDS_LIMIT`` likes by the caller's connections"""
+        limit = getattr(settings, 'LIKES_FRIENDS_LIMIT', 50)
+        ordered = likes.order_by(*self.keyset_ordering)
+        user_ids = graph.connections_among(self.request.user.pk, ordered)
+        found = []
+        for start in range(0, len(user_ids), graph.LOAD_BATCH_SIZE):
+            found += ordered.filter(user_id__in=user_ids[start:start + graph.LOAD_BATCH_SIZE])[:limit]
+        found.sort(key=lambda like: (like.created_at, like.pk), reverse=True)
+        return found[:limit]
+    
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self.friend_likes is not None and not request.query_params.get(self.paginator.cursor_query_param):
+            response.data['friends'] = self.get_serializer(self.friend_likes, many=True).data
+        return response
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def connect_user(request, pk):
@@ -175,7 +325,7 @@ def connect_user(request, pk):
     }, status=status.HTTP_201_CREATED)
 
 
-class IncomingConnectionsView(generics.ListAPIView):
+class IncomingConnectionsView(NormalizedUsersMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = ConnectionSerializer
     permission_classes = [IsAuthenticated]
     
@@ -279,6 +429,183 @@ class UserRecommendationsView(generics.ListAPIView):
         return users
 
 
+class MutualConnectionsView(generics.ListAPIView):
+    """Users connected to both the caller and the given user, by id"""
+    serializer_class = ConnectedUserSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return User.objects.none()
+        other = get_object_or_404(User, pk=self.kwargs['pk'])
+        mutual = graph.mutual_connections(self.request.user.pk, other.pk)
+        # Only the ids of this page go to the database, not every mutual connection.
+        position = self.paginator.get_position(self.request, self, User)
+        start = bisect_right(mutual, position[0]) if position else 0
+        page = mutual[start:start + self.paginator.get_page_size(self.request) + 1]
+        return User.objects.filter(pk__in=page).select_related('profile')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_degree(request, pk):
+    """Degree of separation between the caller and a user, with a sample path"""
+    other = get_object_or_404(User, pk=pk)
+    result = graph.relationship(request.user.pk, other.pk)
+    users = User.objects.in_bulk(result['path'] or [])
+    if len(users) < len(result['path'] or []):
+        # The path runs through a purged account still in another process's
+        # cached neighbour lists: reload the lists along it and search again.
+        graph.invalidate(*result['path'])
+        result = graph.relationship(request.user.pk, other.pk)
+        users = User.objects.in_bulk(result['path'] or [])
+    if result['path']:
+        result['path'] = [
+            {'id': user_id, 'username': users[user_id].username} for user_id in result['path'] if user_id in users
+        ]
+    return Response(dict(result, user=other.pk))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_users(request):
+    """Typeahead over usernames, names and profile slugs: connections first, then by mutual connections"""
+    try:
+        limit = int(request.query_params.get('limit', 0)) or None
+    except ValueError:
+        limit = None
+    query = request.query_params.get('q', '')
+    return Response({'results': search.search_users(request.user.pk, query, limit)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """Changes visible to the caller since the ``since`` watermark"""
+    since = request.query_params.get('since')
+    if not since:
+        # First sync: clients do a full fetch and poll from here on.
+        return Response({'changes': [], 'watermark': sync.current_watermark(), 'has_more': False})
+    
+    try:
+        cursor = sync.decode_watermark(since)
+    except sync.WatermarkExpired:
+        return Response({'error': 'Watermark expired, full resync required'}, status=status.HTTP_410_GONE)
+    except signing.BadSignature:
+        return Response({'error': 'Invalid watermark'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_limit = sync.sync_setting('SYNC_PAGE_SIZE', 500)
+    try:
+        limit = min(int(request.query_params.get('limit', max_limit)), max_limit)
+    except ValueError:
+        limit = max_limit
+    changes, cursor, has_more = sync.changes_since(request.user, cursor, max(limit, 1))
+    return Response({
+        'changes': changes,
+        'watermark': sync.encode_watermark(cursor),
+        'has_more': has_more,
+    })
+
+
+class NotificationListView(generics.ListAPIView):
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-updated_at', '-id')
+    
+    def get_queryset(self):
+        return Notification.objects.filter(recipient=self.request.user)
+    
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['unread_count'] = notifications.unread_count(self.request.user)
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def notification_unread_count(request):
+    return Response({'unread_count': notifications.unread_count(request.user)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    """Mark ``ids`` (or every notification when ``ids`` is omitted) as read"""
+    ids = request.data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return Response({'error': 'ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    changed = notifications.mark_read(request.user, ids)
+    return Response({'marked_read': changed, 'unread_count': notifications.unread_count(request.user)})
+
+
+@api_view(['DELETE'])
+@permission_classes([IsAuthenticated])
+def delete_account(request):
+    """Deactivate the caller's account now and purge its data in the background"""
+    if not request.user.check_password(request.data.get('password', '')):
+        return Response({'error': 'Password is incorrect'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    purge.deactivate_account(request.user)
+    purge_user.delay(request.user.pk, idempotency_key=f'purge-user:{request.user.pk}')
+    return Response({'message': 'Account scheduled for deletion'}, status=status.HTTP_202_ACCEPTED)
+
+
+class DataExportListCreateView(generics.ListCreateAPIView):
+    serializer_class = DataExportSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation has no user to scope by.
+            return DataExport.objects.none()
+        return DataExport.objects.filter(user=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        exports.schedule_prune()
+        # One export at a time per user; asking again returns the running one.
+        export = exports.active_export(request.user)
+        if export is None:
+            export = DataExport.objects.create(user=request.user)
+            build_data_export.delay(str(export.pk), idempotency_key=f'export:{export.pk}')
+            export.refresh_from_db()
+        serializer = self.get_serializer(export)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class DataExportDetailView(generics.RetrieveAPIView):
+    serializer_class = DataExportSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation has no user to scope by.
+            return DataExport.objects.none()
+        return DataExport.objects.filter(user=self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_data_export(request, pk):
+    export = get_object_or_404(DataExport, pk=pk, user=request.user)
+    if export.status != 'succeeded' or not export.archive:
+        raise Http404('Export is not ready')
+    return send_file(
+        request, export.archive.name, cache_control='private, no-cache', as_attachment=True,
+        filename=f'{request.user.username}-export-{export.created_at:%Y%m%d}.zip',
+    )
+
+
+@api_view(['GET'])
+@permission_classes([HasMetricsAccess])
+def metrics(request):
+    """Per-route request metrics of this worker process, plus token table gauges, in Prometheus text format"""
+    return HttpResponse(render_prometheus() + tokens.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # Add this at the end of the file
 
 @api_view(['GET'])
@@ -293,12 +620,14 @@ def api_index(request):
                 'logout': '/api/logout/',
             },
             'profile': '/api/profile/',
+            'account': '/api/account/',
             'posts': {
                 'list_create': '/api/posts/',
                 'detail': '/api/posts/{post_id}/',
                 'like': '/api/posts/{post_id}/like/',
                 'unlike': '/api/posts/{post_id}/unlike/',
                 'comments': '/api/posts/{post_id}/comments/',
+                'likes': '/api/posts/{post_id}/likes/',
             },
             'comments': {
                 'detail': '/api/comments/{comment_id}/',
@@ -306,10 +635,28 @@ def api_index(request):
             },
             'connections': {
                 'connect': '/api/users/{user_id}/connect/',
+                'mutual': '/api/users/{user_id}/mutual/',
+                'degree': '/api/users/{user_id}/degree/',
                 'incoming': '/api/connections/incoming/',
                 'accept': '/api/connections/{connection_id}/accept/',
                 'decline': '/api/connections/{connection_id}/decline/',
             },
+            'users': {
+                'profile': '/api/users/{slug}/',
+                'posts': '/api/users/{slug}/posts/',
+                'search': '/api/search/users/?q={prefix}',
+            },
             'recommendations': '/api/recommendations/',
+            'sync': '/api/sync/?since={watermark}',
+            'notifications': {
+                'list': '/api/notifications/',
+                'unread_count': '/api/notifications/unread-count/',
+                'mark_read': '/api/notifications/read/',
+            },
+            'exports': {
+                'list_create': '/api/exports/',
+                'detail': '/api/exports/{export_id}/',
+                'download': '/api/exports/{export_id}/download/',
+            },
         }
     })
\ No newline at end of file